@@ -8,6 +8,7 @@ import os
 from dotenv import load_dotenv
 
 from .core.database import users_collection
+from .core.executors import run_in
 from .models.schemas import UserCreate, UserLogin, UserResponse, Token   # ✅ fixed import
 
 load_dotenv()
@@ -47,7 +48,7 @@ async def register(user: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await run_in("cpu", hash_password, user.password)
     new_user = {"username": user.username, "hashed_password": hashed_pw}
     result = await users_collection.insert_one(new_user)
 
@@ -56,7 +57,7 @@ async def register(user: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(user: UserLogin):
     db_user = await get_user_by_username(user.username)
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    if not db_user or not await run_in("cpu", verify_password, user.password, db_user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -1,4 +1,5 @@
 from celery import Celery
+from kombu import Queue
 import os
 from dotenv import load_dotenv
 
@@ -22,7 +23,43 @@ celery_app = Celery(
     backend=redis_url
 )
 
-# Rest of your config...
+# ==========================================================
+# --- Queue topology ---
+# ==========================================================
+# interactive: quick DB-backed tasks a user is waiting on (prefork, small)
+# network:     third-party HTTP calls that mostly wait on I/O (thread pool, wide)
+# cpu:         heavy Python work such as yt-dlp extraction (prefork, one per core)
+# background:  scheduled / fire-and-forget work nobody is waiting on (thread pool)
+# ai_tasks is the legacy single queue; the interactive worker keeps draining it.
+TASK_QUEUES = (
+    Queue('interactive', routing_key='interactive'),
+    Queue('network', routing_key='network'),
+    Queue('cpu', routing_key='cpu'),
+    Queue('background', routing_key='background'),
+    Queue('ai_tasks', routing_key='ai_tasks'),
+)
+
+# Redis priorities: 0 is the highest, 9 the lowest
+TASK_ROUTES = {
+    'backend.tasks.calculator_tasks.*': {'queue': 'interactive', 'priority': 0},
+    'backend.tasks.notes_tasks.*': {'queue': 'interactive', 'priority': 0},
+    'backend.tasks.expense_tasks.*': {'queue': 'interactive', 'priority': 0},
+    'backend.tasks.event_tasks.*': {'queue': 'interactive', 'priority': 0},
+    'backend.tasks.reminder_tasks.execute_reminder_task': {'queue': 'interactive', 'priority': 0},
+    'backend.tasks.weather_tasks.*': {'queue': 'network', 'priority': 3},
+    'backend.tasks.news_tasks.*': {'queue': 'network', 'priority': 3},
+    'backend.tasks.search_tasks.*': {'queue': 'network', 'priority': 3},
+    'backend.tasks.translate_tasks.*': {'queue': 'network', 'priority': 3},
+    'backend.tasks.email_tasks.*': {'queue': 'network', 'priority': 5},
+    'backend.tasks.whatsapp_tasks.send_whatsapp_message': {'queue': 'network', 'priority': 3},
+    'backend.tasks.music_tasks.*': {'queue': 'cpu', 'priority': 3},
+    'backend.tasks.reminder_tasks.trigger_reminder': {'queue': 'background', 'priority': 5},
+    'backend.tasks.reminder_tasks.check_missed_reminders': {'queue': 'background', 'priority': 9},
+    'backend.tasks.whatsapp_tasks.process_whatsapp_message': {'queue': 'background', 'priority': 5},
+    'backend.tasks.whatsapp_tasks.process_whatsapp_chunk': {'queue': 'background', 'priority': 7},
+    'backend.tasks.whatsapp_tasks.requeue_stale_whatsapp_sends': {'queue': 'background', 'priority': 9},
+}
+
 celery_app.conf.update(
     broker_connection_retry_on_startup=True,
     task_serializer='json',
@@ -34,14 +71,24 @@ celery_app.conf.update(
     task_acks_late=True,
     worker_prefetch_multiplier=1,
     worker_disable_rate_limits=True,
-    task_routes={
-        'backend.tasks.*': {'queue': 'ai_tasks'},
+    task_queues=TASK_QUEUES,
+    task_default_queue='interactive',
+    task_default_priority=5,
+    task_routes=TASK_ROUTES,
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
     },
     beat_schedule={
         'check-missed-reminders-every-10-minutes': {
             'task': 'backend.tasks.reminder_tasks.check_missed_reminders',
             'schedule': 600.0,
         },
+        'requeue-stale-whatsapp-sends-every-10-minutes': {
+            'task': 'backend.tasks.whatsapp_tasks.requeue_stale_whatsapp_sends',
+            'schedule': 600.0,
+        },
     }
 )
 
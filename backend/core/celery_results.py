@@ -0,0 +1,286 @@
+# backend/core/celery_results.py
+import asyncio
+import json
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from backend.core.celery_app import celery_app
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Celery's Redis result backend stores every state under this key and PUBLISHes it on a
+# channel with the same name, so waiting for a result is a SUBSCRIBE instead of a poll.
+TASK_META_PREFIX = "celery-task-meta-"
+READY_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+ProgressCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class TaskFailed(Exception):
+    """The Celery task finished in FAILURE/REVOKED state."""
+
+
+class CeleryResultListener:
+    """
+    Asyncio-native waiting for Celery results in the API process.
+
+    One pub/sub connection is shared by every waiter; each wait() registers a future
+    keyed by task id and a single reader task resolves them as the worker publishes
+    state changes. Nothing here blocks the event loop, so many tasks can be awaited
+    concurrently.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or celery_app.conf.result_backend
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._progress: Dict[str, List[ProgressCallback]] = {}
+        self.stats = {"waits": 0, "resolved": 0, "timeouts": 0, "failures": 0}
+
+    async def _ensure_connection(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.url, decode_responses=True)
+            self._pubsub = self._redis.pubsub()
+
+    @staticmethod
+    def _channel(task_id: str) -> str:
+        return f"{TASK_META_PREFIX}{task_id}"
+
+    async def wait(self, task_id: str, timeout: float, on_progress: Optional[ProgressCallback] = None) -> Any:
+        """
+        Wait for a task's result without blocking the loop.
+        Raises asyncio.TimeoutError after `timeout` seconds and TaskFailed on failure.
+        `on_progress(state, meta)` is awaited for intermediate states (update_state from the worker).
+        """
+        await self._ensure_connection()
+        self.stats["waits"] += 1
+        future = asyncio.get_running_loop().create_future()
+        first_waiter = task_id not in self._waiters
+        self._waiters.setdefault(task_id, []).append(future)
+        if on_progress:
+            self._progress.setdefault(task_id, []).append(on_progress)
+
+        try:
+            if first_waiter:
+                await self._pubsub.subscribe(self._channel(task_id))
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+
+            # The task may have finished before we subscribed
+            stored = await self._redis.get(self._channel(task_id))
+            if stored:
+                self._dispatch(task_id, stored)
+
+            meta = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        finally:
+            await self._release(task_id, future, on_progress)
+
+        return self._unpack(task_id, meta)
+
+    def _unpack(self, task_id: str, meta: Dict[str, Any]) -> Any:
+        self.stats["resolved"] += 1
+        if meta.get("status") == "SUCCESS":
+            return meta.get("result")
+        self.stats["failures"] += 1
+        error = meta.get("result") or {}
+        if isinstance(error, dict):
+            error = f"{error.get('exc_type', 'Error')}: {error.get('exc_message', '')}"
+        raise TaskFailed(f"Task {task_id} {meta.get('status', 'FAILED').lower()}: {error}")
+
+    async def _release(self, task_id: str, future: asyncio.Future,
+                       on_progress: Optional[ProgressCallback]):
+        waiters = self._waiters.get(task_id, [])
+        if future in waiters:
+            waiters.remove(future)
+        if on_progress and on_progress in self._progress.get(task_id, []):
+            self._progress[task_id].remove(on_progress)
+        if not waiters:
+            self._waiters.pop(task_id, None)
+            self._progress.pop(task_id, None)
+            try:
+                await self._pubsub.unsubscribe(self._channel(task_id))
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to unsubscribe from {task_id}: {e}")
+
+    def _dispatch(self, task_id: str, raw: str):
+        try:
+            meta = json.loads(raw)
+        except ValueError:
+            logger.warning(f"⚠️ Undecodable result for task {task_id}")
+            return
+
+        status = meta.get("status")
+        if status in READY_STATES:
+            for future in self._waiters.get(task_id, []):
+                if not future.done():
+                    future.set_result(meta)
+            return
+
+        for callback in list(self._progress.get(task_id, [])):
+            asyncio.create_task(self._notify(callback, status, meta.get("result") or {}))
+
+    @staticmethod
+    async def _notify(callback: ProgressCallback, status: str, meta: Dict[str, Any]):
+        try:
+            await callback(status, meta)
+        except Exception as e:
+            logger.warning(f"⚠️ Progress callback failed: {e}")
+
+    async def _read(self):
+        """Single reader for the shared pub/sub connection; exits when nobody is waiting."""
+        while self._waiters:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception as e:
+                logger.error(f"❌ Celery result listener error: {e}")
+                await asyncio.sleep(0.5)
+                continue
+            if message and message.get("type") == "message":
+                channel = message["channel"]
+                self._dispatch(channel[len(TASK_META_PREFIX):], message["data"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": sum(len(w) for w in self._waiters.values())}
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+task_results = CeleryResultListener()
+
+
+# ==========================================================
+# --- Loop-lag check: python -m backend.core.celery_results ---
+# ==========================================================
+# An in-memory pub/sub stands in for Redis. Many waits are pending while fake workers
+# publish progress and results; a probe sleeps LAG_PROBE_SECONDS in a loop and records
+# how late it wakes up. A blocking wait (AsyncResult.get() on the loop) shows up as lag
+# of the task's whole runtime, so the same probe is first run against one as a control.
+LAG_PROBE_SECONDS = 0.005
+LAG_BUDGET_SECONDS = 0.05
+
+
+class _StubPubSub:
+    def __init__(self, redis: "_StubRedis"):
+        self.redis = redis
+        self.channels = set()
+        self.inbox: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel: str):
+        self.channels.add(channel)
+        self.redis.subscribers.add(self)
+
+    async def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+
+    async def get_message(self, ignore_subscribe_messages: bool = True, timeout: float = 1.0):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class _StubRedis:
+    def __init__(self):
+        self.store: Dict[str, str] = {}
+        self.subscribers = set()
+
+    def pubsub(self) -> _StubPubSub:
+        return _StubPubSub(self)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.store.get(key)
+
+    def publish(self, channel: str, data: str):
+        """What a Celery worker does on each state change (SET + PUBLISH)."""
+        self.store[channel] = data
+        for pubsub in self.subscribers:
+            if channel in pubsub.channels:
+                pubsub.inbox.put_nowait({"type": "message", "channel": channel, "data": data})
+
+
+async def _probe_lag(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_PROBE_SECONDS)
+        lags.append(time.perf_counter() - started - LAG_PROBE_SECONDS)
+
+
+async def _fake_worker(redis: _StubRedis, task_id: str, runtime: float):
+    channel = f"{TASK_META_PREFIX}{task_id}"
+    await asyncio.sleep(runtime / 2)
+    redis.publish(channel, json.dumps({"status": "PROGRESS", "result": {"step": 1}}))
+    await asyncio.sleep(runtime / 2)
+    redis.publish(channel, json.dumps({"status": "SUCCESS", "result": f"done {task_id}"}))
+
+
+async def _measure(pending: int, blocking: bool) -> Dict[str, Any]:
+    redis = _StubRedis()
+    listener = CeleryResultListener(url="redis://stub")
+    listener._redis, listener._pubsub = redis, redis.pubsub()
+    progress = []
+
+    async def on_progress(state: str, meta: Dict[str, Any]):
+        progress.append(state)
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_lag(lags, stop))
+    await asyncio.sleep(LAG_PROBE_SECONDS * 2)
+
+    started = time.perf_counter()
+    if blocking:
+        # Control: the old pattern, a synchronous result wait on the event loop
+        time.sleep(0.2)
+        results = ["done blocking"]
+    else:
+        runtimes = [random.uniform(0.05, 0.4) for _ in range(pending)]
+        workers = [asyncio.create_task(_fake_worker(redis, f"t{i}", runtime)) for i, runtime in enumerate(runtimes)]
+        results = await asyncio.gather(*(listener.wait(f"t{i}", timeout=5.0, on_progress=on_progress)
+                                         for i in range(pending)))
+        await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started
+
+    await asyncio.sleep(LAG_PROBE_SECONDS * 2)
+    stop.set()
+    await probe
+    lags.sort()
+    return {
+        "results": len(results), "progress": len(progress), "elapsed": elapsed,
+        "max_lag": lags[-1], "p99_lag": lags[int(len(lags) * 0.99) - 1], "pending_after": listener.get_stats()["pending"],
+    }
+
+
+async def _check_loop_lag(pending: int = 500) -> int:
+    failures = 0
+    control = await _measure(1, blocking=True)
+    print(f"  blocking control: max lag {control['max_lag'] * 1000:.1f} ms")
+    if control["max_lag"] < LAG_BUDGET_SECONDS:
+        failures += 1
+        print("❌ probe did not notice a blocked loop")
+
+    run = await _measure(pending, blocking=False)
+    print(f"  {pending} pending waits: resolved {run['results']} in {run['elapsed']:.2f}s, "
+          f"{run['progress']} progress callbacks, lag p99 {run['p99_lag'] * 1000:.1f} ms, "
+          f"max {run['max_lag'] * 1000:.1f} ms")
+    if run["results"] != pending or run["progress"] != pending or run["pending_after"]:
+        failures += 1
+        print("❌ not every wait resolved cleanly")
+    if run["max_lag"] > LAG_BUDGET_SECONDS:
+        failures += 1
+        print(f"❌ event loop lagged more than {LAG_BUDGET_SECONDS * 1000:.0f} ms while results were pending")
+    print(f"{'✅' if not failures else '❌'} loop-lag check")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if asyncio.run(_check_loop_lag()) else 0)
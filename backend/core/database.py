@@ -24,6 +24,7 @@ events_collection = db["events"]
 expenses_collection = db["expenses"]
 semantic_collection = db["semantic_memory"]
 whatsapp_tasks_collection = db["whatsapp_tasks"]
+notifications_collection = db["notifications"]
 
 # ==========================================================
 # --- Redis (Async) ---
@@ -95,7 +96,7 @@ async def get_pending_reminders():
 async def mark_reminder_triggered(reminder_id: str):
     from bson.objectid import ObjectId
     result = await reminders_collection.update_one(
-        {"_id": ObjectId(reminder_id)},
+        {"_id": ObjectId(reminder_id), "is_triggered": False},
         {"$set": {"is_triggered": True}}
     )
     return result.modified_count > 0
@@ -148,6 +149,77 @@ async def get_total_expenses(user_id: str):
     result = await expenses_collection.aggregate(pipeline).to_list(length=1)
     return result[0]["total"] if result else 0.0
 
+# --- Notifications (archive read path) ---
+NOTIFICATION_TTL_DAYS = int(os.getenv("NOTIFICATION_TTL_DAYS", "90"))
+# inbox_id is what notification_inbox.mark_read takes, so clients can mark archived items read
+NOTIFICATION_FIELDS = {"inbox_id": 1, "message": 1, "type": 1, "created": 1, "is_read": 1}
+
+async def ensure_notification_indexes():
+    """Index behind get_user_notifications plus TTL expiry of old notifications (idempotent)."""
+    await notifications_collection.create_index(
+        [("user_id", 1), ("type", 1), ("created", -1), ("_id", -1)],
+        name="user_type_created"
+    )
+    await notifications_collection.create_index(
+        "created",
+        expireAfterSeconds=NOTIFICATION_TTL_DAYS * 24 * 3600,
+        name="expire_created"
+    )
+
+# Before the inbox, save_user_notification_sync wrote notifications into "reminders".
+# Those documents carry message/type but never scheduled_time, which every reminder has.
+LEGACY_NOTIFICATION_FILTER = {"message": {"$exists": True}, "type": {"$exists": True},
+                              "scheduled_time": {"$exists": False}}
+
+async def migrate_legacy_notifications(batch_size: int = 500) -> int:
+    """
+    One-off move of archived notifications from "reminders" into "notifications"
+    (same _id, so a rerun or a second worker doing it at once cannot duplicate them).
+    Returns how many were moved; 0 once the old collection is clean.
+    """
+    from pymongo.errors import BulkWriteError
+    moved = 0
+    while True:
+        batch = await reminders_collection.find(LEGACY_NOTIFICATION_FILTER).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return moved
+        try:
+            await notifications_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate _id means another worker already copied it; anything else is real
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        await reminders_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        moved += len(batch)
+
+async def get_user_notifications(user_id: str, notification_type: str = "reminder", cursor: str = None, limit=20):
+    """
+    Newest-first page of archived notifications as (items, next_cursor). The cursor is
+    "<created iso>|<_id>" of the last item, so each page is an index range scan no
+    matter how deep the user pages; next_cursor is None on the last page.
+    """
+    from datetime import datetime
+    from bson.objectid import ObjectId
+    query = {"user_id": user_id, "type": notification_type}
+    if cursor:
+        created, _, last_id = cursor.partition("|")
+        created = datetime.fromisoformat(created)
+        query["$or"] = [
+            {"created": {"$lt": created}},
+            {"created": created, "_id": {"$lt": ObjectId(last_id)}},
+        ]
+    # One extra document tells whether another page exists
+    found = notifications_collection.find(query, NOTIFICATION_FIELDS).sort(
+        [("created", -1), ("_id", -1)]
+    ).limit(limit + 1)
+    items = await found.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = f"{items[-1]['created'].isoformat()}|{items[-1]['_id']}"
+    return items, next_cursor
+
 # ==========================================================
 # --- Sync MongoDB (for Celery tasks) ---
 # ==========================================================
@@ -161,6 +233,7 @@ sync_events_collection = sync_db["events"]
 sync_expenses_collection = sync_db["expenses"]
 sync_whatsapp_tasks_collection = sync_db["whatsapp_tasks"]
 sync_music_collection = sync_db["music_history"]
+sync_notifications_collection = sync_db["notifications"]
 # ==========================================================
 # --- Sync Helper Functions (for Celery Tasks) ---
 # ==========================================================
@@ -182,7 +255,8 @@ def get_user_reminders_sync(user_id: str, limit=10):
     cursor = sync_reminders_collection.find({"user_id": user_id}).sort("created", -1).limit(limit)
     return list(cursor)
 
-def save_user_reminder_sync(user_id: str, text: str, time: str, scheduled_time=None, celery_task_id=None, created=None):
+def save_user_reminder_sync(user_id: str, text: str, time: str, scheduled_time=None, celery_task_id=None, created=None,
+                            recurrence=None):
     from datetime import datetime
     reminder = {
         "user_id": user_id,
@@ -193,6 +267,10 @@ def save_user_reminder_sync(user_id: str, text: str, time: str, scheduled_time=N
         "is_triggered": False,
         "created": created or datetime.now()
     }
+    if recurrence:
+        # One document per rule; scheduled_time always holds the next occurrence
+        reminder["recurrence"] = recurrence
+        reminder["occurrences"] = 0
     result = sync_reminders_collection.insert_one(reminder)
     return str(result.inserted_id)
 
@@ -205,7 +283,7 @@ def get_user_events_sync(user_id: str, limit=10):
     cursor = sync_events_collection.find({"user_id": user_id}).sort("created", -1).limit(limit)
     return list(cursor)
 
-def save_user_event_sync(user_id: str, name: str, time: str, created=None):
+def save_user_event_sync(user_id: str, name: str, time: str, created=None, scheduled_time=None):
     from datetime import datetime
     event = {
         "user_id": user_id,
@@ -213,6 +291,8 @@ def save_user_event_sync(user_id: str, name: str, time: str, created=None):
         "time": time,
         "created": created or datetime.now()
     }
+    if scheduled_time:
+        event["scheduled_time"] = scheduled_time
     result = sync_events_collection.insert_one(event)
     return str(result.inserted_id)
 
@@ -248,13 +328,87 @@ def get_pending_reminders_sync():
     return list(cursor)
 
 def mark_reminder_triggered_sync(reminder_id: str):
+    """Flip is_triggered atomically; False means another trigger already delivered it."""
     from bson.objectid import ObjectId
+    from datetime import datetime
     result = sync_reminders_collection.update_one(
-        {"_id": ObjectId(reminder_id)},
-        {"$set": {"is_triggered": True}}
+        {"_id": ObjectId(reminder_id), "is_triggered": False},
+        {"$set": {"is_triggered": True, "triggered_at": datetime.now()}}
     )
     return result.modified_count > 0
 
+def get_reminder_sync(reminder_id: str, projection=None):
+    from bson.objectid import ObjectId
+    return sync_reminders_collection.find_one({"_id": ObjectId(reminder_id)}, projection)
+
+def advance_recurring_reminder_sync(reminder_id: str, fired_time, next_time):
+    """
+    Move a recurring reminder from the occurrence that just fired to the next one.
+    Conditional on scheduled_time still being `fired_time`, so only one trigger per
+    occurrence wins; any sweep claim is released for the new occurrence.
+    """
+    from bson.objectid import ObjectId
+    from datetime import datetime
+    result = sync_reminders_collection.update_one(
+        {"_id": ObjectId(reminder_id), "is_triggered": False, "scheduled_time": fired_time},
+        {
+            "$set": {"scheduled_time": next_time, "last_triggered": datetime.now()},
+            "$inc": {"occurrences": 1},
+            "$unset": {"claim_token": "", "claimed_by": "", "claimed_at": ""},
+        }
+    )
+    return result.modified_count > 0
+
+_reminder_indexes_ready = False
+
+def ensure_reminder_indexes_sync():
+    """Compound index behind the missed-reminder sweep (idempotent, once per process)."""
+    global _reminder_indexes_ready
+    if not _reminder_indexes_ready:
+        sync_reminders_collection.create_index(
+            [("is_triggered", 1), ("scheduled_time", 1)],
+            name="pending_by_time"
+        )
+        _reminder_indexes_ready = True
+
+_whatsapp_indexes_ready = False
+
+def ensure_whatsapp_indexes_sync():
+    """Index behind bulk-send status lookups (idempotent, once per process)."""
+    global _whatsapp_indexes_ready
+    if not _whatsapp_indexes_ready:
+        sync_whatsapp_tasks_collection.create_index("bulk_id", sparse=True, name="by_bulk_id")
+        _whatsapp_indexes_ready = True
+
+def claim_due_reminders_sync(claimer: str, due_before, claim_expiry_seconds: int = 900, batch_size: int = 200):
+    """
+    Claim every untriggered reminder due before `due_before` with one update_many and
+    stream the claimed documents back in batches. Each document is stamped with a
+    unique claim token, so concurrent sweeps never claim the same reminder; a claim
+    older than `claim_expiry_seconds` whose reminder still has not fired can be retaken.
+    """
+    import uuid
+    from datetime import datetime, timedelta
+    ensure_reminder_indexes_sync()
+    now = datetime.now()
+    token = f"{claimer}:{uuid.uuid4().hex}"
+    sync_reminders_collection.update_many(
+        {
+            "is_triggered": False,
+            "scheduled_time": {"$lte": due_before},
+            "$or": [
+                {"claimed_at": {"$exists": False}},
+                {"claimed_at": {"$lt": now - timedelta(seconds=claim_expiry_seconds)}},
+            ],
+        },
+        {"$set": {"claim_token": token, "claimed_by": claimer, "claimed_at": now}}
+    )
+    # Read back through pending_by_time; claim_token alone has no index and would scan
+    return sync_reminders_collection.find(
+        {"is_triggered": False, "scheduled_time": {"$lte": due_before}, "claim_token": token},
+        {"user_id": 1, "text": 1, "scheduled_time": 1}
+    ).hint("pending_by_time").batch_size(batch_size)
+
 def update_reminder_celery_task_sync(reminder_id: str, celery_task_id: str):
     from bson.objectid import ObjectId
     result = sync_reminders_collection.update_one(
@@ -264,6 +418,7 @@ def update_reminder_celery_task_sync(reminder_id: str, celery_task_id: str):
     return result.modified_count > 0
 
 def save_user_notification_sync(user_id: str, message: str, notification_type: str = "reminder"):
+    """Archive-only write; live delivery goes through backend.core.notification_inbox."""
     from datetime import datetime
     notification = {
         "user_id": user_id,
@@ -272,13 +427,5 @@ def save_user_notification_sync(user_id: str, message: str, notification_type: s
         "created": datetime.now(),
         "is_read": False
     }
-    # Use existing sync_reminders_collection (or create sync_notifications_collection if you prefer)
-    result = sync_reminders_collection.insert_one(notification)
+    result = sync_notifications_collection.insert_one(notification)
     return str(result.inserted_id)
-
-def get_user_notifications_sync(user_id: str, limit=10):
-    cursor = sync_reminders_collection.find({
-        "user_id": user_id,
-        "type": "reminder"
-    }).sort("created", -1).limit(limit)
-    return list(cursor)
\ No newline at end of file
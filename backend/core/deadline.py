@@ -0,0 +1,42 @@
+import os
+import time
+from typing import Optional
+
+# End-to-end budget for one chat turn (context + task + LLM chain)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage starts after the request budget has run out."""
+
+
+class Deadline:
+    """A monotonic request deadline that is passed down through every await."""
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """The time a single step may take: its own cap, but never past the deadline."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def check(self, stage: str = "request"):
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.2f}s of {self.budget:.1f}s)"
+
+
+def budget(deadline: Optional[Deadline], cap: float) -> float:
+    """Timeout for a step that may or may not run under a deadline."""
+    return deadline.timeout(cap) if deadline else cap
@@ -0,0 +1,257 @@
+# backend/core/event_bus.py
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import redis.asyncio as aioredis
+
+from backend.core.celery_app import celery_app
+from backend.core.logger import get_logger
+from backend.core.ws_manager import ws_manager
+
+logger = get_logger(__name__)
+
+# ==========================================================
+# --- Keys and timing ---
+# ==========================================================
+# ws:presence:<user_id>  HASH worker_id -> "<socket count>:<last heartbeat, unix seconds>"
+# ws:worker:<worker_id>  channel each API worker subscribes to; messages are "<user_id>\n<event json>"
+# Workers and API processes share the broker Redis, so a Celery task can reach a socket
+# in any uvicorn worker.
+PRESENCE_PREFIX = "ws:presence:"
+WORKER_CHANNEL_PREFIX = "ws:worker:"
+HEARTBEAT_SECONDS = int(os.getenv("WS_PRESENCE_HEARTBEAT_SECONDS", "15"))
+# A worker that stops heartbeating (crash, SIGKILL) drops out of presence after this.
+# The key TTL only covers the whole hash, which any live worker keeps refreshing, so
+# each field also carries its own heartbeat time and routing skips stale fields.
+PRESENCE_TTL_SECONDS = int(os.getenv("WS_PRESENCE_TTL_SECONDS", str(4 * HEARTBEAT_SECONDS)))
+
+# Event types pushed to clients
+EVENT_TYPES = ("notification", "whatsapp_status", "task_progress", "task_result")
+
+
+def presence_key(user_id: str) -> str:
+    return f"{PRESENCE_PREFIX}{user_id}"
+
+
+def worker_channel(worker_id: str) -> str:
+    return f"{WORKER_CHANNEL_PREFIX}{worker_id}"
+
+
+def _presence_value(count: int) -> str:
+    return f"{count}:{int(time.time())}"
+
+
+def _split_presence(fields: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """(live workers, stale workers) of a presence hash; a stale field missed its heartbeats."""
+    cutoff = time.time() - PRESENCE_TTL_SECONDS
+    live, stale = [], []
+    for worker_id, value in fields.items():
+        _, _, beat = value.partition(":")
+        (live if beat.isdigit() and int(beat) >= cutoff else stale).append(worker_id)
+    return live, stale
+
+
+def _frame(user_id: str, event: Any) -> str:
+    return f"{user_id}\n{event if isinstance(event, str) else json.dumps(event, default=str)}"
+
+
+class EventBus:
+    """
+    Cross-process connection registry and server push for /ws.
+
+    Each API worker keeps its own sockets in ws_manager and advertises them in Redis
+    (user -> {worker_id: socket count}). publish() looks up which workers hold a
+    user's sockets and sends the event only to those workers' channels. Each
+    worker's presence field carries its last heartbeat, so a worker that dies
+    without cleaning up stops being routed to once its field goes stale, even while
+    other workers keep the hash alive; stale fields and workers whose channel has
+    no subscriber are removed on the next publish.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or celery_app.conf.broker_url
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._redis = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._reader: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.stats = {"published": 0, "routed": 0, "offline": 0, "dead_workers_pruned": 0,
+                      "received": 0, "delivered": 0, "undelivered": 0}
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.url, decode_responses=True)
+        return self._redis
+
+    # ==========================================================
+    # PUBLISH
+    # ==========================================================
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> int:
+        """Send an event to every socket of a user, in any worker; returns how many workers got it."""
+        self.stats["published"] += 1
+        try:
+            redis = self._client()
+            workers, stale = _split_presence(await redis.hgetall(presence_key(user_id)))
+            if stale:
+                await redis.hdel(presence_key(user_id), *stale)
+                self.stats["dead_workers_pruned"] += len(stale)
+            if not workers:
+                self.stats["offline"] += 1
+                return 0
+
+            frame = _frame(user_id, event)
+            pipe = redis.pipeline(transaction=False)
+            for worker_id in workers:
+                pipe.publish(worker_channel(worker_id), frame)
+            receivers = await pipe.execute()
+
+            dead = [worker_id for worker_id, count in zip(workers, receivers) if not count]
+            if dead:
+                await redis.hdel(presence_key(user_id), *dead)
+                self.stats["dead_workers_pruned"] += len(dead)
+            routed = len(workers) - len(dead)
+            self.stats["routed"] += routed
+            return routed
+        except Exception as e:
+            # Fall back to sockets in this process so a Redis outage is not a total blackout
+            logger.warning(f"⚠️ Event bus publish failed, delivering locally: {e}")
+            return 1 if await ws_manager.send_to_user(user_id, event) else 0
+
+    # ==========================================================
+    # PRESENCE
+    # ==========================================================
+    def _presence_changed(self, user_id: str):
+        """ws_manager hook (sync): write this worker's socket count for the user."""
+        try:
+            task = asyncio.get_running_loop().create_task(self._write_presence(user_id))
+        except RuntimeError:
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write_presence(self, user_id: str):
+        try:
+            count = ws_manager.local_count(user_id)
+            pipe = self._client().pipeline(transaction=True)
+            if count:
+                pipe.hset(presence_key(user_id), self.worker_id, _presence_value(count))
+                pipe.expire(presence_key(user_id), PRESENCE_TTL_SECONDS)
+            else:
+                pipe.hdel(presence_key(user_id), self.worker_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Presence update failed for {user_id}: {e}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                users = list(ws_manager.active_connections)
+                if not users:
+                    continue
+                pipe = self._client().pipeline(transaction=False)
+                for user_id in users:
+                    pipe.hset(presence_key(user_id), self.worker_id,
+                              _presence_value(ws_manager.local_count(user_id)))
+                    pipe.expire(presence_key(user_id), PRESENCE_TTL_SECONDS)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"⚠️ Presence heartbeat failed: {e}")
+
+    # ==========================================================
+    # LIFECYCLE
+    # ==========================================================
+    def start(self):
+        ws_manager.on_change = self._presence_changed
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        ws_manager.on_change = None
+        for task in (self._reader, self._heartbeat):
+            if task:
+                task.cancel()
+        self._reader = self._heartbeat = None
+        # Graceful shutdown: withdraw presence now instead of waiting for the TTL
+        try:
+            pipe = self._client().pipeline(transaction=False)
+            for user_id in list(ws_manager.active_connections):
+                pipe.hdel(presence_key(user_id), self.worker_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Presence cleanup failed: {e}")
+
+    async def _read(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._client().pubsub()
+                await pubsub.subscribe(worker_channel(self.worker_id))
+                logger.info(f"📡 Event bus subscribed as {self.worker_id}")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self.stats["received"] += 1
+                    user_id, _, payload = message["data"].partition("\n")
+                    if await ws_manager.send_to_user(user_id, payload):
+                        self.stats["delivered"] += 1
+                    else:
+                        self.stats["undelivered"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Event bus subscriber error: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "worker_id": self.worker_id,
+            "local_users": len(ws_manager.active_connections),
+            "local_sockets": sum(len(c) for c in ws_manager.active_connections.values()),
+        }
+
+
+_sync_redis = None
+
+
+def publish_event_sync(user_id: str, event: Dict[str, Any]) -> int:
+    """Worker-side publish (Celery tasks are synchronous); same routing as EventBus.publish."""
+    global _sync_redis
+    import redis
+    if _sync_redis is None:
+        _sync_redis = redis.Redis.from_url(celery_app.conf.broker_url, decode_responses=True)
+
+    workers, stale = _split_presence(_sync_redis.hgetall(presence_key(user_id)))
+    if stale:
+        _sync_redis.hdel(presence_key(user_id), *stale)
+    if not workers:
+        return 0
+    frame = _frame(user_id, event)
+    pipe = _sync_redis.pipeline(transaction=False)
+    for worker_id in workers:
+        pipe.publish(worker_channel(worker_id), frame)
+    receivers = pipe.execute()
+    dead = [worker_id for worker_id, count in zip(workers, receivers) if not count]
+    if dead:
+        _sync_redis.hdel(presence_key(user_id), *dead)
+    return len(workers) - len(dead)
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+event_bus = EventBus()
@@ -0,0 +1,102 @@
+# backend/core/executors.py
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+
+# ==========================================================
+# --- Pool sizes ---
+# ==========================================================
+# io_wait: threads parked on sockets (sync PyMongo, broker publishes, HTTP scrapers)
+# cpu:     short CPU-bound calls that release the GIL (bcrypt)
+# model:   native model inference (SentenceTransformer encode); torch already uses
+#          several cores per call, so more threads only adds contention
+# speech:  pyttsx3 / microphone; the engine is not thread-safe and a turn is sequential
+EXECUTOR_POOLS = {
+    "io_wait": int(os.getenv("EXECUTOR_IO_WAIT_WORKERS", "32")),
+    "cpu": int(os.getenv("EXECUTOR_CPU_WORKERS", str(os.cpu_count() or 2))),
+    "model": int(os.getenv("EXECUTOR_MODEL_WORKERS", "1")),
+    "speech": 1,
+}
+
+
+class BoundedExecutor:
+    """A named thread pool that tracks how busy it is and how long work queues for it."""
+
+    def __init__(self, name: str, max_workers: int, window: int = 500):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_queued = 0
+        self.queue_waits: Deque[float] = deque(maxlen=window)
+        self.run_times: Deque[float] = deque(maxlen=window)
+
+    def _wrap(self, fn: Callable, submitted_at: float) -> Callable:
+        def call():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.queue_waits.append(started - submitted_at)
+            try:
+                return fn()
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.run_times.append(time.monotonic() - started)
+        return call
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on this pool and await its result."""
+        call = functools.partial(fn, *args, **kwargs) if args or kwargs else fn
+        with self._lock:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self._wrap(call, time.monotonic()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self.queue_waits)
+            runs = sorted(self.run_times)
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "saturation": round(self.active / self.max_workers, 2),
+                "peak_queued": self.peak_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "p95_queue_wait_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+                "p95_run_ms": round(1000 * runs[int(0.95 * (len(runs) - 1))], 1) if runs else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+executors: Dict[str, BoundedExecutor] = {
+    name: BoundedExecutor(name, size) for name, size in EXECUTOR_POOLS.items()
+}
+
+
+async def run_in(pool: str, fn: Callable, *args, **kwargs) -> Any:
+    """await run_in("io_wait", collection.find_one, query)"""
+    return await executors[pool].run(fn, *args, **kwargs)
+
+
+def get_executor_stats() -> Dict[str, Any]:
+    return {name: executor.get_stats() for name, executor in executors.items()}
@@ -0,0 +1,207 @@
+# backend/core/notification_inbox.py
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.core.database import notifications_collection, redis_client
+from backend.core.event_bus import event_bus
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ==========================================================
+# --- Keys and limits ---
+# ==========================================================
+# inbox:<user_id>         STREAM of notifications, newest last; entry ids double as cursors
+# inbox:unread:<user_id>  SET of entry ids the user has not read yet
+INBOX_PREFIX = "inbox:"
+UNREAD_PREFIX = "inbox:unread:"
+INBOX_MAX_ITEMS = int(os.getenv("INBOX_MAX_ITEMS", "500"))
+INBOX_TTL_SECONDS = int(os.getenv("INBOX_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# XADD with approximate MAXLEN plus the unread marker, in one round trip. When the
+# append trims the stream (the first entry changes), unread ids older than the new
+# first entry are removed from the set, so unread_count never counts trimmed items.
+# KEYS: stream, unread set. ARGV: maxlen, ttl, then field/value pairs. Returns the entry id.
+_PUSH_SCRIPT = """
+local function older(a, b)
+    local a_ms, a_seq = string.match(a, '(%d+)-(%d+)')
+    local b_ms, b_seq = string.match(b, '(%d+)-(%d+)')
+    a_ms, b_ms = tonumber(a_ms), tonumber(b_ms)
+    return a_ms < b_ms or (a_ms == b_ms and tonumber(a_seq) < tonumber(b_seq))
+end
+local before = redis.call('XRANGE', KEYS[1], '-', '+', 'COUNT', 1)[1]
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', unpack(ARGV, 3))
+redis.call('SADD', KEYS[2], id)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+local first = redis.call('XRANGE', KEYS[1], '-', '+', 'COUNT', 1)[1][1]
+if before and before[1] ~= first then
+    local stale = {}
+    for _, unread in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+        if older(unread, first) then
+            stale[#stale + 1] = unread
+        end
+    end
+    for i = 1, #stale, 500 do
+        redis.call('SREM', KEYS[2], unpack(stale, i, math.min(i + 499, #stale)))
+    end
+end
+return id
+"""
+
+
+def _id_order(entry_id: str):
+    return tuple(int(part) for part in entry_id.split("-"))
+
+
+class NotificationInbox:
+    """
+    Per-user notification inbox shared by every API process.
+
+    Each push is also sent to the user's open sockets as a "notification" event;
+    the inbox is what a client reads when it (re)connects or polls.
+
+    Redis holds the live inbox (a capped stream plus an unread set, both expiring
+    INBOX_TTL_SECONDS after the last write); Mongo keeps an archive copy in the
+    `notifications` collection. Marking read is an SREM, so two tabs marking the
+    same item read never double count.
+    """
+
+    def __init__(self, redis=None, archive=None):
+        self.redis = redis or redis_client
+        self.archive = archive if archive is not None else notifications_collection
+        self._push_script = None
+
+    @staticmethod
+    def _keys(user_id: str):
+        return f"{INBOX_PREFIX}{user_id}", f"{UNREAD_PREFIX}{user_id}"
+
+    @staticmethod
+    def _entry(entry_id: str, fields: Dict[str, str], unread: set) -> Dict[str, Any]:
+        return {
+            "id": entry_id,
+            "type": fields.get("type", "reminder"),
+            "message": fields.get("message", ""),
+            "created": fields.get("created"),
+            "read": entry_id not in unread,
+        }
+
+    async def push(self, user_id: str, message: str, notification_type: str = "reminder") -> Dict[str, Any]:
+        """Append a notification and mark it unread; returns the stored item."""
+        stream_key, unread_key = self._keys(user_id)
+        created = datetime.now()
+        fields = {"type": notification_type, "message": message, "created": created.isoformat()}
+
+        if self._push_script is None:
+            self._push_script = self.redis.register_script(_PUSH_SCRIPT)
+        args = [INBOX_MAX_ITEMS, INBOX_TTL_SECONDS]
+        for name, value in fields.items():
+            args += [name, value]
+        entry_id = await self._push_script(keys=[stream_key, unread_key], args=args)
+
+        try:
+            await self.archive.insert_one({
+                "user_id": user_id,
+                "inbox_id": entry_id,
+                "type": notification_type,
+                "message": message,
+                "created": created,
+                "is_read": False,
+            })
+        except Exception as e:
+            # The live inbox is the source of truth; a missed archive write is only logged
+            logger.warning(f"⚠️ Notification archive write failed for {user_id}: {e}")
+
+        notification = self._entry(entry_id, fields, {entry_id})
+        try:
+            await event_bus.publish(user_id, {**notification, "type": "notification", "kind": notification_type})
+        except Exception as e:
+            logger.warning(f"⚠️ Notification push failed for {user_id}: {e}")
+        return notification
+
+    async def list(self, user_id: str, cursor: Optional[str] = None, limit: int = 20,
+                   unread_only: bool = False) -> Dict[str, Any]:
+        """
+        Newest first. Pass back `next_cursor` to continue after the last item; it is
+        None once the inbox is exhausted.
+        """
+        stream_key, unread_key = self._keys(user_id)
+        unread = set(await self.redis.smembers(unread_key))
+        if unread_only and not unread:
+            return {"notifications": [], "next_cursor": None, "unread_count": 0}
+
+        start = f"({cursor}" if cursor else "+"
+        items: List[Dict[str, Any]] = []
+        next_cursor = None
+        # Read in pages so unread_only can skip read items without loading the whole stream
+        while len(items) < limit:
+            page = await self.redis.xrevrange(stream_key, max=start, min="-", count=limit)
+            if not page:
+                next_cursor = None
+                break
+            for entry_id, fields in page:
+                next_cursor = entry_id
+                if unread_only and entry_id not in unread:
+                    continue
+                items.append(self._entry(entry_id, fields, unread))
+                if len(items) == limit:
+                    break
+            if len(page) < limit and len(items) < limit:
+                next_cursor = None
+                break
+            start = f"({next_cursor}"
+
+        return {"notifications": items, "next_cursor": next_cursor, "unread_count": len(unread)}
+
+    async def oldest_unread(self, user_id: str) -> Optional[Dict[str, Any]]:
+        stream_key, unread_key = self._keys(user_id)
+        unread = await self.redis.smembers(unread_key)
+        # Stream ids are "<ms>-<seq>", so oldest first is ascending order of the pair
+        ordered = sorted(unread, key=_id_order)
+        head = await self.redis.xrange(stream_key, min="-", max="+", count=1)
+        # Anything older than the stream's first entry was trimmed or expired
+        first = _id_order(head[0][0]) if head else None
+        stale, found = [], None
+        for entry_id in ordered:
+            if first is not None and _id_order(entry_id) >= first:
+                page = await self.redis.xrange(stream_key, min=entry_id, max=entry_id, count=1)
+                if page:
+                    found = self._entry(page[0][0], page[0][1], set(unread))
+                    break
+            stale.append(entry_id)
+        if stale:
+            await self.redis.srem(unread_key, *stale)
+        return found
+
+    async def unread_count(self, user_id: str) -> int:
+        return await self.redis.scard(self._keys(user_id)[1])
+
+    async def mark_read(self, user_id: str, ids: Optional[List[str]] = None) -> int:
+        """Mark the given ids (or everything, when ids is None) read; returns how many were unread."""
+        _, unread_key = self._keys(user_id)
+        if ids is None:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.smembers(unread_key)
+            pipe.delete(unread_key)
+            ids, _ = await pipe.execute()
+            ids = list(ids)
+            changed = len(ids)
+        else:
+            changed = await self.redis.srem(unread_key, *ids) if ids else 0
+
+        if changed:
+            try:
+                await self.archive.update_many(
+                    {"user_id": user_id, "inbox_id": {"$in": ids}},
+                    {"$set": {"is_read": True}}
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Notification archive update failed for {user_id}: {e}")
+        return changed
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+notification_inbox = NotificationInbox()
@@ -0,0 +1,37 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def normalize_vector(vec) -> np.ndarray:
+    """Return a unit-length float32 copy of an embedding (zero vectors stay zero)."""
+    arr = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm > 0 else arr
+
+
+def build_centroids(model, examples: Dict[str, List[str]]) -> Tuple[List[str], np.ndarray]:
+    """
+    Embed example phrases for each label and return (labels, centroid matrix).
+    Centroids are unit-normalised so a dot product gives cosine similarity.
+    """
+    labels = [label for label, phrases in examples.items() if phrases]
+    phrases = [phrase for label in labels for phrase in examples[label]]
+    vectors = np.asarray(model.encode(phrases), dtype=np.float32)
+
+    centroids = []
+    offset = 0
+    for label in labels:
+        count = len(examples[label])
+        block = np.array([normalize_vector(v) for v in vectors[offset:offset + count]])
+        centroids.append(normalize_vector(block.mean(axis=0)))
+        offset += count
+
+    return labels, np.vstack(centroids)
+
+
+def rank_labels(vec, labels: List[str], centroids: np.ndarray) -> List[Tuple[str, float]]:
+    """Score a vector against every centroid, best match first."""
+    scores = centroids @ normalize_vector(vec)
+    order = np.argsort(scores)[::-1]
+    return [(labels[i], float(scores[i])) for i in order]
@@ -0,0 +1,259 @@
+# backend/core/ws_manager.py
+import asyncio
+import json
+import os
+import random
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from fastapi import WebSocket
+
+from backend.core.logger import get_logger
+from backend.core.ws_protocol import encode, wrap
+
+logger = get_logger(__name__)
+
+# ==========================================================
+# --- Keepalive and limits ---
+# ==========================================================
+# The server sends {"type": "ping"} every WS_PING_INTERVAL seconds; a socket that has
+# sent nothing (pong or otherwise) for WS_PING_INTERVAL + WS_PING_TIMEOUT is half-open
+# and gets closed. WS_IDLE_TIMEOUT closes sockets with no user message at all (0 = never);
+# the client falls back to polling the inbox while it is disconnected.
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "25"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "1800"))
+WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "5"))
+# Share of compressible messages deflated here to estimate what permessage-deflate saves
+WS_COMPRESSION_SAMPLE_RATE = float(os.getenv("WS_COMPRESSION_SAMPLE_RATE", "0.1"))
+WS_COMPRESSION_MIN_BYTES = 256
+
+# Application close codes (4000-4999 are free for application use)
+CLOSE_PING_TIMEOUT = 4000
+CLOSE_IDLE = 4001
+CLOSE_TOO_MANY = 4002
+
+# Sockets sit under this id until their first message says who they are; not capped
+ANONYMOUS_USER = "default_user"
+
+
+class _Socket:
+    __slots__ = ("user_id", "connected_at", "last_seen", "last_active", "deflate", "protocol", "encoding")
+
+    def __init__(self, user_id: str, deflate: bool):
+        now = time.monotonic()
+        self.user_id = user_id
+        self.connected_at = now
+        self.last_seen = now
+        self.last_active = now
+        self.deflate = deflate
+        # Legacy flat JSON frames until the hello negotiates the envelope protocol
+        self.protocol = 0
+        self.encoding = "json"
+
+
+class ConnectionManager:
+    """
+    Open WebSocket connections per user in this process, so background work can push
+    to them. `on_change(user_id)` is called whenever a user's local socket count
+    changes; the event bus uses it to keep cross-process presence in Redis current.
+
+    run_keepalive() is one loop for all sockets: it pings, closes half-open sockets
+    and idle ones. Sockets are capped per user; the oldest one makes room.
+    """
+
+    def __init__(self):
+        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.on_change: Optional[Callable[[str], None]] = None
+        self._sockets: Dict[WebSocket, _Socket] = {}
+        self._keepalive: Optional[asyncio.Task] = None
+        self.stats = {
+            "opened": 0, "closed": 0, "pings": 0,
+            "evicted_ping_timeout": 0, "evicted_idle": 0, "evicted_over_cap": 0,
+            "messages_sent": 0, "bytes_sent": 0, "deflate_bytes_sent": 0,
+            "sampled_bytes": 0, "sampled_compressed_bytes": 0,
+        }
+
+    def _changed(self, user_id: str):
+        if self.on_change:
+            self.on_change(user_id)
+
+    def connect(self, user_id: str, ws: WebSocket) -> List[WebSocket]:
+        """Register a socket; returns older sockets of the user that must be closed to respect the cap."""
+        if ws not in self._sockets:
+            extensions = ws.headers.get("sec-websocket-extensions", "") if hasattr(ws, "headers") else ""
+            self._sockets[ws] = _Socket(user_id, "permessage-deflate" in extensions)
+            self.stats["opened"] += 1
+        self._sockets[ws].user_id = user_id
+
+        connections = self.active_connections.setdefault(user_id, [])
+        if ws not in connections:
+            connections.append(ws)
+            self._changed(user_id)
+
+        if user_id == ANONYMOUS_USER or WS_MAX_CONNECTIONS_PER_USER <= 0:
+            return []
+        overflow = connections[:-WS_MAX_CONNECTIONS_PER_USER]
+        for old in overflow:
+            self.disconnect(user_id, old)
+        self.stats["evicted_over_cap"] += len(overflow)
+        return overflow
+
+    def disconnect(self, user_id: str, ws: WebSocket):
+        connections = self.active_connections.get(user_id, [])
+        if ws in connections:
+            connections.remove(ws)
+            self._changed(user_id)
+        if not connections:
+            self.active_connections.pop(user_id, None)
+
+    def forget(self, user_id: str, ws: WebSocket):
+        """The socket is gone for good (endpoint exited)."""
+        self.disconnect(user_id, ws)
+        if self._sockets.pop(ws, None) is not None:
+            self.stats["closed"] += 1
+
+    def local_count(self, user_id: str) -> int:
+        return len(self.active_connections.get(user_id, []))
+
+    def move(self, old_user_id: str, new_user_id: str, ws: WebSocket) -> List[WebSocket]:
+        """The socket identified itself (first message carries the user id)."""
+        if old_user_id != new_user_id:
+            self.disconnect(old_user_id, ws)
+            return self.connect(new_user_id, ws)
+        return []
+
+    def touch(self, ws: WebSocket, active: bool = True):
+        """Record inbound traffic; pongs keep a socket alive but do not count as activity."""
+        meta = self._sockets.get(ws)
+        if meta:
+            meta.last_seen = time.monotonic()
+            if active:
+                meta.last_active = meta.last_seen
+
+    def set_protocol(self, ws: WebSocket, version: int, encoding: str):
+        meta = self._sockets.get(ws)
+        if meta:
+            meta.protocol, meta.encoding = version, encoding
+
+    def is_connected(self, user_id: str) -> bool:
+        return bool(self.active_connections.get(user_id))
+
+    # ==========================================================
+    # SENDING
+    # ==========================================================
+    def _account(self, ws: WebSocket, frame: Union[str, bytes]):
+        raw = frame if isinstance(frame, bytes) else frame.encode("utf-8")
+        size = len(raw)
+        self.stats["messages_sent"] += 1
+        self.stats["bytes_sent"] += size
+        meta = self._sockets.get(ws)
+        if not (meta and meta.deflate and size >= WS_COMPRESSION_MIN_BYTES):
+            return
+        self.stats["deflate_bytes_sent"] += size
+        if random.random() < WS_COMPRESSION_SAMPLE_RATE:
+            # Raw deflate, as permessage-deflate sends it
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            compressed = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.stats["sampled_bytes"] += size
+            self.stats["sampled_compressed_bytes"] += len(compressed) - 4
+
+    async def send(self, ws: WebSocket, payload: Union[Dict[str, Any], str]):
+        """Send one event, framed for the socket's protocol (legacy text, or an envelope as json/msgpack)."""
+        meta = self._sockets.get(ws)
+        if meta and meta.protocol >= 1:
+            event = json.loads(payload) if isinstance(payload, str) else payload
+            frame = encode(wrap(event), meta.encoding)
+        else:
+            frame = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+
+        if isinstance(frame, bytes):
+            await ws.send_bytes(frame)
+        else:
+            await ws.send_text(frame)
+        self._account(ws, frame)
+
+    async def send_to_user(self, user_id: str, payload: Union[Dict[str, Any], str]) -> int:
+        """Send to every open socket of a user; returns how many received it."""
+        text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+        delivered = 0
+        for ws in list(self.active_connections.get(user_id, [])):
+            try:
+                await self.send(ws, text)
+                delivered += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Dropping dead WebSocket for {user_id}: {e}")
+                self.disconnect(user_id, ws)
+        return delivered
+
+    async def close(self, ws: WebSocket, code: int, reason: str):
+        meta = self._sockets.get(ws)
+        if meta:
+            self.disconnect(meta.user_id, ws)
+        try:
+            await ws.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    # ==========================================================
+    # KEEPALIVE
+    # ==========================================================
+    async def _sweep(self):
+        now = time.monotonic()
+        for ws, meta in list(self._sockets.items()):
+            if ws not in self.active_connections.get(meta.user_id, []):
+                continue  # already closed, waiting for its endpoint to exit
+            if now - meta.last_seen > WS_PING_INTERVAL + WS_PING_TIMEOUT:
+                self.stats["evicted_ping_timeout"] += 1
+                logger.info(f"💤 Closing half-open WebSocket for {meta.user_id}")
+                await self.close(ws, CLOSE_PING_TIMEOUT, "ping timeout")
+            elif WS_IDLE_TIMEOUT and now - meta.last_active > WS_IDLE_TIMEOUT:
+                self.stats["evicted_idle"] += 1
+                await self.close(ws, CLOSE_IDLE, "idle")
+            else:
+                try:
+                    await self.send(ws, {"type": "ping"})
+                    self.stats["pings"] += 1
+                except Exception:
+                    await self.close(ws, CLOSE_PING_TIMEOUT, "send failed")
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            try:
+                await self._sweep()
+            except Exception as e:
+                logger.error(f"❌ WebSocket keepalive sweep failed: {e}")
+
+    def run_keepalive(self):
+        if self._keepalive is None or self._keepalive.done():
+            self._keepalive = asyncio.create_task(self._keepalive_loop())
+
+    def stop_keepalive(self):
+        if self._keepalive:
+            self._keepalive.cancel()
+            self._keepalive = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        sampled = self.stats["sampled_bytes"]
+        ratio = self.stats["sampled_compressed_bytes"] / sampled if sampled else None
+        deflate_sockets = sum(1 for meta in self._sockets.values() if meta.deflate)
+        return {
+            **self.stats,
+            "open_sockets": len(self._sockets),
+            "users": len(self.active_connections),
+            "deflate_sockets": deflate_sockets,
+            "compression_ratio_estimate": round(ratio, 3) if ratio is not None else None,
+            "bytes_saved_estimate": int(self.stats["deflate_bytes_sent"] * (1 - ratio)) if ratio is not None else 0,
+            "ping_interval": WS_PING_INTERVAL,
+            "ping_timeout": WS_PING_TIMEOUT,
+            "idle_timeout": WS_IDLE_TIMEOUT,
+            "max_connections_per_user": WS_MAX_CONNECTIONS_PER_USER,
+        }
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+ws_manager = ConnectionManager()
@@ -0,0 +1,105 @@
+# backend/core/ws_protocol.py
+import itertools
+import json
+import os
+from typing import Any, Dict, Optional, Tuple, Union
+
+# Optional binary encoding
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# ==========================================================
+# --- Envelope (protocol version 1) ---
+# ==========================================================
+# Every frame, both directions:
+#   {"v": 1, "id": "<sender's message id>", "type": "<type>", "re": "<id it answers>", "data": {...}}
+# "re" is omitted on unsolicited frames (pushes, client requests).
+#
+# Client -> server:
+#   hello      {"user_id", "protocol": 1, "encoding": "json" | "msgpack"}  (protocol 0/absent = legacy frames)
+#   message    {"text", "session_id"}       a chat turn; answered with ack, then reply (or error)
+#   inbox      {"cursor", "limit", "unread_only"}   answered with inbox
+#   mark_read  {"ids"}                      ids=None marks everything read; answered with ack
+#   ack        {"notification_id"}  re=<server id>   client received a notification; marks it read
+#   pong       {}                           answer to ping
+# Server -> client:
+#   hello, ack, reply, delta (reserved for streamed replies), task_ack, task_progress,
+#   task_result, notification, whatsapp_status, inbox, error, ping
+#
+# Exchanges are matched by id/re, so a socket can have several in flight at once.
+PROTOCOL_VERSION = 1
+ENCODINGS = ("json", "msgpack")
+CLIENT_TYPES = ("hello", "message", "inbox", "mark_read", "ack", "pong")
+SERVER_TYPES = ("hello", "ack", "reply", "delta", "task_ack", "task_progress", "task_result",
+                "notification", "whatsapp_status", "inbox", "error", "ping")
+
+_ids = itertools.count(1)
+_ID_PREFIX = f"{os.getpid():x}-"
+
+
+class ProtocolError(ValueError):
+    """A frame that is not a valid envelope; reported to the client as an error frame."""
+
+
+def next_id() -> str:
+    return f"{_ID_PREFIX}{next(_ids)}"
+
+
+def negotiate(hello: Dict[str, Any]) -> Tuple[int, str]:
+    """(protocol version, encoding) for a hello frame; msgpack falls back to json when not installed."""
+    try:
+        version = min(int(hello.get("protocol") or 0), PROTOCOL_VERSION)
+    except (TypeError, ValueError):
+        version = 0
+    encoding = hello.get("encoding", "json")
+    if version < 1 or encoding not in ENCODINGS or (encoding == "msgpack" and not MSGPACK_AVAILABLE):
+        encoding = "json"
+    return version, encoding
+
+
+def envelope(event_type: str, data: Optional[Dict[str, Any]] = None, re: Optional[str] = None) -> Dict[str, Any]:
+    frame = {"v": PROTOCOL_VERSION, "id": next_id(), "type": event_type, "data": data or {}}
+    if re is not None:
+        frame["re"] = re
+    return frame
+
+
+def wrap(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Legacy flat event ({"type": ..., fields}) -> envelope; envelopes pass through unchanged."""
+    if "v" in event:
+        return event
+    data = {key: value for key, value in event.items() if key not in ("type", "re")}
+    return envelope(event.get("type", "reply"), data, event.get("re"))
+
+
+def encode(frame: Dict[str, Any], encoding: str = "json") -> Union[str, bytes]:
+    """Text frame for json, binary frame for msgpack."""
+    if encoding == "msgpack":
+        return msgpack.packb(frame, use_bin_type=True, default=str)
+    return json.dumps(frame, default=str)
+
+
+def decode(raw: Union[str, bytes]) -> Dict[str, Any]:
+    """Parse an enveloped client frame (text = json, binary = msgpack)."""
+    try:
+        if isinstance(raw, bytes):
+            if not MSGPACK_AVAILABLE:
+                raise ProtocolError("binary frames need msgpack")
+            frame = msgpack.unpackb(raw, raw=False)
+        else:
+            frame = json.loads(raw)
+    except ProtocolError:
+        raise
+    except Exception as e:
+        raise ProtocolError(f"undecodable frame: {e}")
+
+    if not isinstance(frame, dict) or frame.get("type") not in CLIENT_TYPES:
+        raise ProtocolError("unknown frame type")
+    if not isinstance(frame.get("data", {}), dict):
+        raise ProtocolError("data must be an object")
+    frame.setdefault("data", {})
+    return frame
@@ -2,17 +2,27 @@
 import re
 import asyncio
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 from backend.core.logger import get_logger
+from backend.core.deadline import Deadline, budget
+from backend.core.executors import run_in
 from backend.llm.llm_handler import ask_gemini_with_context
 from backend.memory.memory_manager import MemoryManager
-from backend.tasks.task_utils import detect_task, run_task
+from backend.core.celery_results import TaskFailed
+from backend.core.event_bus import event_bus
+from backend.tasks.task_utils import detect_tasks, start_task, wait_for_task, task_timeout
+from backend.tasks.intent_classifier import IntentClassifier
 from backend.dialogue.personalization_engine import PersonalizationEngine
 from backend.loggers.personalization_logger import PersonalizationLogger
 
 logger = get_logger(__name__)
 
+# Share of the request deadline that memory/profile retrieval may use
+CONTEXT_BUDGET_SECONDS = 3.0
+# How long a background delivery keeps waiting for a slow task
+TASK_DELIVERY_TIMEOUT_SECONDS = 300.0
+
 
 class DialogueManager:
     """
@@ -29,66 +39,46 @@ class DialogueManager:
         self.personalization = personalization or PersonalizationEngine(memory)
         self.session_key_template = "session:{user_id}"
         self.logger = PersonalizationLogger()
-
-    async def handle_message(self, user_id: str, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
-        """Main dialogue entrypoint."""
+        self.intent_classifier = IntentClassifier(self.memory.model)
+        self._deliveries = set()  # background task deliveries (kept referenced until done)
+
+    async def handle_message(self, user_id: str, message: str, session_id: Optional[str] = None,
+                             async_tasks: bool = False) -> Dict[str, Any]:
+        """
+        Main dialogue entrypoint.
+        With async_tasks=True (WebSocket clients) a detected task is acknowledged at once with
+        its task id and the result is pushed to the user's sockets when the worker finishes.
+        """
         logger.info("Handling message for user=%s session=%s", user_id, session_id)
         timestamp = datetime.utcnow().isoformat()
         session_key = session_id or f"{user_id}:{int(datetime.utcnow().timestamp())}"
+        deadline = Deadline()
 
         # Step 1: Save user message
         await self._append_conversation(user_id, session_key, "user", message, timestamp)
 
         # Step 2: Detect and handle task
         try:
-            task_type, task_args = detect_task(message)
+            intents = await self._detect_tasks(message)
+            if len(intents) > 1:
+                logger.info(f"Detected {len(intents)} tasks for user={user_id}: {[t for t, _ in intents]}")
+                return await self._run_task_group(user_id, session_key, message, intents, deadline, timestamp)
+
+            task_type, task_args = intents[0] if intents else (None, {})
             if task_type:
                 logger.info(f"Detected task: {task_type} for user={user_id}")
-
-                # Run the task with proper async handling and timeout
-                try:
-                    # Use asyncio.wait_for to set a reasonable timeout
-                    task_result = await asyncio.wait_for(
-                        self._execute_task_with_retry(task_type, {**task_args, "user_id": user_id}),
-                        timeout=30.0  # 30 second timeout instead of default
-                    )
-                    
-                    # Store user activity safely
-                    await self.memory.append_user_activity(
-                        user_id,
-                        {
-                            "type": "task",
-                            "task_name": task_type,
-                            "result": task_result,
-                            "timestamp": timestamp,
-                        },
-                    )
-
-                    reply = (
-                        task_result.get("reply")
-                        if isinstance(task_result, dict)
-                        else str(task_result) or f"Executed {task_type} task successfully."
-                    )
-
-                    await self._append_conversation(user_id, session_key, "assistant", reply, timestamp)
-                    await self.logger.log_interaction(user_id, message, reply, {"task_type": task_type})
-
-                    return {"reply": reply, "metadata": {"task": True, "task_name": task_type, "task_result": task_result}}
-
-                except asyncio.TimeoutError:
-                    logger.error(f"Task {task_type} timed out for user={user_id}")
-                    timeout_reply = f"⏰ The {task_type} task is taking longer than expected. I'll notify you when it's complete."
-                    await self._append_conversation(user_id, session_key, "assistant", timeout_reply, timestamp)
-                    return {"reply": timeout_reply, "metadata": {"task": True, "task_name": task_type, "status": "timeout"}}
+                task_args = {**task_args, "user_id": user_id}
+                if async_tasks:
+                    return await self._dispatch_task_async(user_id, session_key, message, task_type, task_args)
+                return await self._run_task_inline(user_id, session_key, message, task_type, task_args, deadline, timestamp)
 
         except Exception as e:
             logger.exception("⚠️ Task execution failed for user=%s: %s", user_id, str(e))
 
-        # Step 3: Retrieve memory & preferences
-        short_context = await self.memory.get_session_conversation(user_id, session_key, limit=10)
-        long_context = await self.memory.get_long_term(user_id, limit=10)
-        semantic_context = await self.memory.retrieve_semantic_memory(user_id, message, top_k=5)
-        user_profile = await self.personalization.get_profile(user_id)
+        # Step 3: Retrieve memory & preferences (concurrently, bounded by the deadline)
+        short_context, long_context, semantic_context, user_profile = await self._gather_context(
+            user_id, session_key, message, deadline
+        )
 
         # Step 4: Build system prompt from personalization
         system_prompt = self._build_system_prompt(user_profile)
@@ -96,7 +86,7 @@ class DialogueManager:
 
         # Step 5: Ask Gemini for response
         try:
-            response = await ask_gemini_with_context(messages_for_llm, user_id, session_key)
+            response = await ask_gemini_with_context(messages_for_llm, user_id, session_key, deadline)
             assistant_text = response.get("text") if isinstance(response, dict) else str(response)
         except Exception as e:
             logger.exception("⚠️ Gemini API Error for user=%s: %s", user_id, str(e))
@@ -124,24 +114,199 @@ class DialogueManager:
             "metadata": {"task": False, "llm_meta": response if isinstance(response, dict) else {}},
         }
 
-    async def _execute_task_with_retry(self, task_type: str, task_args: Dict[str, Any]) -> Any:
-        """Execute task with proper async handling and optional retry logic."""
+    async def _detect_tasks(self, message: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Rules first (compound messages may yield several intents);
+        only unmatched messages pay for the embedding classifier.
+        """
+        intents = detect_tasks(message)
+        if intents:
+            self.intent_classifier.record_rule_match()
+            return intents
+
+        try:
+            task_type, score, margin = await run_in("model", self.intent_classifier.classify, message)
+        except Exception as e:
+            logger.warning(f"⚠️ Intent classifier failed, using LLM: {e}")
+            return []
+
+        self.intent_classifier.record_outcome(task_type)
+        if not task_type:
+            return []
+        logger.info(f"🧭 Embedding intent: {task_type} (score={score:.2f}, margin={margin:.2f})")
+        return [(task_type, {"query": message, "action": "create", "intent_source": "embedding"})]
+
+    async def _gather_context(self, user_id: str, session_key: str, message: str, deadline: Deadline):
+        """
+        Fetch short-term, long-term, semantic memory and the profile in parallel.
+        Any source that fails or misses the context budget degrades to empty.
+        """
+        sources = [
+            self.memory.get_session_conversation(user_id, session_key, limit=10),
+            self.memory.get_long_term(user_id, limit=10),
+            self.memory.retrieve_semantic_memory(user_id, message, top_k=5),
+            self.personalization.get_profile(user_id),
+        ]
+        tasks = [asyncio.ensure_future(source) for source in sources]
+        done, pending = await asyncio.wait(tasks, timeout=budget(deadline, CONTEXT_BUDGET_SECONDS))
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"⏰ {len(pending)} context source(s) missed the budget for user={user_id}")
+
+        results = []
+        for task, empty in zip(tasks, ([], [], [], {})):
+            if task in done and not task.cancelled() and task.exception() is None:
+                results.append(task.result() or empty)
+            else:
+                if task in done and not task.cancelled():
+                    logger.warning(f"⚠️ Context source failed for user={user_id}: {task.exception()}")
+                results.append(empty)
+        return results
+
+    # ==========================================================
+    # TASK EXECUTION & DELIVERY
+    # ==========================================================
+    async def _run_task_inline(self, user_id: str, session_key: str, message: str, task_type: str,
+                               task_args: Dict[str, Any], deadline: Deadline, timestamp: str) -> Dict[str, Any]:
+        """Wait for the task within the request deadline; hand it off to background delivery if it runs over."""
+        cached, task_id = await start_task(task_type, task_args)
+        if task_id is None:
+            return await self._complete_task(user_id, session_key, message, task_type, cached, timestamp)
+        try:
+            task_result = await wait_for_task(task_id, timeout=deadline.timeout(task_timeout(task_type)))
+        except asyncio.TimeoutError:
+            logger.error(f"Task {task_type} timed out for user={user_id}, delivering in background")
+            self._deliver_in_background(user_id, session_key, message, task_type, task_id)
+            timeout_reply = f"⏰ The {task_type} task is taking longer than expected. I'll notify you when it's complete."
+            await self._append_conversation(user_id, session_key, "assistant", timeout_reply, timestamp)
+            return {"reply": timeout_reply, "metadata": {"task": True, "task_name": task_type, "task_id": task_id, "status": "timeout"}}
+        except TaskFailed as e:
+            task_result = f"I understand you want help, but there was an issue: {str(e)}"
+
+        return await self._complete_task(user_id, session_key, message, task_type, task_result, timestamp)
+
+    async def _run_task_group(self, user_id: str, session_key: str, message: str,
+                              intents: List[Tuple[str, Dict[str, Any]]], deadline: Deadline,
+                              timestamp: str) -> Dict[str, Any]:
+        """
+        Run every intent of a compound message concurrently under the shared deadline
+        and merge the outcomes into one reply. Tasks that miss the deadline keep running
+        and are delivered in the background like any other slow task.
+        """
+        async def run_one(task_type: str, task_args: Dict[str, Any]):
+            task_args = {**task_args, "user_id": user_id}
+            cached, task_id = await start_task(task_type, task_args)
+            if task_id is None:
+                return task_type, task_args["query"], cached, "success"
+            try:
+                result = await wait_for_task(task_id, timeout=deadline.timeout(task_timeout(task_type)))
+                return task_type, task_args["query"], result, "success"
+            except asyncio.TimeoutError:
+                self._deliver_in_background(user_id, session_key, task_args["query"], task_type, task_id)
+                return task_type, task_args["query"], f"⏰ Still working on your {task_type} request, I'll notify you.", "timeout"
+            except TaskFailed as e:
+                return task_type, task_args["query"], f"I understand you want help, but there was an issue: {str(e)}", "failed"
+
+        outcomes = await asyncio.gather(
+            *(run_one(task_type, task_args) for task_type, task_args in intents), return_exceptions=True
+        )
+
+        replies, results = [], []
+        for (task_type, _), outcome in zip(intents, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Task {task_type} failed for user={user_id}: {outcome}")
+                outcome = (task_type, message, f"⚠️ The {task_type} request failed.", "failed")
+            task_type, clause, task_result, status = outcome
+            reply = task_result.get("reply") if isinstance(task_result, dict) else str(task_result)
+            replies.append(reply or f"Executed {task_type} task successfully.")
+            results.append({"task_name": task_type, "status": status, "result": task_result})
+            if status == "success":
+                await self.memory.append_user_activity(
+                    user_id, {"type": "task", "task_name": task_type, "result": task_result, "timestamp": timestamp}
+                )
+
+        merged = "\n\n".join(replies)
+        await self._append_conversation(user_id, session_key, "assistant", merged, timestamp)
+        await self.logger.log_interaction(user_id, message, merged, {"task_type": [r["task_name"] for r in results]})
+        return {"reply": merged, "metadata": {"task": True, "task_name": "group", "tasks": results}}
+
+    async def _dispatch_task_async(self, user_id: str, session_key: str, message: str, task_type: str,
+                                   task_args: Dict[str, Any]) -> Dict[str, Any]:
+        """Acknowledge immediately; the result is pushed over the WebSocket when ready."""
+        cached, task_id = await start_task(task_type, task_args)
+        if task_id is None:
+            # Memoized result: no worker round trip, answer inline
+            return await self._complete_task(user_id, session_key, message, task_type, cached,
+                                             datetime.utcnow().isoformat())
+        self._deliver_in_background(user_id, session_key, message, task_type, task_id)
+        ack = f"⏳ Working on your {task_type.replace('retrieve_', '')} request..."
+        return {"reply": ack, "metadata": {"task": True, "task_name": task_type, "task_id": task_id, "status": "queued"}}
+
+    async def _complete_task(self, user_id: str, session_key: str, message: str, task_type: str,
+                             task_result: Any, timestamp: str) -> Dict[str, Any]:
+        """Record a finished task in activity, short-term memory and the interaction log."""
+        # Store user activity safely
+        await self.memory.append_user_activity(
+            user_id,
+            {
+                "type": "task",
+                "task_name": task_type,
+                "result": task_result,
+                "timestamp": timestamp,
+            },
+        )
+
+        reply = (
+            task_result.get("reply")
+            if isinstance(task_result, dict)
+            else str(task_result) or f"Executed {task_type} task successfully."
+        )
+
+        await self._append_conversation(user_id, session_key, "assistant", reply, timestamp)
+        await self.logger.log_interaction(user_id, message, reply, {"task_type": task_type})
+
+        return {"reply": reply, "metadata": {"task": True, "task_name": task_type, "task_result": task_result}}
+
+    def _deliver_in_background(self, user_id: str, session_key: str, message: str, task_type: str, task_id: str):
+        delivery = asyncio.create_task(self._deliver_task_result(user_id, session_key, message, task_type, task_id))
+        self._deliveries.add(delivery)
+        delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver_task_result(self, user_id: str, session_key: str, message: str, task_type: str, task_id: str):
+        """Forward worker progress, then the result, to the user's WebSocket(s)."""
+        async def on_progress(state: str, meta: Dict[str, Any]):
+            if state == "PROGRESS":
+                await event_bus.publish(
+                    user_id, {"type": "task_progress", "task_id": task_id, "task_name": task_type, **meta}
+                )
+
+        status = "success"
         try:
-            # Run the task in executor to avoid blocking the event loop
-            task_result = await asyncio.get_event_loop().run_in_executor(
-                None, run_task, task_type, task_args
+            task_result = await wait_for_task(task_id, TASK_DELIVERY_TIMEOUT_SECONDS, on_progress)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            task_result = f"⚠️ The {task_type} task did not finish. Please try again."
+        except TaskFailed as e:
+            status = "failed"
+            task_result = f"I understand you want help, but there was an issue: {str(e)}"
+
+        try:
+            # Written to short-term memory even if nobody is connected right now
+            result = await self._complete_task(
+                user_id, session_key, message, task_type, task_result, datetime.utcnow().isoformat()
             )
-            
-            # Handle coroutine results
-            if asyncio.iscoroutine(task_result):
-                task_result = await task_result
-                
-            return task_result
-            
+            listeners = await event_bus.publish(user_id, {
+                "type": "task_result",
+                "task_id": task_id,
+                "task_name": task_type,
+                "status": status,
+                "response": result["reply"],
+            })
+            if not listeners:
+                logger.info(f"📭 No API process listening; task {task_id} result kept in session memory")
         except Exception as e:
-            logger.error(f"Task execution failed for {task_type}: {e}")
-            # Optional: Add retry logic here if needed
-            raise e
+            logger.error(f"❌ Failed to deliver task {task_id} for user={user_id}: {e}")
 
     async def _append_conversation(self, user_id: str, session_key: str, role: str, text: str, ts: str):
         """Store conversation message in Redis (short-term)."""
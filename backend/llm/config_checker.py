@@ -9,10 +9,15 @@ logger = get_logger(__name__)
 async def check_gemini_config():
     """Diagnose Gemini API configuration issues"""
     api_key = os.getenv("GOOGLE_API_KEY")
+    fake_url = os.getenv("FAKE_LLM_URL")
+    api_base = (os.getenv("GEMINI_API_BASE") or fake_url or "https://generativelanguage.googleapis.com").rstrip("/")
     
     issues = []
     
-    if not api_key:
+    if fake_url:
+        api_key = api_key or "fake-key"
+        issues.append(f"✅ Using fake LLM provider at {fake_url}")
+    elif not api_key:
         issues.append("❌ GOOGLE_API_KEY not found in environment variables")
     elif not api_key.startswith("AI"):
         issues.append("❌ GOOGLE_API_KEY format appears incorrect")
@@ -22,7 +27,7 @@ async def check_gemini_config():
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.get(
-                    f"https://generativelanguage.googleapis.com/v1/models?key={api_key}",
+                    f"{api_base}/v1/models?key={api_key}",
                     timeout=10
                 ) as resp:
                     if resp.status == 401:
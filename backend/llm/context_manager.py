@@ -3,13 +3,19 @@ import datetime
 from typing import List, Dict, Any, Optional
 from backend.memory.memory_manager import MemoryManager
 from backend.memory.redis_memory import redis_memory
-# from backend.llm.llm_handler import ask_gemini  # <-- Ensure this import is correct
+from backend.llm.topic_classifier import TopicClassifier, TOPIC_KEYWORDS
+from backend.core.executors import run_in
+from backend.core.deadline import Deadline
+# classify_text is imported lazily in _llm_detect_topic (llm_handler imports this module)
 
 class ContextManager:
     def __init__(self):
         self.memory_manager = MemoryManager()
+        # Reuses the MiniLM model already loaded by MemoryManager
+        self.topic_classifier = TopicClassifier(self.memory_manager.model)
     
-    async def build_context_for_query(self, user_id: str, session_key: str, query: str) -> Dict[str, Any]:
+    async def build_context_for_query(self, user_id: str, session_key: str, query: str,
+                                      deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Build comprehensive context for LLM response generation
         """
@@ -30,7 +36,8 @@ class ContextManager:
             
             # Conversation components
             "recent_messages": conversation_history[-4:],  # Last 4 messages
-            "conversation_topic": await self._detect_conversation_topic(conversation_history, query),
+            "conversation_topic": await self._detect_conversation_topic(
+                conversation_history, query, session_key, user_id, deadline),
             
             # User state
             "user_state": current_state,
@@ -54,23 +61,47 @@ class ContextManager:
     # ==========================================================
     # ENHANCED DYNAMIC TOPIC DETECTION SECTION
     # ==========================================================
-    async def _detect_conversation_topic(self, conversation_history: List[Dict], current_query: str) -> str:
-        """DYNAMIC topic detection - works for ANY subject"""
-        
+    async def _detect_conversation_topic(self, conversation_history: List[Dict], current_query: str,
+                                         session_key: Optional[str] = None, user_id: Optional[str] = None,
+                                         deadline: Optional[Deadline] = None) -> str:
+        """
+        Local embedding-based topic detection.
+        Only the new query is embedded per turn; the LLM is consulted for low-confidence sessions.
+        """
+        session_key = session_key or "default"
+        classifier = self.topic_classifier
+
         if not conversation_history:
+            # Nothing to seed from yet; the next turn seeds from this one via the history
             return "new_conversation"
-        
-        # Combine recent context
-        recent_text = " ".join([msg.get('content', '') for msg in conversation_history[-3:]]) + " " + current_query
-        recent_text = recent_text.lower()
-        
-        # Use LLM for dynamic topic detection (or fallback to keyword-based)
-        detected_topic = await self._llm_detect_topic(recent_text)
-        
+
+        if classifier.has_session(session_key):
+            # Repeated context builds within a turn pass an empty query - reuse the cached topic
+            if not current_query.strip():
+                return classifier.cached_topic(session_key) or "general"
+            state = await run_in("model", classifier.observe, session_key, [current_query])
+        else:
+            # First sight of this session: seed from the recent history plus the query
+            seed = [msg.get('content', '') for msg in conversation_history[-3:]] + [current_query]
+            state = await run_in("model", classifier.observe, session_key, seed)
+
+        if state.get("confident"):
+            return state["topic"]
+
+        needs_llm, cached = classifier.needs_llm(session_key)
+        if not needs_llm:
+            return cached or state.get("topic", "general")
+
+        history_text = " ".join(msg.get('content', '') for msg in conversation_history[-3:]).strip()
+        if not history_text:
+            return cached or state.get("topic", "general")
+        recent_text = f"{history_text} {current_query}"
+        detected_topic = await self._llm_detect_topic(recent_text.lower(), user_id, deadline)
+        classifier.remember_llm_topic(session_key, detected_topic)
         return detected_topic
 
-    async def _llm_detect_topic(self, text: str) -> str:
-        """Use LLM to detect ANY topic dynamically"""
+    async def _llm_detect_topic(self, text: str, user_id: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+        """Use LLM to detect ANY topic dynamically (inside the caller's deadline and quota)"""
         try:
             prompt = f"""
             Analyze this conversation text and identify the MAIN topic being discussed.
@@ -80,9 +111,12 @@ class ContextManager:
 
             Topic:"""
             
-            # Use your existing Gemini call
-            response = await ask_gemini([{"role": "user", "content": prompt}], "system")
-            topic = response.get("text", "general").strip().lower()
+            from backend.llm.llm_handler import classify_text
+
+            response = await classify_text(prompt, user_id, deadline)
+            if response is None:
+                return self._keyword_fallback_topic(text)
+            topic = response.strip().lower()
             
             # Clean up response
             if len(topic) > 30:  # Too long, use fallback
@@ -97,19 +131,7 @@ class ContextManager:
         """Fallback topic detection using broader categories"""
         text_lower = text.lower()
         
-        # Broader categories - easily expandable
-        category_patterns = {
-            "sports": ["cricket", "football", "sports", "game", "match", "player", "team"],
-            "technology": ["computer", "phone", "app", "software", "tech", "programming"],
-            "food": ["food", "restaurant", "cook", "eat", "meal", "recipe"],
-            "travel": ["travel", "trip", "visit", "go to", "vacation", "flight"],
-            "work": ["work", "job", "office", "career", "project", "meeting"],
-            "entertainment": ["movie", "music", "show", "book", "game", "entertainment"],
-            "health": ["health", "exercise", "doctor", "hospital", "fitness", "diet"],
-            "shopping": ["buy", "purchase", "shop", "shopping", "store", "price"]
-        }
-        
-        for category, keywords in category_patterns.items():
+        for category, keywords in TOPIC_KEYWORDS.items():
             if any(keyword in text_lower for keyword in keywords):
                 return category
         
@@ -0,0 +1,459 @@
+# backend/llm/fake_provider.py
+"""
+Deterministic stand-in for the LLM providers, for offline load testing.
+
+Speaks the wire formats used by llm_handler / fallback_handler:
+- Gemini:    POST /v1beta/models/{model}:generateContent
+             POST /v1beta/models/{model}:streamGenerateContent  (?alt=sse or JSON array)
+             GET  /v1beta/models, GET /v1/models
+- OpenAI:    POST /v1/chat/completions  (stream=true -> SSE)
+- Anthropic: POST /v1/messages          (stream=true -> SSE events)
+- Ollama:    POST /api/generate         (stream defaults to true -> NDJSON)
+
+Run it:
+    python -m backend.llm.fake_provider --port 8099 --latency lognormal:-1.2,0.4 \\
+        --token-rate 80 --error-rate 0.02 --error-codes 429,503 --seed 7
+
+Point the app at it:
+    FAKE_LLM_URL=http://localhost:8099
+(or GEMINI_API_BASE / OPENAI_BASE_URL / ANTHROPIC_BASE_URL / OLLAMA_BASE_URL individually)
+
+Every option can also be set with a FAKE_LLM_* environment variable.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MODELS = [
+    "gemini-2.0-flash",
+    "gemini-2.0-flash-exp",
+    "gemini-2.5-flash-preview-09-2025",
+    "gemini-2.5-flash-lite-preview-09-2025",
+]
+
+FILLER_WORDS = (
+    "sure here is a short answer based on what you asked and the context we have "
+    "so far let me know if you would like more detail on any part of this"
+).split()
+
+
+# ==========================================================
+# --- Configuration ---
+# ==========================================================
+class LatencyDistribution:
+    """Time-to-first-token distribution, parsed from 'kind:arg1,arg2'."""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exp")
+
+    def __init__(self, spec: str):
+        kind, _, args = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}' (expected one of {self.KINDS})")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a.strip()] or [0.0]
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        a = self.args
+        if self.kind == "fixed":
+            value = a[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(a[0], a[1] if len(a) > 1 else a[0])
+        elif self.kind == "normal":
+            value = rng.gauss(a[0], a[1] if len(a) > 1 else 0.0)
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(a[0], a[1] if len(a) > 1 else 0.0)
+        else:
+            value = rng.expovariate(1.0 / a[0]) if a[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+class FakeProviderConfig:
+    def __init__(self, latency: str = "fixed:0.05", token_rate: float = 0.0, error_rate: float = 0.0,
+                 error_codes: str = "429,500,503", hang_rate: float = 0.0, response_tokens: int = 60,
+                 canned_path: Optional[str] = None, seed: int = 0):
+        self.latency = LatencyDistribution(latency)
+        self.token_rate = token_rate              # tokens/second; 0 means instant
+        self.error_rate = error_rate
+        self.error_codes = [int(c) for c in str(error_codes).split(",") if c.strip()]
+        self.hang_rate = hang_rate                # requests that never answer (client timeout path)
+        self.response_tokens = response_tokens
+        self.seed = seed
+        self.canned = self._load_canned(canned_path)
+
+    @staticmethod
+    def _load_canned(path: Optional[str]) -> List[Tuple[re.Pattern, str]]:
+        """Canned file: JSON list of {"match": "<regex>", "response": "<text>"}."""
+        if not path:
+            return []
+        with open(path, encoding="utf-8") as fh:
+            entries = json.load(fh)
+        return [(re.compile(e["match"], re.IGNORECASE), e["response"]) for e in entries]
+
+    @classmethod
+    def from_env(cls) -> "FakeProviderConfig":
+        return cls(
+            latency=os.getenv("FAKE_LLM_LATENCY", "fixed:0.05"),
+            token_rate=float(os.getenv("FAKE_LLM_TOKEN_RATE", "0")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            error_codes=os.getenv("FAKE_LLM_ERROR_CODES", "429,500,503"),
+            hang_rate=float(os.getenv("FAKE_LLM_HANG_RATE", "0")),
+            response_tokens=int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "60")),
+            canned_path=os.getenv("FAKE_LLM_CANNED"),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+
+# ==========================================================
+# --- Deterministic behaviour ---
+# ==========================================================
+class FakeBehaviour:
+    """
+    Decides latency, errors and reply text for each request.
+    The RNG is seeded from (seed, provider, prompt, nth occurrence of that prompt),
+    so replaying the same request sequence reproduces the same run.
+    """
+
+    def __init__(self, config: FakeProviderConfig):
+        self.config = config
+        self._occurrences: Dict[str, int] = defaultdict(int)
+        self.stats = defaultdict(int)
+
+    def plan(self, provider: str, prompt: str) -> Dict[str, Any]:
+        key = f"{provider}:{prompt}"
+        occurrence = self._occurrences[key]
+        self._occurrences[key] += 1
+        digest = hashlib.sha256(f"{self.config.seed}:{key}:{occurrence}".encode()).hexdigest()
+        rng = random.Random(int(digest[:16], 16))
+
+        self.stats[f"{provider}_requests"] += 1
+        if self.config.hang_rate and rng.random() < self.config.hang_rate:
+            self.stats[f"{provider}_hangs"] += 1
+            return {"hang": True}
+        if self.config.error_rate and self.config.error_codes and rng.random() < self.config.error_rate:
+            status = rng.choice(self.config.error_codes)
+            self.stats[f"{provider}_errors_{status}"] += 1
+            return {"error": status, "latency": self.config.latency.sample(rng)}
+
+        return {"latency": self.config.latency.sample(rng), "text": self._reply_text(prompt, rng)}
+
+    def _reply_text(self, prompt: str, rng: random.Random) -> str:
+        for pattern, response in self.config.canned:
+            if pattern.search(prompt):
+                return response
+        words = [rng.choice(FILLER_WORDS) for _ in range(max(1, self.config.response_tokens))]
+        return " ".join(words).capitalize() + "."
+
+    def token_delay(self) -> float:
+        return 1.0 / self.config.token_rate if self.config.token_rate > 0 else 0.0
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word 'tokens' that keep their trailing space."""
+    parts = text.split(" ")
+    return [p + (" " if i < len(parts) - 1 else "") for i, p in enumerate(parts)]
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text.split()) * 1.3)) if text else 0
+
+
+# ==========================================================
+# --- Wire formats ---
+# ==========================================================
+def _gemini_prompt(body: Dict) -> str:
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            texts.append(part.get("text", ""))
+    return "\n".join(texts)
+
+
+def _gemini_chunk(text: str, model: str, prompt_tokens: int, output_tokens: int, final: bool) -> Dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+        "modelVersion": model,
+    }
+
+
+def _messages_prompt(messages: List[Dict]) -> str:
+    texts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        texts.append(str(content))
+    return "\n".join(texts)
+
+
+def _error_body(provider: str, status: int) -> Dict:
+    message = "Resource has been exhausted (e.g. check quota)." if status == 429 else "Injected upstream failure."
+    if provider == "gemini":
+        return {"error": {"code": status, "message": message, "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"}}
+    if provider == "anthropic":
+        return {"type": "error", "error": {"type": "rate_limit_error" if status == 429 else "api_error", "message": message}}
+    if provider == "ollama":
+        return {"error": message}
+    return {"error": {"message": message, "type": "rate_limit_exceeded" if status == 429 else "server_error", "code": status}}
+
+
+class FakeProviderServer:
+    def __init__(self, config: FakeProviderConfig):
+        self.config = config
+        self.behaviour = FakeBehaviour(config)
+        self.started_at = time.time()
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1beta/models", self.gemini_list_models)
+        app.router.add_get("/v1/models", self.gemini_list_models)
+        app.router.add_post("/v1beta/models/{model_action}", self.gemini_generate)
+        app.router.add_post("/v1/chat/completions", self.openai_chat)
+        app.router.add_post("/v1/messages", self.anthropic_messages)
+        app.router.add_post("/api/generate", self.ollama_generate)
+        app.router.add_get("/_fake/stats", self.get_stats)
+        return app
+
+    async def _prepare(self, provider: str, prompt: str) -> Tuple[Optional[web.Response], Dict]:
+        """Apply the latency/error plan; returns an error response or the plan to answer with."""
+        plan = self.behaviour.plan(provider, prompt)
+        if plan.get("hang"):
+            await asyncio.sleep(3600)
+        await asyncio.sleep(plan.get("latency", 0.0))
+        if plan.get("error"):
+            status = plan["error"]
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return web.json_response(_error_body(provider, status), status=status, headers=headers), plan
+        return None, plan
+
+    async def _stream_tokens(self, text: str):
+        delay = self.behaviour.token_delay()
+        for token in _tokens(text):
+            if delay:
+                await asyncio.sleep(delay)
+            yield token
+
+    async def _sleep_for_tokens(self, text: str):
+        delay = self.behaviour.token_delay()
+        if delay:
+            await asyncio.sleep(delay * len(_tokens(text)))
+
+    # --- Gemini ---
+    async def gemini_list_models(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [
+            {"name": f"models/{m}", "supportedGenerationMethods": ["generateContent", "streamGenerateContent"]}
+            for m in DEFAULT_MODELS
+        ]})
+
+    async def gemini_generate(self, request: web.Request) -> web.StreamResponse:
+        model, _, action = request.match_info["model_action"].partition(":")
+        body = await request.json()
+        prompt = _gemini_prompt(body)
+        error, plan = await self._prepare("gemini", prompt)
+        if error:
+            return error
+
+        text = plan["text"]
+        prompt_tokens = _count_tokens(prompt)
+        max_tokens = body.get("generationConfig", {}).get("maxOutputTokens")
+        if max_tokens:
+            text = " ".join(text.split()[:max_tokens])
+
+        if action == "streamGenerateContent":
+            sse = request.query.get("alt") == "sse"
+            response = web.StreamResponse(headers={
+                "Content-Type": "text/event-stream" if sse else "application/json"
+            })
+            await response.prepare(request)
+            if not sse:
+                await response.write(b"[")
+            produced = 0
+            first = True
+            async for token in self._stream_tokens(text):
+                produced += 1
+                chunk = json.dumps(_gemini_chunk(token, model, prompt_tokens, produced, False))
+                if sse:
+                    await response.write(f"data: {chunk}\r\n\r\n".encode())
+                else:
+                    await response.write(((b"" if first else b",\r\n") + chunk.encode()))
+                first = False
+            final = json.dumps(_gemini_chunk("", model, prompt_tokens, produced, True))
+            await response.write(f"data: {final}\r\n\r\n".encode() if sse else (b",\r\n" + final.encode() + b"]"))
+            await response.write_eof()
+            return response
+
+        await self._sleep_for_tokens(text)
+        return web.json_response(_gemini_chunk(text, model, prompt_tokens, _count_tokens(text), True))
+
+    # --- OpenAI ---
+    async def openai_chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "gpt-3.5-turbo")
+        prompt = _messages_prompt(body.get("messages", []))
+        error, plan = await self._prepare("openai", prompt)
+        if error:
+            return error
+
+        text = plan["text"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            async for token in self._stream_tokens(text):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            last = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            await response.write(f"data: {json.dumps(last)}\n\ndata: [DONE]\n\n".encode())
+            await response.write_eof()
+            return response
+
+        await self._sleep_for_tokens(text)
+        prompt_tokens, completion_tokens = _count_tokens(prompt), _count_tokens(text)
+        return web.json_response({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    # --- Anthropic ---
+    async def anthropic_messages(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "claude-3-haiku-20240307")
+        prompt = _messages_prompt(body.get("messages", []))
+        error, plan = await self._prepare("anthropic", prompt)
+        if error:
+            return error
+
+        text = plan["text"]
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        input_tokens, output_tokens = _count_tokens(prompt), _count_tokens(text)
+
+        if body.get("stream"):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+
+            async def event(name: str, data: Dict):
+                await response.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+
+            await event("message_start", {"type": "message_start", "message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "stop_reason": None, "usage": {"input_tokens": input_tokens, "output_tokens": 0}}})
+            await event("content_block_start", {"type": "content_block_start", "index": 0,
+                                                "content_block": {"type": "text", "text": ""}})
+            async for token in self._stream_tokens(text):
+                await event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                    "delta": {"type": "text_delta", "text": token}})
+            await event("content_block_stop", {"type": "content_block_stop", "index": 0})
+            await event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                                          "usage": {"output_tokens": output_tokens}})
+            await event("message_stop", {"type": "message_stop"})
+            await response.write_eof()
+            return response
+
+        await self._sleep_for_tokens(text)
+        return web.json_response({
+            "id": message_id, "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        })
+
+    # --- Ollama ---
+    async def ollama_generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "llama2")
+        prompt = body.get("prompt", "")
+        error, plan = await self._prepare("ollama", prompt)
+        if error:
+            return error
+
+        text = plan["text"]
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+        if body.get("stream", True):
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            async for token in self._stream_tokens(text):
+                line = {"model": model, "created_at": created_at, "response": token, "done": False}
+                await response.write((json.dumps(line) + "\n").encode())
+            done = {"model": model, "created_at": created_at, "response": "", "done": True,
+                    "prompt_eval_count": _count_tokens(prompt), "eval_count": _count_tokens(text)}
+            await response.write((json.dumps(done) + "\n").encode())
+            await response.write_eof()
+            return response
+
+        await self._sleep_for_tokens(text)
+        return web.json_response({
+            "model": model, "created_at": created_at, "response": text, "done": True,
+            "prompt_eval_count": _count_tokens(prompt), "eval_count": _count_tokens(text),
+        })
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "latency": self.config.latency.spec,
+            "token_rate": self.config.token_rate,
+            "counters": dict(self.behaviour.stats),
+        })
+
+
+def main():
+    env = FakeProviderConfig.from_env()
+    parser = argparse.ArgumentParser(description="Fake Gemini/OpenAI/Anthropic/Ollama server for load testing")
+    parser.add_argument("--host", default=os.getenv("FAKE_LLM_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_LLM_PORT", "8099")))
+    parser.add_argument("--latency", default=env.latency.spec,
+                        help="fixed:S | uniform:LO,HI | normal:MU,SD | lognormal:MU,SIGMA | exp:MEAN (seconds)")
+    parser.add_argument("--token-rate", type=float, default=env.token_rate, help="tokens per second, 0 = instant")
+    parser.add_argument("--error-rate", type=float, default=env.error_rate)
+    parser.add_argument("--error-codes", default=",".join(str(c) for c in env.error_codes))
+    parser.add_argument("--hang-rate", type=float, default=env.hang_rate)
+    parser.add_argument("--response-tokens", type=int, default=env.response_tokens)
+    parser.add_argument("--canned", default=os.getenv("FAKE_LLM_CANNED"),
+                        help='JSON file: [{"match": "<regex>", "response": "<text>"}]')
+    parser.add_argument("--seed", type=int, default=env.seed)
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(
+        latency=args.latency, token_rate=args.token_rate, error_rate=args.error_rate,
+        error_codes=args.error_codes, hang_rate=args.hang_rate, response_tokens=args.response_tokens,
+        canned_path=args.canned, seed=args.seed,
+    )
+    logger.info(f"🧪 Fake LLM provider on {args.host}:{args.port} (latency={args.latency}, seed={args.seed})")
+    web.run_app(FakeProviderServer(config).build_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 # backend/llm/fallback_handler.py
 import os
 import asyncio
-from backend.llm.llm_handler import ask_gemini, check_gemini_health
+from typing import Optional
+from backend.llm.llm_handler import ask_gemini, check_gemini_health, degraded_reply, remember_reply, MIN_ATTEMPT_SECONDS
+from backend.llm.quota_manager import quota_manager, estimate_tokens, parse_retry_after, MAX_QUEUE_WAIT_SECONDS
+from backend.core.deadline import Deadline, budget
 from backend.core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -20,30 +23,53 @@ try:
 except ImportError:
     ANTHROPIC_AVAILABLE = False
 
-# Load keys
-OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-ANTHROPIC_KEY = os.getenv("ANTHROPIC_API_KEY")
+# Load keys and endpoints (FAKE_LLM_URL points every provider at backend/llm/fake_provider.py)
+FAKE_LLM_URL = os.getenv("FAKE_LLM_URL")
+OPENAI_KEY = os.getenv("OPENAI_API_KEY") or ("fake-key" if FAKE_LLM_URL else None)
+ANTHROPIC_KEY = os.getenv("ANTHROPIC_API_KEY") or ("fake-key" if FAKE_LLM_URL else None)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or (f"{FAKE_LLM_URL.rstrip('/')}/v1" if FAKE_LLM_URL else None)
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or FAKE_LLM_URL
+OLLAMA_BASE_URL = (os.getenv("OLLAMA_BASE_URL") or FAKE_LLM_URL or "http://localhost:11434").rstrip("/")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
+OPENAI_MODEL = "gpt-3.5-turbo"  # More widely available
+CLAUDE_MODEL = "claude-3-haiku-20240307"  # Cheaper model
+
+
+def _report_sdk_rate_limit(provider: str, model: str, error: Exception) -> bool:
+    """Turn an SDK 429 into a quota cooldown; returns True if it was one."""
+    if getattr(error, "status_code", None) != 429:
+        return False
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    quota_manager.report_rate_limited(provider, model, parse_retry_after(retry_after))
+    return True
 
 # ============================
 # Local LLaMA Fallback (Ollama)
 # ============================
-async def ask_local_llama(prompt: str) -> str:
+async def ask_local_llama(prompt: str, user_id=None, timeout: float = 30) -> str:
     """Fallback to local LLaMA via Ollama"""
+    max_wait = min(MAX_QUEUE_WAIT_SECONDS, timeout)
+    if not await quota_manager.acquire("ollama", OLLAMA_MODEL, user_id, estimate_tokens(prompt, 500), max_wait=max_wait):
+        return "⚠️ Local model busy."
     try:
         import aiohttp
         async with aiohttp.ClientSession() as session:
             async with session.post(
-                "http://localhost:11434/api/generate",
+                f"{OLLAMA_BASE_URL}/api/generate",
                 json={
-                    "model": "llama2",  # Use a model that's commonly available
+                    "model": OLLAMA_MODEL,  # llama2 is commonly available
                     "prompt": prompt,
                     "stream": False
                 },
-                timeout=aiohttp.ClientTimeout(total=30)
+                timeout=aiohttp.ClientTimeout(total=timeout)
             ) as resp:
                 if resp.status == 200:
                     data = await resp.json()
                     return data.get("response", "⚠️ Local model returned empty response.")
+                elif resp.status == 429:
+                    quota_manager.report_rate_limited("ollama", OLLAMA_MODEL, parse_retry_after(resp.headers.get("Retry-After")))
+                    return "⚠️ Local model rate limited."
                 else:
                     return f"⚠️ Local model error: HTTP {resp.status}"
     except aiohttp.ClientConnectorError:
@@ -57,93 +83,135 @@ async def ask_local_llama(prompt: str) -> str:
 # ============================
 # OpenAI Fallback
 # ============================
-async def ask_openai(prompt: str) -> str:
+async def ask_openai(prompt: str, user_id=None, timeout: float = 30) -> str:
     """Fallback to OpenAI"""
     if not OPENAI_AVAILABLE or not OPENAI_KEY:
         return "⚠️ OpenAI not configured."
+    estimated_tokens = estimate_tokens(prompt, 500)
+    max_wait = min(MAX_QUEUE_WAIT_SECONDS, timeout)
+    if not await quota_manager.acquire("openai", OPENAI_MODEL, user_id, estimated_tokens, max_wait=max_wait):
+        return "⚠️ OpenAI over quota."
     try:
-        client = AsyncOpenAI(api_key=OPENAI_KEY)
+        # max_retries=0: a 429 becomes a routing decision, not an SDK retry loop
+        client = AsyncOpenAI(api_key=OPENAI_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
         response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",  # More widely available
+            model=OPENAI_MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
-            max_tokens=500
+            max_tokens=500,
+            timeout=timeout
         )
+        usage = getattr(response, "usage", None)
+        await quota_manager.record_usage("openai", OPENAI_MODEL, estimated_tokens, getattr(usage, "total_tokens", None))
         return response.choices[0].message.content
     except Exception as e:
+        if _report_sdk_rate_limit("openai", OPENAI_MODEL, e):
+            return "⚠️ OpenAI rate limited."
         logger.error(f"OpenAI fallback failed: {e}")
         return f"⚠️ OpenAI service error: {str(e)}"
 
 # ============================
 # Anthropic (Claude) Fallback
 # ============================
-async def ask_claude(prompt: str) -> str:
+async def ask_claude(prompt: str, user_id=None, timeout: float = 30) -> str:
     """Fallback to Claude"""
     if not ANTHROPIC_AVAILABLE or not ANTHROPIC_KEY:
         return "⚠️ Claude not configured."
+    estimated_tokens = estimate_tokens(prompt, 500)
+    max_wait = min(MAX_QUEUE_WAIT_SECONDS, timeout)
+    if not await quota_manager.acquire("anthropic", CLAUDE_MODEL, user_id, estimated_tokens, max_wait=max_wait):
+        return "⚠️ Claude over quota."
     try:
-        client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_KEY)
+        client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_KEY, base_url=ANTHROPIC_BASE_URL, max_retries=0)
         message = await client.messages.create(
-            model="claude-3-haiku-20240307",  # Cheaper model
+            model=CLAUDE_MODEL,
             max_tokens=500,
             temperature=0.7,
             messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
         )
+        usage = getattr(message, "usage", None)
+        if usage is not None:
+            await quota_manager.record_usage("anthropic", CLAUDE_MODEL, estimated_tokens,
+                                             usage.input_tokens + usage.output_tokens)
         return message.content[0].text
     except Exception as e:
+        if _report_sdk_rate_limit("anthropic", CLAUDE_MODEL, e):
+            return "⚠️ Claude rate limited."
         logger.error(f"Claude fallback failed: {e}")
         return f"⚠️ Claude service error: {str(e)}"
 
 # ============================
 # Unified Fallback Layer
 # ============================
-async def ask_with_fallback(messages, user_id=None):
+async def ask_with_fallback(messages, user_id=None, deadline: Optional[Deadline] = None):
     """
-    Main LLM handler with fallback chain
+    Main LLM handler with fallback chain.
+    Each provider only gets the budget left on the deadline; once it runs out the chain
+    stops and returns a cached or degraded reply instead of trying the next provider.
     """
     if not messages:
         return {"text": "Please enter a message.", "raw_response": {}}
     
     prompt = messages[-1]["content"]
 
+    def out_of_time() -> bool:
+        return deadline is not None and deadline.remaining() < MIN_ATTEMPT_SECONDS
+
     # 1. Check Gemini health first
-    gemini_health = await check_gemini_health()
-    if gemini_health["status"] == "healthy":
+    try:
+        gemini_health = await asyncio.wait_for(check_gemini_health(), timeout=budget(deadline, 10))
+    except asyncio.TimeoutError:
+        gemini_health = {"status": "timeout"}
+    if gemini_health["status"] == "healthy" and not out_of_time():
         try:
-            gemini_response = await ask_gemini(messages, user_id)
+            gemini_response = await ask_gemini(messages, user_id, deadline)
+            if gemini_response.get("degraded"):
+                return gemini_response
             if (gemini_response and 
                 gemini_response.get("text") and 
                 not gemini_response["text"].startswith("⚠️") and
                 not gemini_response["text"].startswith("❌")):
+                remember_reply(user_id, prompt, gemini_response["text"])
                 return gemini_response
         except Exception as e:
             logger.error(f"Gemini failure: {e}")
     
+    if out_of_time():
+        return degraded_reply(user_id, prompt)
     logger.warning("Gemini failed. Trying OpenAI...")
 
     # 2. Try OpenAI
     try:
-        openai_text = await ask_openai(prompt)
+        openai_text = await ask_openai(prompt, user_id, budget(deadline, 30))
         if openai_text and not openai_text.startswith("⚠️"):
+            remember_reply(user_id, prompt, openai_text)
             return {"text": openai_text, "raw_response": {"via": "openai"}}
     except Exception as e:
         logger.error(f"OpenAI fallback error: {e}")
 
+    if out_of_time():
+        return degraded_reply(user_id, prompt)
     logger.warning("OpenAI failed. Trying Claude...")
 
     # 3. Try Claude
     try:
-        claude_text = await ask_claude(prompt)
+        claude_text = await ask_claude(prompt, user_id, budget(deadline, 30))
         if claude_text and not claude_text.startswith("⚠️"):
+            remember_reply(user_id, prompt, claude_text)
             return {"text": claude_text, "raw_response": {"via": "claude"}}
     except Exception as e:
         logger.error(f"Claude fallback error: {e}")
 
+    if out_of_time():
+        return degraded_reply(user_id, prompt)
     logger.warning("Claude failed. Trying LLaMA...")
 
     # 4. Final fallback to local LLaMA
     try:
-        local_text = await ask_local_llama(prompt)
+        local_text = await ask_local_llama(prompt, user_id, budget(deadline, 30))
+        if local_text.startswith("⚠️") and deadline is not None and deadline.expired:
+            return degraded_reply(user_id, prompt)
         return {"text": local_text, "raw_response": {"via": "local"}}
     except Exception as e:
         logger.error(f"All fallbacks failed: {e}")
@@ -158,7 +226,8 @@ async def get_llm_health():
         "gemini": await check_gemini_health(),
         "openai": {"status": "configured" if OPENAI_KEY else "not_configured"},
         "claude": {"status": "configured" if ANTHROPIC_KEY else "not_configured"},
-        "local_llama": {"status": "unknown"}
+        "local_llama": {"status": "unknown"},
+        "quotas": quota_manager.get_stats()
     }
     
     # Test local llama
@@ -1,13 +1,19 @@
 import os
+import re
+import time
 import aiohttp
 import asyncio
 import google.generativeai as genai
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from backend.core.logger import get_logger
 from dotenv import load_dotenv
 from backend.llm.context_manager import context_manager  # ✅ Existing import
 from backend.memory.proactive_memory import proactive_memory  # ✅ New import
 from backend.memory.follow_up_manager import follow_up_manager  # ✅ New import
+from backend.llm.quota_manager import quota_manager, estimate_tokens, parse_retry_after, MAX_QUEUE_WAIT_SECONDS
+from backend.core.deadline import Deadline, budget
+from backend.llm.model_router import model_router
 
 load_dotenv()
 logger = get_logger(__name__)
@@ -15,7 +21,10 @@ logger = get_logger(__name__)
 # ==========================================================
 # --- CURRENT Gemini Models (October 2025) ---
 # ==========================================================
-GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
+# FAKE_LLM_URL points every provider at backend/llm/fake_provider.py (offline load tests)
+FAKE_LLM_URL = os.getenv("FAKE_LLM_URL")
+GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") or ("fake-key" if FAKE_LLM_URL else None)
+GEMINI_API_BASE = (os.getenv("GEMINI_API_BASE") or FAKE_LLM_URL or "https://generativelanguage.googleapis.com").rstrip("/")
 
 GEMINI_1_MODELS = [
     "gemini-1.0-pro",
@@ -58,7 +67,7 @@ else:
 # --- Gemini Request Handlers ---
 # ==========================================================
 async def test_gemini_model(model_name: str) -> Dict[str, Any]:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent"
+    url = f"{GEMINI_API_BASE}/v1beta/models/{model_name}:generateContent"
     payload = {
         "contents": [{"parts": [{"text": "Say just 'OK' if you're working."}]}],
         "generationConfig": {"maxOutputTokens": 10, "temperature": 0.1}
@@ -100,7 +109,43 @@ async def find_working_gemini_model():
     logger.error("💥 No working Gemini models found!")
     return None
 
-async def ask_gemini(messages: List[Dict[str, Any]], user_id: str = None) -> Dict[str, Any]:
+# ==========================================================
+# --- Degraded replies (deadline exhausted) ---
+# ==========================================================
+MIN_ATTEMPT_SECONDS = 1.0  # Don't start a provider attempt with less budget than this
+DEGRADED_REPLY_TEXT = "⏳ I'm taking longer than usual to answer. Please try again in a moment."
+# Keyed per user: answers can be personalised or draw on that user's private memory
+_reply_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_REPLY_CACHE_SIZE = 500
+
+def _reply_cache_key(user_id: Optional[str], query: str) -> Tuple[str, str]:
+    return user_id or "", re.sub(r"\s+", " ", query.lower()).strip()
+
+def remember_reply(user_id: Optional[str], query: str, text: str):
+    """Keep recent good answers (to the user's own query) so a timed-out turn can still answer repeats."""
+    if not query or not text or text.startswith(("⚠️", "❌", "⏳")):
+        return
+    key = _reply_cache_key(user_id, query)
+    _reply_cache[key] = text
+    _reply_cache.move_to_end(key)
+    while len(_reply_cache) > _REPLY_CACHE_SIZE:
+        _reply_cache.popitem(last=False)
+
+def degraded_reply(user_id: Optional[str], query: str) -> Dict[str, Any]:
+    """This user's cached answer for this query if we have one, otherwise a short apology."""
+    cached = _reply_cache.get(_reply_cache_key(user_id, query or ""))
+    if cached:
+        return {"text": cached, "raw_response": {}, "model_used": "cache", "via": "cache", "degraded": True}
+    return {"text": DEGRADED_REPLY_TEXT, "raw_response": {}, "model_used": "none", "via": "degraded", "degraded": True}
+
+def attempt_timeout(deadline: Optional[Deadline], cap: float) -> float:
+    """HTTP timeout for one provider attempt; never 0, which aiohttp reads as "no timeout"."""
+    return max(MIN_ATTEMPT_SECONDS, budget(deadline, cap))
+
+async def ask_gemini(
+    messages: List[Dict[str, Any]], user_id: str = None, deadline: Optional[Deadline] = None,
+    route: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     if not GEMINI_API_KEY:
         error_msg = "❌ GOOGLE_API_KEY missing. Please check your .env file"
         logger.error(error_msg)
@@ -110,13 +155,34 @@ async def ask_gemini(messages: List[Dict[str, Any]], user_id: str = None) -> Dic
         return {"text": "Please enter a message.", "raw_response": {}}
 
     last_message = messages[-1]["content"]
+    # Route's models first, then the rest of the list as a safety net
+    route = route or model_router.route(last_message)
+    models = route["models"] + [m for m in ALL_GEMINI_MODELS if m not in route["models"]]
+    max_output_tokens = route["max_output_tokens"]
+    estimated_tokens = estimate_tokens(last_message, max_output_tokens)
+    started = time.monotonic()
+
+    for model in models:
+        # Each attempt only gets what is left of the request budget
+        if deadline and deadline.remaining() < MIN_ATTEMPT_SECONDS:
+            logger.warning(f"⏳ Deadline reached before trying {model}, returning degraded reply")
+            return degraded_reply(user_id, last_message)
+
+        # Over quota or cooling down after a 429: route to the next model instead of piling on
+        max_wait = budget(deadline, MAX_QUEUE_WAIT_SECONDS)
+        if not await quota_manager.acquire("gemini", model, user_id, estimated_tokens, max_wait=max_wait):
+            logger.info(f"🚦 Skipping Gemini model {model}: over quota")
+            continue
+        # The quota wait may have used up what was left of the budget
+        if deadline and deadline.remaining() < MIN_ATTEMPT_SECONDS:
+            logger.warning(f"⏳ Deadline reached while queued for {model}, returning degraded reply")
+            return degraded_reply(user_id, last_message)
 
-    for model in ALL_GEMINI_MODELS:
         logger.info(f"🚀 Trying Gemini model: {model}")
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+        url = f"{GEMINI_API_BASE}/v1beta/models/{model}:generateContent"
         payload = {
             "contents": [{"parts": [{"text": last_message}]}],
-            "generationConfig": {"temperature": 0.7, "maxOutputTokens": 512},
+            "generationConfig": {"temperature": 0.7, "maxOutputTokens": max_output_tokens},
         }
         try:
             async with aiohttp.ClientSession() as session:
@@ -124,33 +190,95 @@ async def ask_gemini(messages: List[Dict[str, Any]], user_id: str = None) -> Dic
                     url,
                     json=payload,
                     params={"key": GEMINI_API_KEY},
-                    timeout=aiohttp.ClientTimeout(total=20)
+                    timeout=aiohttp.ClientTimeout(total=attempt_timeout(deadline, 20))
                 ) as resp:
+                    if resp.status == 429:
+                        quota_manager.report_rate_limited("gemini", model, parse_retry_after(resp.headers.get("Retry-After")))
+                        continue
                     data = await resp.json()
                     if resp.status == 200 and "candidates" in data and data["candidates"]:
                         text = data["candidates"][0]["content"]["parts"][0]["text"]
-                        logger.info(f"✅ SUCCESS with model: {model}")
-                        return {"text": text, "raw_response": data, "model_used": model, "via": "http"}
+                        await quota_manager.record_usage(
+                            "gemini", model, estimated_tokens, data.get("usageMetadata", {}).get("totalTokenCount")
+                        )
+                        model_router.record(route["tier"], model, time.monotonic() - started, data.get("usageMetadata"))
+                        logger.info(f"✅ SUCCESS with model: {model} (route={route['tier']})")
+                        return {"text": text, "raw_response": data, "model_used": model, "via": "http", "route": route["tier"]}
         except Exception as e:
-            logger.warning(f"❌ Model {model} error: {str(e)}")
+            logger.warning(f"❌ Model {model} error: {str(e) or type(e).__name__}")
             continue
 
+    model_router.record(route["tier"], None, time.monotonic() - started, success=False)
+    if deadline and deadline.expired:
+        return degraded_reply(user_id, last_message)
+
     error_text = """❌ All Gemini models failed. 
 Check API key, region access, or use OpenAI as fallback."""
     logger.error(error_text)
     return {"text": error_text, "raw_response": {}, "model_used": "none"}
 
+# ==========================================================
+# --- Internal classification calls ---
+# ==========================================================
+CLASSIFY_MAX_OUTPUT_TOKENS = 16
+
+async def classify_text(prompt: str, user_id: Optional[str] = None, deadline: Optional[Deadline] = None) -> Optional[str]:
+    """
+    Short internal completion (topic labels) on the lite models only. Queues under the
+    caller's quota like their own turn, but skips the reply cache and model_router
+    stats so it never shows up as a user answer. None on failure or when the deadline is too close.
+    """
+    if not GEMINI_API_KEY:
+        return None
+    estimated_tokens = estimate_tokens(prompt, CLASSIFY_MAX_OUTPUT_TOKENS)
+    for model in model_router.tiers["lite"]["models"]:
+        if deadline and deadline.remaining() < MIN_ATTEMPT_SECONDS:
+            return None
+        if not await quota_manager.acquire("gemini", model, user_id, estimated_tokens,
+                                           max_wait=budget(deadline, MAX_QUEUE_WAIT_SECONDS)):
+            continue
+        if deadline and deadline.remaining() < MIN_ATTEMPT_SECONDS:
+            return None
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.0, "maxOutputTokens": CLASSIFY_MAX_OUTPUT_TOKENS},
+        }
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(
+                    f"{GEMINI_API_BASE}/v1beta/models/{model}:generateContent",
+                    json=payload,
+                    params={"key": GEMINI_API_KEY},
+                    timeout=aiohttp.ClientTimeout(total=attempt_timeout(deadline, 5))
+                ) as resp:
+                    if resp.status == 429:
+                        quota_manager.report_rate_limited("gemini", model, parse_retry_after(resp.headers.get("Retry-After")))
+                        continue
+                    data = await resp.json()
+                    if resp.status == 200 and data.get("candidates"):
+                        await quota_manager.record_usage(
+                            "gemini", model, estimated_tokens, data.get("usageMetadata", {}).get("totalTokenCount")
+                        )
+                        return data["candidates"][0]["content"]["parts"][0]["text"]
+        except Exception as e:
+            logger.warning(f"❌ Classification call on {model} failed: {str(e) or type(e).__name__}")
+    return None
+
 # ==========================================================
 # --- Context-Aware & Proactive Gemini Handler ---
 # ==========================================================
+CONTEXT_BUDGET_SECONDS = 4.0   # Max share of the deadline spent building context
+EXTRAS_BUDGET_SECONDS = 1.5    # Proactive suggestions / follow-ups are optional
+
 async def ask_gemini_with_context(
-    messages: List[Dict[str, Any]], user_id: str, session_key: str
+    messages: List[Dict[str, Any]], user_id: str, session_key: str, deadline: Optional[Deadline] = None
 ) -> Dict[str, Any]:
     """
     Enhanced Gemini handler with:
     1️⃣ Context retention
     2️⃣ Proactive memory
     3️⃣ Follow-up suggestions
+    Every step runs inside the request deadline; optional steps are dropped when it gets tight.
     """
     # Get the last user message
     last_user_message = None
@@ -163,18 +291,37 @@ async def ask_gemini_with_context(
         return {"text": "Please provide a user message", "raw_response": {}}
 
     try:
-        # 1️⃣ BUILD CONTEXT
-        context = await context_manager.build_context_for_query(user_id, session_key, last_user_message)
+        # 1️⃣ BUILD CONTEXT (degrade to no context rather than eat the LLM's budget)
+        try:
+            context = await asyncio.wait_for(
+                context_manager.build_context_for_query(user_id, session_key, last_user_message, deadline),
+                timeout=budget(deadline, CONTEXT_BUDGET_SECONDS),
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"⏳ Context build timed out for user={user_id}, continuing without context")
+            context = {}
 
         # 2️⃣ ENHANCE PROMPT
         enhanced_prompt = _build_enhanced_prompt(last_user_message, context)
 
-        # 3️⃣ CALL LLM
-        llm_response = await ask_gemini([{"role": "user", "content": enhanced_prompt}], user_id)
+        # 3️⃣ CALL LLM (routed on the user's own query, not the enhanced prompt)
+        route = model_router.route(last_user_message, context)
+        llm_response = await ask_gemini([{"role": "user", "content": enhanced_prompt}], user_id, deadline, route)
+        if llm_response.get("degraded"):
+            return degraded_reply(user_id, last_user_message)
+        remember_reply(user_id, last_user_message, llm_response["text"])
 
         # 4️⃣ GENERATE PROACTIVE SUGGESTIONS
-        anticipations = await proactive_memory.anticipate_user_needs(user_id, context)
-        follow_ups = await follow_up_manager.generate_follow_ups(user_id, session_key, llm_response["text"])
+        try:
+            anticipations, follow_ups = await asyncio.wait_for(
+                asyncio.gather(
+                    proactive_memory.anticipate_user_needs(user_id, context),
+                    follow_up_manager.generate_follow_ups(user_id, session_key, llm_response["text"]),
+                ),
+                timeout=budget(deadline, EXTRAS_BUDGET_SECONDS),
+            )
+        except asyncio.TimeoutError:
+            anticipations, follow_ups = [], []
 
         # 5️⃣ STORE CONTEXT
         await context_manager.update_context_after_response(
@@ -194,7 +341,9 @@ async def ask_gemini_with_context(
 
     except Exception as e:
         logger.error(f"Context-aware LLM call failed: {e}")
-        return await ask_gemini(messages, user_id)
+        if deadline and deadline.remaining() < MIN_ATTEMPT_SECONDS:
+            return degraded_reply(user_id, last_user_message)
+        return await ask_gemini(messages, user_id, deadline, model_router.route(last_user_message))
 
 def _build_enhanced_prompt(user_query: str, context: Dict[str, Any]) -> str:
     return f"""
@@ -0,0 +1,177 @@
+# backend/llm/model_router.py
+import json
+import os
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ==========================================================
+# --- Route tiers ---
+# ==========================================================
+# Models are tried in order; ask_gemini falls through to the rest of
+# ALL_GEMINI_MODELS only if every model of the route fails.
+ROUTE_TIERS = {
+    "lite": {
+        "models": ["gemini-2.5-flash-lite-preview-09-2025", "gemini-2.0-flash"],
+        "max_output_tokens": 192,
+    },
+    "standard": {
+        "models": ["gemini-2.0-flash", "gemini-2.5-flash-lite-preview-09-2025", "gemini-2.0-flash-exp"],
+        "max_output_tokens": 512,
+    },
+    "complex": {
+        "models": ["gemini-2.5-flash-preview-09-2025", "gemini-2.0-flash", "gemini-2.0-flash-exp"],
+        "max_output_tokens": 1024,
+    },
+}
+TIER_ORDER = ["lite", "standard", "complex"]
+
+# Thresholds (words in the user's own query, not the context-enhanced prompt)
+ROUTE_LITE_MAX_WORDS = int(os.getenv("ROUTE_LITE_MAX_WORDS", "12"))
+ROUTE_COMPLEX_MIN_WORDS = int(os.getenv("ROUTE_COMPLEX_MIN_WORDS", "40"))
+ROUTE_CONTEXT_ITEMS = int(os.getenv("ROUTE_CONTEXT_ITEMS", "3"))
+
+# Approximate USD per 1M tokens (input, output); override with MODEL_PRICES='{"model": [in, out]}'
+MODEL_PRICES = {
+    "gemini-2.5-flash-lite-preview-09-2025": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-exp": (0.10, 0.40),
+    "gemini-2.5-flash-preview-09-2025": (0.30, 2.50),
+    "gemini-1.0-pro": (0.50, 1.50),
+    "gemini-1.0-pro-001": (0.50, 1.50),
+}
+try:
+    MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("MODEL_PRICES", "{}")).items()})
+except ValueError:
+    logger.warning("⚠️ MODEL_PRICES is not valid JSON, using defaults")
+
+SIMPLE_PATTERNS = re.compile(
+    r"^\s*(hi|hii+|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|nice|great|bye|good ?(morning|night|evening|afternoon)"
+    r"|yes|no|yep|nope|sure|how are you|what'?s up)\b",
+    re.IGNORECASE,
+)
+COMPLEX_PATTERNS = re.compile(
+    r"\b(explain|why|compare|difference between|analy[sz]e|step[- ]by[- ]step|in detail|detailed|pros and cons"
+    r"|write (a|an|the|me)|essay|story|plan|design|debug|code|implement|algorithm|summari[sz]e|translate"
+    r"|how (does|do|can|would|should))\b",
+    re.IGNORECASE,
+)
+
+
+def _style(preferences: Any) -> str:
+    return str(preferences.get("style") or "").lower() if isinstance(preferences, dict) else ""
+
+
+class ModelRouter:
+    """
+    Local complexity classifier that picks a model tier and output cap per request.
+
+    Signals: query length, simple/complex intent patterns, how much retrieved
+    context the answer has to use, and the user's preferred response `style`.
+    Per-route latency, token and cost stats are kept for tuning the thresholds.
+    """
+
+    def __init__(self, tiers: Optional[Dict[str, Dict[str, Any]]] = None, window: int = 500):
+        self.tiers = tiers or ROUTE_TIERS
+        self.window = window
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    # ==========================================================
+    # CLASSIFICATION
+    # ==========================================================
+    def classify(self, query: str, context: Optional[Dict[str, Any]] = None,
+                 preferences: Optional[Dict[str, Any]] = None) -> str:
+        query = query or ""
+        words = len(query.split())
+        context = context or {}
+        preferences = preferences if preferences is not None else (context.get("user_preferences") or {})
+
+        if COMPLEX_PATTERNS.search(query) or words >= ROUTE_COMPLEX_MIN_WORDS:
+            tier = "complex"
+        elif words <= ROUTE_LITE_MAX_WORDS or (SIMPLE_PATTERNS.search(query) and words <= 2 * ROUTE_LITE_MAX_WORDS):
+            tier = "lite"
+        else:
+            tier = "standard"
+
+        # Answers that must weave in several retrieved facts need more than the lite model
+        retrieved = len(context.get("relevant_facts") or []) + len(context.get("semantic_memories") or [])
+        if tier == "lite" and retrieved >= ROUTE_CONTEXT_ITEMS and not SIMPLE_PATTERNS.search(query):
+            tier = "standard"
+
+        if _style(preferences) == "detailed" and tier != "complex":
+            tier = TIER_ORDER[TIER_ORDER.index(tier) + 1]
+
+        return tier
+
+    def route(self, query: str, context: Optional[Dict[str, Any]] = None,
+              preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return {"tier", "models", "max_output_tokens"} for a request."""
+        if preferences is None:
+            preferences = (context or {}).get("user_preferences") or {}
+        tier = self.classify(query, context, preferences)
+        config = self.tiers[tier]
+        max_output_tokens = config["max_output_tokens"]
+        # Users who asked for short answers don't need the tier's full output budget
+        if _style(preferences) == "short" and tier != "lite":
+            max_output_tokens //= 2
+        return {"tier": tier, "models": list(config["models"]), "max_output_tokens": max_output_tokens}
+
+    # ==========================================================
+    # STATS
+    # ==========================================================
+    def _tier_stats(self, tier: str) -> Dict[str, Any]:
+        stats = self._stats.get(tier)
+        if stats is None:
+            stats = {"requests": 0, "failures": 0, "tokens": 0, "cost_usd": 0.0,
+                     "latencies": deque(maxlen=self.window), "models": {}}
+            self._stats[tier] = stats
+        return stats
+
+    def record(self, tier: str, model: Optional[str], latency: float, usage: Optional[Dict[str, Any]] = None,
+               success: bool = True):
+        stats = self._tier_stats(tier)
+        stats["requests"] += 1
+        latencies: Deque[float] = stats["latencies"]
+        latencies.append(latency)
+        if not success:
+            stats["failures"] += 1
+            return
+
+        usage = usage or {}
+        prompt_tokens = usage.get("promptTokenCount") or 0
+        output_tokens = usage.get("candidatesTokenCount") or 0
+        price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+        stats["tokens"] += prompt_tokens + output_tokens
+        stats["cost_usd"] += (prompt_tokens * price_in + output_tokens * price_out) / 1_000_000
+        stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        report = {}
+        for tier, stats in self._stats.items():
+            latencies = sorted(stats["latencies"])
+            successes = stats["requests"] - stats["failures"]
+            report[tier] = {
+                "requests": stats["requests"],
+                "failures": stats["failures"],
+                "models": dict(stats["models"]),
+                "avg_latency_ms": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "p95_latency_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+                "tokens": stats["tokens"],
+                "cost_usd": round(stats["cost_usd"], 6),
+                "avg_cost_usd": round(stats["cost_usd"] / successes, 8) if successes else 0.0,
+            }
+        return {"tiers": report, "thresholds": {
+            "lite_max_words": ROUTE_LITE_MAX_WORDS,
+            "complex_min_words": ROUTE_COMPLEX_MIN_WORDS,
+            "context_items": ROUTE_CONTEXT_ITEMS,
+        }}
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+model_router = ModelRouter()
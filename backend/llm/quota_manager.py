@@ -0,0 +1,367 @@
+# backend/llm/quota_manager.py
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from backend.core.celery_app import celery_app
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Requests/tokens per minute per provider (overridable per model via LLM_QUOTAS)
+DEFAULT_QUOTAS = {
+    "gemini": {"rpm": 15, "tpm": 1_000_000},
+    "openai": {"rpm": 500, "tpm": 200_000},
+    "anthropic": {"rpm": 50, "tpm": 50_000},
+    "ollama": {"rpm": 600, "tpm": 10_000_000},
+}
+
+# Waits up to this long are absorbed by queueing; anything longer is a routing decision
+MAX_QUEUE_WAIT_SECONDS = float(os.getenv("LLM_MAX_QUEUE_WAIT", "2.0"))
+RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", "20"))
+
+# The buckets live in the broker Redis, so the limits hold across every uvicorn worker
+# (supervisord runs several) instead of being multiplied by the worker count.
+BUCKET_PREFIX = "llm:bucket:"
+
+# Takes ARGV amounts from every bucket in KEYS, or nothing. ARGV: now, then
+# (rate per second, capacity, amount) per key. Returns {milliseconds until all
+# amounts fit (0 = taken), level of each bucket}.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 1])
+    local capacity = tonumber(ARGV[i * 3])
+    local amount = math.min(tonumber(ARGV[i * 3 + 1]), capacity)
+    local state = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    levels[i] = level
+    if level < amount then
+        wait = math.max(wait, math.ceil((amount - level) / rate * 1000))
+    end
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[i * 3 - 1])
+        local capacity = tonumber(ARGV[i * 3])
+        levels[i] = levels[i] - math.min(tonumber(ARGV[i * 3 + 1]), capacity)
+        redis.call('HSET', key, 'level', levels[i], 'ts', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+    end
+end
+local reply = {wait}
+for i = 1, #levels do
+    reply[i + 1] = math.floor(levels[i])
+end
+return reply
+"""
+
+# Adds ARGV deltas (negative consumes) to the buckets in KEYS, capped at capacity.
+# ARGV: now, then (rate per second, capacity, delta) per key.
+_ADJUST_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 1])
+    local capacity = tonumber(ARGV[i * 3])
+    local state = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate + tonumber(ARGV[i * 3 + 1]))
+    redis.call('HSET', key, 'level', level, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+end
+return 0
+"""
+
+
+def _load_quota_overrides() -> Dict[str, Dict[str, int]]:
+    """LLM_QUOTAS='{"gemini:gemini-2.0-flash": {"rpm": 30, "tpm": 1000000}, "openai": {"rpm": 100}}'"""
+    raw = os.getenv("LLM_QUOTAS")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.warning("⚠️ LLM_QUOTAS is not valid JSON, using defaults")
+        return {}
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """Rough prompt+completion estimate (~4 chars per token) used before the real usage is known."""
+    return max(1, len(text or "") // 4) + max_output_tokens
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity/60 per second."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.level
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed (amounts above capacity wait for a full bucket)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second if self.refill_per_second else float("inf")
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _ProviderQuota:
+    """
+    Cooldown and the per-user fair queue for one provider:model pair. The shared
+    buckets are in Redis; `requests`/`tokens` are this process's fallback when
+    Redis is unreachable.
+    """
+
+    def __init__(self, key: str, rpm: int, tpm: int):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.levels: Optional[Tuple[int, int]] = None  # last (requests, tokens) seen in Redis
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.cooldown_until = 0.0
+        # user_id -> deque of (future, tokens, enqueued_at); OrderedDict order is the round-robin order
+        self.queues: "OrderedDict[str, Deque[Tuple[asyncio.Future, int, float]]]" = OrderedDict()
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.wait_times: Deque[float] = deque(maxlen=500)
+        self.granted = 0
+        self.rejected = 0
+        self.rate_limited = 0
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def cooldown_remaining(self) -> float:
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def bucket_keys(self) -> List[str]:
+        return [f"{BUCKET_PREFIX}{self.key}:rpm", f"{BUCKET_PREFIX}{self.key}:tpm"]
+
+    def bucket_args(self, requests: float, tokens: float) -> List[float]:
+        return [time.time(), self.rpm / 60.0, self.rpm, requests, self.tpm / 60.0, self.tpm, tokens]
+
+    def local_take(self, tokens: int) -> float:
+        wait = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+        if wait == 0.0:
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+        return wait
+
+    def granted_after(self, waited: float):
+        self.wait_times.append(waited)
+        self.granted += 1
+
+
+class QuotaManager:
+    """
+    Token-bucket rate limiting per provider and model.
+
+    The RPM/TPM buckets are shared through Redis by every API worker process; the
+    fair queue and its dispatcher are per process and draw from the shared buckets.
+
+    - acquire() returns True once the request fits in both the RPM and TPM buckets.
+      Callers queue fairly (round-robin across users) for at most `max_wait` seconds;
+      if the wait would be longer it returns False so the caller can route elsewhere.
+    - report_rate_limited() turns an upstream 429 into a cooldown on that model instead of a retry.
+    - record_usage() reconciles the token estimate with the provider's reported usage.
+    """
+
+    def __init__(self, quotas: Optional[Dict[str, Dict[str, int]]] = None, url: Optional[str] = None):
+        self.defaults = dict(DEFAULT_QUOTAS)
+        self.overrides = quotas if quotas is not None else _load_quota_overrides()
+        self.url = url or celery_app.conf.broker_url
+        self._quotas: Dict[str, _ProviderQuota] = {}
+        self._redis = None
+        self._take_script = None
+        self._adjust_script = None
+        self.redis_errors = 0
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.url, decode_responses=True)
+            self._take_script = self._redis.register_script(_TAKE_SCRIPT)
+            self._adjust_script = self._redis.register_script(_ADJUST_SCRIPT)
+        return self._redis
+
+    async def _take(self, quota: _ProviderQuota, tokens: int) -> float:
+        """Take one request and `tokens` from the shared buckets; 0.0 if taken, else seconds to wait."""
+        try:
+            self._client()
+            wait_ms, requests_level, tokens_level = await self._take_script(
+                keys=quota.bucket_keys(), args=quota.bucket_args(1, tokens))
+            quota.levels = (int(requests_level), int(tokens_level))
+            return int(wait_ms) / 1000.0
+        except Exception as e:
+            # Degrade to this process's own buckets rather than blocking every LLM call
+            self.redis_errors += 1
+            logger.warning(f"⚠️ Shared LLM quota unavailable, using local buckets: {e}")
+            return quota.local_take(tokens)
+
+    async def _adjust(self, quota: _ProviderQuota, requests: float, tokens: float):
+        try:
+            self._client()
+            await self._adjust_script(keys=quota.bucket_keys(), args=quota.bucket_args(requests, tokens))
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"⚠️ Shared LLM quota adjust failed: {e}")
+            for bucket, delta in ((quota.requests, requests), (quota.tokens, tokens)):
+                if delta > 0:
+                    bucket.refund(delta)
+                elif delta < 0:
+                    bucket.consume(-delta)
+
+    def _limits(self, provider: str, model: str) -> Tuple[int, int]:
+        limits = dict(self.defaults.get(provider, {"rpm": 60, "tpm": 100_000}))
+        limits.update(self.overrides.get(provider, {}))
+        limits.update(self.overrides.get(f"{provider}:{model}", {}))
+        return int(limits["rpm"]), int(limits["tpm"])
+
+    def _get(self, provider: str, model: str) -> _ProviderQuota:
+        key = f"{provider}:{model}"
+        quota = self._quotas.get(key)
+        if quota is None:
+            quota = _ProviderQuota(key, *self._limits(provider, model))
+            self._quotas[key] = quota
+        return quota
+
+    async def acquire(self, provider: str, model: str, user_id: Optional[str] = None,
+                      tokens: int = 1, max_wait: float = MAX_QUEUE_WAIT_SECONDS) -> bool:
+        quota = self._get(provider, model)
+
+        # A cooldown longer than we are willing to wait means "try another model/provider"
+        if quota.cooldown_remaining() > max_wait:
+            quota.rejected += 1
+            return False
+
+        # Fast path: nobody queued here and the shared buckets have room
+        if not quota.queues:
+            wait = quota.cooldown_remaining() or await self._take(quota, tokens)
+            if wait == 0.0:
+                quota.granted_after(0.0)
+                return True
+            if wait > max_wait:
+                quota.rejected += 1
+                return False
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, tokens, time.monotonic())
+        quota.queues.setdefault(user_id or "anonymous", deque()).append(entry)
+        if quota.dispatcher is None or quota.dispatcher.done():
+            quota.dispatcher = asyncio.create_task(self._dispatch(quota))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return future.result()
+            future.cancel()
+            quota.rejected += 1
+            return False
+
+    async def _dispatch(self, quota: _ProviderQuota):
+        """Grant queued requests round-robin across users as bucket capacity refills."""
+        while quota.queues:
+            user_id, queue = next(iter(quota.queues.items()))
+            future, tokens, enqueued_at = queue[0]
+
+            if future.done():
+                queue.popleft()
+            else:
+                wait = quota.cooldown_remaining() or await self._take(quota, tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                queue.popleft()
+                if future.done():
+                    # The waiter gave up while the take was in flight; give the capacity back
+                    await self._adjust(quota, 1, tokens)
+                    continue
+                quota.granted_after(time.monotonic() - enqueued_at)
+                future.set_result(True)
+
+            # Rotate: this user goes to the back of the line
+            del quota.queues[user_id]
+            if queue:
+                quota.queues[user_id] = queue
+
+    def report_rate_limited(self, provider: str, model: str, retry_after: Optional[float] = None):
+        """Upstream returned 429: park this model for a short while instead of retrying."""
+        quota = self._get(provider, model)
+        cooldown = retry_after if retry_after and retry_after > 0 else RATE_LIMIT_COOLDOWN_SECONDS
+        quota.cooldown_until = max(quota.cooldown_until, time.monotonic() + cooldown)
+        quota.rate_limited += 1
+        logger.warning(f"🚦 {provider}:{model} rate limited, cooling down for {cooldown:.1f}s")
+
+    async def record_usage(self, provider: str, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the TPM bucket once the provider reports real usage."""
+        if actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+        await self._adjust(self._get(provider, model), 0, estimated_tokens - actual_tokens)
+
+    def is_available(self, provider: str, model: str) -> bool:
+        """Cheap check used to skip models that are cooling down."""
+        return self._get(provider, model).cooldown_remaining() == 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for key, quota in self._quotas.items():
+            waits = sorted(quota.wait_times)
+            # Last levels seen in the shared buckets (local fallback levels if Redis was never reached)
+            requests_level, tokens_level = quota.levels or (quota.requests.available(), quota.tokens.available())
+            stats[key] = {
+                "rpm_limit": quota.rpm,
+                "tpm_limit": quota.tpm,
+                "requests_available": round(requests_level, 2),
+                "tokens_available": round(tokens_level),
+                "cooldown_remaining": round(quota.cooldown_remaining(), 2),
+                "queued": quota.queued(),
+                "granted": quota.granted,
+                "rejected": quota.rejected,
+                "rate_limited": quota.rate_limited,
+                "avg_queue_wait_ms": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "p95_queue_wait_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+            }
+        return stats
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+quota_manager = QuotaManager()
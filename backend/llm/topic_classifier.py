@@ -0,0 +1,133 @@
+# backend/llm/topic_classifier.py
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.core.logger import get_logger
+from backend.core.utils import build_centroids, normalize_vector, rank_labels
+
+logger = get_logger(__name__)
+
+# Broader categories - easily expandable (also used for the keyword fallback)
+TOPIC_KEYWORDS = {
+    "sports": ["cricket", "football", "sports", "game", "match", "player", "team"],
+    "technology": ["computer", "phone", "app", "software", "tech", "programming"],
+    "food": ["food", "restaurant", "cook", "eat", "meal", "recipe"],
+    "travel": ["travel", "trip", "visit", "go to", "vacation", "flight"],
+    "work": ["work", "job", "office", "career", "project", "meeting"],
+    "entertainment": ["movie", "music", "show", "book", "game", "entertainment"],
+    "health": ["health", "exercise", "doctor", "hospital", "fitness", "diet"],
+    "shopping": ["buy", "purchase", "shop", "shopping", "store", "price"]
+}
+
+TOPIC_MIN_CONFIDENCE = float(os.getenv("TOPIC_MIN_CONFIDENCE", "0.30"))
+TOPIC_MIN_MARGIN = float(os.getenv("TOPIC_MIN_MARGIN", "0.03"))
+
+
+class TopicClassifier:
+    """
+    In-process topic classifier.
+
+    Each session keeps a running (exponentially decayed) embedding of its turns,
+    so a new turn costs one encode of the new text only. The running vector is
+    compared against prototype centroids built from TOPIC_KEYWORDS.
+
+    observe() runs on the "model" executor while the other methods run on the event
+    loop, and that pool may have several workers, so session state is behind a lock.
+    Encoding happens outside it.
+    """
+
+    def __init__(self, model, decay: float = 0.6, max_sessions: int = 2000,
+                 min_confidence: float = TOPIC_MIN_CONFIDENCE, min_margin: float = TOPIC_MIN_MARGIN):
+        self.model = model
+        self.decay = decay
+        self.max_sessions = max_sessions
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self._labels: Optional[List[str]] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._centroids_lock = threading.Lock()
+
+    def _ensure_centroids(self):
+        with self._centroids_lock:
+            if self._centroids is not None:
+                return
+            examples = {
+                topic: keywords + [f"let's talk about {kw}" for kw in keywords]
+                for topic, keywords in TOPIC_KEYWORDS.items()
+            }
+            self._labels, self._centroids = build_centroids(self.model, examples)
+
+    def _session(self, session_key: str) -> Optional[Dict]:
+        state = self._sessions.get(session_key)
+        if state is not None:
+            self._sessions.move_to_end(session_key)
+        return state
+
+    def has_session(self, session_key: str) -> bool:
+        with self._lock:
+            return session_key in self._sessions
+
+    def observe(self, session_key: str, texts: List[str]) -> Dict:
+        """Fold new turn text(s) into the session's running vector and re-score it."""
+        self._ensure_centroids()
+        texts = [t for t in texts if t and t.strip()]
+        vectors = np.asarray(self.model.encode(texts), dtype=np.float32) if texts else []
+
+        with self._lock:
+            state = self._session(session_key)
+            for vec in vectors:
+                vec = normalize_vector(vec)
+                if state is None:
+                    state = {"vector": vec, "turns": 0, "llm_topic": None, "llm_label": None}
+                    self._sessions[session_key] = state
+                else:
+                    state["vector"] = self.decay * state["vector"] + (1 - self.decay) * vec
+                state["turns"] += 1
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            if state is None:
+                return {"topic": "general", "confidence": 0.0, "confident": False}
+
+            ranked = rank_labels(state["vector"], self._labels, self._centroids)
+            best_label, best_score = ranked[0]
+            margin = best_score - ranked[1][1] if len(ranked) > 1 else best_score
+            state["topic"] = best_label
+            state["confidence"] = best_score
+            state["confident"] = best_score >= self.min_confidence and margin >= self.min_margin
+            return dict(state)
+
+    def cached_topic(self, session_key: str) -> Optional[str]:
+        """Topic for a session without encoding anything (None if unseen)."""
+        with self._lock:
+            state = self._session(session_key)
+            if state is None:
+                return None
+            if not state.get("confident") and state.get("llm_label") == state.get("topic"):
+                return state.get("llm_topic")
+            return state.get("topic")
+
+    def remember_llm_topic(self, session_key: str, topic: str):
+        """Cache an LLM answer until the session's best prototype changes."""
+        with self._lock:
+            state = self._session(session_key)
+            if state is not None:
+                state["llm_topic"] = topic
+                state["llm_label"] = state.get("topic")
+
+    def needs_llm(self, session_key: str) -> Tuple[bool, Optional[str]]:
+        """Whether a low-confidence session still needs an LLM label, plus any cached one."""
+        with self._lock:
+            state = self._session(session_key)
+            if state is None or state.get("confident"):
+                return False, None
+            if state.get("llm_label") == state.get("topic") and state.get("llm_topic"):
+                return False, state["llm_topic"]
+            return True, None
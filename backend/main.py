@@ -1,5 +1,8 @@
+import asyncio
 import json
-from fastapi import FastAPI, WebSocket
+import os
+from typing import Set
+from fastapi import FastAPI, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.dialogue.dialogue_manager import DialogueManager
@@ -11,7 +14,19 @@ from fastapi import BackgroundTasks
 from datetime import datetime
 from backend.routes.whatsapp_routes import router as whatsapp_router
 from backend.routes.music_routes import router as music_router
+from backend.routes.notification_routes import router as notification_router
+from backend.routes.reminder_routes import router as reminder_router
 from backend.voice.voice_manager import VoiceManager
+from backend.llm.quota_manager import quota_manager
+from backend.llm.model_router import model_router
+from backend.core.ws_manager import ws_manager, ANONYMOUS_USER, CLOSE_TOO_MANY
+from backend.core.ws_protocol import PROTOCOL_VERSION, ProtocolError, decode, negotiate
+from backend.tasks.task_cache import task_cache
+from backend.core.executors import get_executor_stats, run_in
+from backend.tasks.reminder_scheduler import reminder_scheduler
+from backend.core.notification_inbox import notification_inbox
+from backend.core.event_bus import event_bus
+from backend.core.database import ensure_notification_indexes, get_user_notifications, migrate_legacy_notifications
 
 # --- Initialize FastAPI ---
 app = FastAPI()
@@ -31,16 +46,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Server push: Redis pub/sub -> local WebSockets, plus keepalive for those sockets ---
+@app.on_event("startup")
+async def start_event_bus():
+    event_bus.start()
+    ws_manager.run_keepalive()
+
+# --- Mongo indexes for request-path queries ---
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        await ensure_notification_indexes()
+    except Exception as e:
+        print(f"⚠️ Could not create notification indexes: {e}")
+    try:
+        moved = await migrate_legacy_notifications()
+        if moved:
+            print(f"📦 Moved {moved} archived notifications out of reminders")
+    except Exception as e:
+        print(f"⚠️ Could not migrate legacy notifications: {e}")
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    ws_manager.stop_keepalive()
+    await event_bus.stop()
+
 # --- Auth Routes ---
 app.include_router(auth.router)
 
-# Store the latest reminder for each user
-user_reminders = {}
+app.include_router(whatsapp_router, prefix="/api/v1", tags=["whatsapp"])
 
-# Store active WebSocket connections
-active_connections = {}
+app.include_router(notification_router, prefix="/api/v1", tags=["notifications"])
 
-app.include_router(whatsapp_router, prefix="/api/v1", tags=["whatsapp"])
+app.include_router(reminder_router, prefix="/api/v1", tags=["reminders"])
 
 app.include_router(music_router, prefix="/api/v1", tags=["music"])
 # --- REST API for Dialogue ---
@@ -51,23 +89,63 @@ async def chat(request: DialogueRequest):
     return DialogueResponse(user_id=request.user_id, response=result["reply"])
 
 # --- WebSocket for Real-time Dialogue ---
+# Sockets start on legacy flat JSON frames; a hello with "protocol": 1 switches them to the
+# enveloped, multiplexed protocol in backend/core/ws_protocol.py.
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "4"))
+
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     await ws.accept()
-    user_id = "default_user"  # Default user ID
+    user_id = ANONYMOUS_USER  # Default user ID until the first message identifies the socket
+    protocol = 0
+    exchanges: Set[asyncio.Task] = set()
     
     # Store connection
-    if user_id not in active_connections:
-        active_connections[user_id] = []
-    active_connections[user_id].append(ws)
+    ws_manager.connect(user_id, ws)
     
     try:
         while True:
-            data = await ws.receive_text()
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            raw = message.get("text") if message.get("text") is not None else message.get("bytes")
+
+            if protocol >= 1:
+                await handle_frame(ws, user_id, raw, exchanges)
+                continue
+
+            data = raw if isinstance(raw, str) else raw.decode("utf-8", "replace")
+            session_id = None
             try:
                 data_json = json.loads(data)
-                user_id = data_json.get("user_id", "guest")
+                # Keepalive reply to the server's ping: proves the socket is alive, nothing more
+                if data_json.get("type") == "pong":
+                    ws_manager.touch(ws, active=False)
+                    continue
+                ws_manager.touch(ws)
+                if "v" in data_json:
+                    # Enveloped hello: {"v": 1, "type": "hello", "data": {...}}
+                    data_json = {"type": data_json.get("type"), "id": data_json.get("id"), **data_json.get("data", {})}
+                new_user_id = data_json.get("user_id", "guest")
+                session_id = data_json.get("session_id")
                 msg = data_json.get("text", "")
+
+                # Sent on open so pushed events reach the socket before the first chat message
+                if data_json.get("type") == "hello":
+                    await close_over_cap(ws_manager.move(user_id, new_user_id, ws))
+                    user_id = new_user_id
+                    protocol, encoding = negotiate(data_json)
+                    ws_manager.set_protocol(ws, protocol, encoding)
+                    hello = {
+                        "type": "hello",
+                        "protocol": protocol,
+                        "encoding": encoding,
+                        "unread_count": await notification_inbox.unread_count(user_id)
+                    }
+                    if data_json.get("id"):
+                        hello["re"] = data_json["id"]
+                    await ws_manager.send(ws, hello)
+                    continue
                 
                 # Check if it's a WhatsApp status request
                 if "whatsapp" in msg.lower() and "status" in msg.lower():
@@ -77,97 +155,205 @@ async def websocket_endpoint(ws: WebSocket):
                         "message": "📱 Checking WhatsApp status...",
                         "status": "info"
                     }
-                    await ws.send_text(json.dumps(status_msg))
+                    await ws_manager.send(ws, status_msg)
                     
             except Exception:
-                user_id, msg = "guest", data
+                ws_manager.touch(ws)
+                new_user_id, msg = "guest", data
 
-            result = await dm.handle_message(user_id, msg)
-            await ws.send_text(result["reply"])
+            await close_over_cap(ws_manager.move(user_id, new_user_id, ws))
+            user_id = new_user_id
+
+            # Tasks are acknowledged right away; their results arrive later as task_result events
+            result = await dm.handle_message(user_id, msg, session_id, async_tasks=True)
+            await ws_manager.send(ws, reply_event(result))
             
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
+        for exchange in exchanges:
+            exchange.cancel()
         # Remove connection when disconnected
-        if user_id in active_connections and ws in active_connections[user_id]:
-            active_connections[user_id].remove(ws)
+        ws_manager.forget(user_id, ws)
+
+def reply_event(result: dict, request_id: str = None) -> dict:
+    metadata = result.get("metadata", {})
+    if metadata.get("status") == "queued":
+        event = {
+            "type": "task_ack",
+            "task_id": metadata["task_id"],
+            "task_name": metadata["task_name"],
+            "response": result["reply"],
+        }
+    else:
+        event = {"type": "reply", "response": result["reply"]}
+    if request_id:
+        event["re"] = request_id
+    return event
+
+async def handle_frame(ws: WebSocket, user_id: str, raw, exchanges: Set[asyncio.Task]):
+    """One enveloped client frame; chat turns run as concurrent exchanges matched by id."""
+    try:
+        frame = decode(raw)
+    except ProtocolError as e:
+        ws_manager.touch(ws)
+        await ws_manager.send(ws, {"type": "error", "code": "bad_frame", "message": str(e)})
+        return
+
+    kind, data, frame_id = frame["type"], frame["data"], frame.get("id")
+    ws_manager.touch(ws, active=kind != "pong")
+
+    if kind == "pong":
+        return
+    if kind == "ack":
+        # Receipt of a pushed notification marks it read (replaces POST /mark-reminder-read)
+        if data.get("notification_id"):
+            await notification_inbox.mark_read(user_id, [data["notification_id"]])
+        return
+    if kind == "hello":
+        await ws_manager.send(ws, {"type": "hello", "re": frame_id, "protocol": PROTOCOL_VERSION,
+                                   "unread_count": await notification_inbox.unread_count(user_id)})
+        return
+    if kind == "inbox":
+        page = await notification_inbox.list(user_id, data.get("cursor"), min(int(data.get("limit", 20)), 100),
+                                             bool(data.get("unread_only")))
+        await ws_manager.send(ws, {"type": "inbox", "re": frame_id, **page})
+        return
+    if kind == "mark_read":
+        marked = await notification_inbox.mark_read(user_id, data.get("ids"))
+        await ws_manager.send(ws, {"type": "ack", "re": frame_id, "marked": marked})
+        return
+
+    # kind == "message"
+    if len(exchanges) >= WS_MAX_INFLIGHT:
+        await ws_manager.send(ws, {"type": "error", "re": frame_id, "code": "busy",
+                                   "message": f"At most {WS_MAX_INFLIGHT} messages can be in progress"})
+        return
+    await ws_manager.send(ws, {"type": "ack", "re": frame_id})
+    exchange = asyncio.create_task(run_exchange(ws, user_id, frame_id, data))
+    exchanges.add(exchange)
+    exchange.add_done_callback(exchanges.discard)
+
+async def run_exchange(ws: WebSocket, user_id: str, request_id: str, data: dict):
+    try:
+        result = await dm.handle_message(user_id, data.get("text", ""), data.get("session_id"), async_tasks=True)
+        await ws_manager.send(ws, reply_event(result, request_id))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"WebSocket exchange {request_id} failed: {e}")
+        try:
+            await ws_manager.send(ws, {"type": "error", "re": request_id, "code": "failed", "message": str(e)})
+        except Exception:
+            pass
+
+async def close_over_cap(sockets):
+    """Oldest sockets of a user past WS_MAX_CONNECTIONS_PER_USER make room for the new one."""
+    for old in sockets:
+        await ws_manager.close(old, CLOSE_TOO_MANY, "too many connections")
 
 # Function to send WhatsApp status to frontend
 async def send_whatsapp_status(user_id: str, message: str, status_type: str = "info"):
     """Send WhatsApp status update to frontend via WebSocket"""
-    if user_id in active_connections:
-        status_msg = {
-            "type": "whatsapp_status",
-            "message": message,
-            "status": status_type,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        for connection in active_connections[user_id]:
-            try:
-                await connection.send_text(json.dumps(status_msg))
-            except Exception as e:
-                print(f"Error sending WhatsApp status: {e}")
+    status_msg = {
+        "type": "whatsapp_status",
+        "message": message,
+        "status": status_type,
+        "timestamp": datetime.now().isoformat()
+    }
+    await event_bus.publish(user_id, status_msg)
 
 @app.get("/notifications/{user_id}")
-async def get_notifications(user_id: str):
-    """Get unread reminder notifications for a user"""
-    from backend.core.database import get_user_notifications_sync
+async def get_notifications(user_id: str, cursor: str = None, limit: int = Query(20, ge=1, le=100),
+                            notification_type: str = Query("reminder", alias="type")):
+    """Archived notifications for a user, newest first; pass `next_cursor` back as `cursor` for the next page"""
     try:
-        notifications = get_user_notifications_sync(user_id)
+        notifications, next_cursor = await get_user_notifications(user_id, notification_type, cursor, limit)
         
         # Convert ObjectId to string for JSON serialization
         for notification in notifications:
             notification["_id"] = str(notification["_id"])
             notification["created"] = notification["created"].isoformat()
             
-        return {"success": True, "notifications": notifications}
+        return {"success": True, "notifications": notifications, "next_cursor": next_cursor}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 @app.post("/trigger-reminder")
 async def trigger_reminder_simple(data: dict):
-    """Store reminder for frontend to pick up"""
+    """Add a fired reminder to the user's notification inbox"""
     user_id = data.get("user_id", "guest")
     reminder_text = data.get("reminder_text", "")
     
     print(f"🎯 DEBUG: /trigger-reminder called for user {user_id}")
-    print(f"🎯 DEBUG: Reminder text: {reminder_text}")
     
-    # Store reminder with timestamp
-    user_reminders[user_id] = {
-        "message": f"🔔 REMINDER: {reminder_text}",
-        "timestamp": datetime.now().isoformat(),
-        "read": False
-    }
+    notification = await notification_inbox.push(user_id, f"🔔 REMINDER: {reminder_text}", "reminder")
     
     print(f"✅ Reminder stored for user {user_id}")
-    return {"status": "reminder_stored"}
+    return {"status": "reminder_stored", "notification_id": notification["id"]}
 
 @app.get("/check-reminders/{user_id}")
 async def check_reminders_simple(user_id: str):
-    """Check if user has unread reminders"""
-    print(f"🔍 Checking reminders for user: {user_id}")
+    """Oldest unread notification, one at a time (kept for the polling client)"""
+    notification = await notification_inbox.oldest_unread(user_id)
+    if not notification:
+        return {"has_reminder": False}
     
-    if user_id in user_reminders and not user_reminders[user_id]["read"]:
-        print(f"✅ Found unread reminder: {user_reminders[user_id]['message']}")
-        return {
-            "has_reminder": True,
-            "message": user_reminders[user_id]["message"],
-            "timestamp": user_reminders[user_id]["timestamp"]
-        }
-    
-    print(f"ℹ️ No reminders found for user: {user_id}")
-    return {"has_reminder": False}
+    return {
+        "has_reminder": True,
+        "notification_id": notification["id"],
+        "message": notification["message"],
+        "timestamp": notification["created"],
+        "unread_count": await notification_inbox.unread_count(user_id)
+    }
 
 @app.post("/mark-reminder-read/{user_id}")
+async def mark_reminder_read(user_id: str, notification_id: str = None):
+    """Mark one notification read, or the whole inbox when no id is given"""
+    ids = [notification_id] if notification_id else None
+    marked = await notification_inbox.mark_read(user_id, ids)
+    print(f"✅ Marked {marked} reminder(s) as read for user: {user_id}")
+    return {"status": "marked_read", "marked": marked}
+
+@app.get("/metrics/llm-quota")
+async def get_llm_quota_metrics():
+    """Current token-bucket levels, cooldowns and queue times per provider:model"""
+    return {"quotas": quota_manager.get_stats()}
+
+@app.get("/metrics/routing")
+async def get_routing_metrics():
+    """Per-route (lite/standard/complex) request counts, latency and estimated cost"""
+    return model_router.get_stats()
+
+@app.get("/metrics/intent")
+async def get_intent_metrics():
+    """Rule vs embedding intent matches and LLM calls avoided by the second stage"""
+    return dm.intent_classifier.get_stats()
+
+@app.get("/metrics/task-cache")
+async def get_task_cache_metrics():
+    """Memoized task results: fresh/stale hits, misses and coalesced dispatches"""
+    return task_cache.get_stats()
+
+@app.get("/metrics/executors")
+async def get_executor_metrics():
+    """Saturation, queue depth and queue wait per blocking-work pool"""
+    return get_executor_stats()
+
+@app.get("/metrics/events")
+async def get_event_bus_metrics():
+    """Server-push events published, received from Redis and delivered to local sockets"""
+    return event_bus.get_stats()
+
+@app.get("/metrics/websockets")
+async def get_websocket_metrics():
+    """Open sockets in this worker, keepalive evictions and estimated permessage-deflate savings"""
+    return ws_manager.get_stats()
 
-async def mark_reminder_read(user_id: str):
-    """Mark reminder as read"""
-    if user_id in user_reminders:
-        user_reminders[user_id]["read"] = True
-        print(f"✅ Marked reminder as read for user: {user_id}")
-    return {"status": "marked_read"}
+@app.get("/metrics/reminders")
+async def get_reminder_scheduler_metrics():
+    """Pending and in-flight reminders in the Redis scheduler, and time until the next one"""
+    return await run_in("io_wait", reminder_scheduler.get_stats)
 
 @app.post("/voice/start")
 async def start_voice_mode():
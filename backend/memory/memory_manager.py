@@ -3,6 +3,7 @@ import json
 import datetime
 from typing import List, Dict, Any, Optional
 from backend.core.database import redis_client, preferences_collection, notes_collection, semantic_collection
+from backend.core.executors import run_in
 from bson import ObjectId
 
 # Semantic embeddings
@@ -203,7 +204,7 @@ class MemoryManager:
         return notes
 
     async def store_semantic_memory(self, user_id: str, text: str):
-        embedding = self.model.encode(text).tolist()
+        embedding = (await run_in("model", self.model.encode, text)).tolist()
         doc = {
             "user_id": user_id,
             "text": text,
@@ -213,7 +214,7 @@ class MemoryManager:
         await semantic_collection.insert_one(doc)
 
     async def retrieve_semantic_memory(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        query_vec = self.model.encode(query)
+        query_vec = await run_in("model", self.model.encode, query)
         cursor = semantic_collection.find({"user_id": user_id})
         all_notes = await cursor.to_list(length=100)
 
@@ -4,6 +4,7 @@ from datetime import datetime
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from backend.core.database import semantic_collection
+from backend.core.executors import run_in
 
 class SemanticMemory:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
@@ -20,7 +21,7 @@ class SemanticMemory:
         return float(np.dot(a, b) / denom)
 
     async def store(self, user_id: str, text: str, meta: dict = None):
-        emb = self.model.encode(text).tolist()
+        emb = (await run_in("model", self.model.encode, text)).tolist()
         doc = {
             "user_id": user_id,
             "text": text,
@@ -31,7 +32,7 @@ class SemanticMemory:
         await self.col.insert_one(doc)
 
     async def query(self, user_id: str, query_text: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        q_emb = self.model.encode(query_text).tolist()
+        q_emb = (await run_in("model", self.model.encode, query_text)).tolist()
         cursor = self.col.find({"user_id": user_id})
         all_docs = await cursor.to_list(length=200)  # limit to reasonable number
         scored = []
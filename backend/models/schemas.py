@@ -1,7 +1,7 @@
 # backend/schemas.py
 
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 class UserCreate(BaseModel):
     username: str
@@ -35,3 +35,21 @@ class UserPreferences(BaseModel):
     language: Optional[str] = "en"      # en, hi, te, etc.
     nickname: Optional[str] = None      # e.g., "Kruthin"
     topics: Optional[Dict[str, int]] = {}  # frequency map of interests
+
+# --- Notification inbox ---
+class MarkReadRequest(BaseModel):
+    ids: Optional[List[str]] = None     # None marks the whole inbox read
+
+# --- Bulk reminder management ---
+class ReminderBulkRequest(BaseModel):
+    match: Optional[str] = None         # only reminders whose text contains this
+    minutes: Optional[int] = 10         # snooze
+    when: Optional[str] = None          # reschedule: natural language or ISO ("tomorrow at 9am")
+    include_pending: Optional[bool] = True
+
+
+class WhatsAppBulkRequest(BaseModel):
+    recipients: List[str]               # E.164 numbers, e.g. "+919876543210"
+    message: str
+    user_id: Optional[str] = "default_user"
+    send_at: Optional[str] = None       # natural language or ISO ("tomorrow at 9am")
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Query
 from youtubesearchpython import VideosSearch
 from datetime import datetime
 from backend.core.database import sync_music_collection
+from backend.core.executors import run_in
 import re
 
 router = APIRouter()
@@ -14,9 +15,8 @@ async def play_music(song_name: str = Query(..., description="Song name to searc
     try:
         print(f"🎵 Searching for song: {song_name}")
         
-        # Search YouTube
-        videos_search = VideosSearch(song_name, limit=1)
-        results = videos_search.result()
+        # Search YouTube (blocking HTTP scrape)
+        results = await run_in("io_wait", lambda: VideosSearch(song_name, limit=1).result())
         
         if not results['result']:
             raise HTTPException(status_code=404, detail="No results found")
@@ -34,7 +34,7 @@ async def play_music(song_name: str = Query(..., description="Song name to searc
         }
         
         # Store in MongoDB
-        sync_music_collection.insert_one(video_data)
+        await run_in("io_wait", sync_music_collection.insert_one, video_data)
         
         return {
             "success": True,
@@ -54,9 +54,9 @@ async def get_recent_music(limit: int = 10):
     Get recently played songs
     """
     try:
-        recent_songs = list(sync_music_collection.find()
-                           .sort('played_at', -1)
-                           .limit(limit))
+        recent_songs = await run_in(
+            "io_wait", lambda: list(sync_music_collection.find().sort('played_at', -1).limit(limit))
+        )
         
         # Convert ObjectId to string
         for song in recent_songs:
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Query
+from backend.core.notification_inbox import notification_inbox
+from backend.models.schemas import MarkReadRequest
+
+router = APIRouter()
+
+@router.get("/inbox/{user_id}")
+async def get_inbox(user_id: str, cursor: str = None, limit: int = Query(20, ge=1, le=100), unread_only: bool = False):
+    """
+    Newest-first page of a user's notifications; pass `next_cursor` back as `cursor`
+    to fetch the next page
+    """
+    return await notification_inbox.list(user_id, cursor=cursor, limit=limit, unread_only=unread_only)
+
+@router.get("/inbox/{user_id}/unread-count")
+async def get_unread_count(user_id: str):
+    return {"unread_count": await notification_inbox.unread_count(user_id)}
+
+@router.post("/inbox/{user_id}/read")
+async def mark_inbox_read(user_id: str, request: MarkReadRequest):
+    """Mark the given notification ids read (or all of them when `ids` is omitted)"""
+    marked = await notification_inbox.mark_read(user_id, request.ids)
+    return {"marked_read": marked, "unread_count": await notification_inbox.unread_count(user_id)}
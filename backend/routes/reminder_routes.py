@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from backend.core.executors import run_in
+from backend.models.schemas import ReminderBulkRequest
+from backend.tasks.reminder_bulk import cancel_reminders, snooze_reminders, reschedule_reminders
+from backend.tasks.time_parser import parse_time
+
+router = APIRouter()
+
+@router.post("/reminders/{user_id}/cancel")
+async def cancel_user_reminders(user_id: str, request: ReminderBulkRequest):
+    """
+    Cancel all pending reminders (or those matching `match`) in one bulk write
+    """
+    return await run_in("io_wait", cancel_reminders, user_id, request.match)
+
+@router.post("/reminders/{user_id}/snooze")
+async def snooze_user_reminders(user_id: str, request: ReminderBulkRequest):
+    """
+    Push reminders back by `minutes`; recently fired ones are re-armed from now
+    """
+    if not request.minutes or request.minutes < 1:
+        raise HTTPException(status_code=400, detail="minutes must be a positive number")
+    return await run_in("io_wait", snooze_reminders, user_id, request.minutes, request.match, request.include_pending)
+
+@router.post("/reminders/{user_id}/reschedule")
+async def reschedule_user_reminders(user_id: str, request: ReminderBulkRequest):
+    """
+    Move pending reminders to a new time
+    """
+    try:
+        when = datetime.fromisoformat(request.when or "")
+    except ValueError:
+        parsed = parse_time(request.when or "")
+        if not parsed:
+            raise HTTPException(status_code=400, detail="Could not understand the new time")
+        when = parsed.when
+    counts = await run_in("io_wait", reschedule_reminders, user_id, when, request.match)
+    return {**counts, "scheduled_time": when.isoformat()}
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, HTTPException
 from datetime import datetime, timedelta
 from backend.tasks.whatsapp_tasks import send_whatsapp_message
+from backend.tasks.whatsapp_dispatcher import queue_bulk, BULK_MAX_RECIPIENTS
+from backend.tasks.time_parser import delay_seconds
 from backend.core.database import sync_whatsapp_tasks_collection
+from backend.core.executors import run_in
+from backend.models.schemas import WhatsAppBulkRequest
 from bson import ObjectId
 
 router = APIRouter()
 
 @router.post("/send-whatsapp/")
-async def schedule_whatsapp_message(to_number: str, message: str, delay_minutes: int = 0, user_id: str = "default_user"):
+async def schedule_whatsapp_message(to_number: str, message: str, delay_minutes: int = 0, user_id: str = "default_user",
+                                    send_at: str = None):
     """
-    Schedule a WhatsApp message to be sent
+    Schedule a WhatsApp message to be sent.
+    `send_at` takes a natural-language time ("tomorrow at 9am") and overrides delay_minutes.
     """
     try:
         # Validate phone number (basic validation)
@@ -23,9 +29,11 @@ async def schedule_whatsapp_message(to_number: str, message: str, delay_minutes:
             'delay_minutes': delay_minutes,
             'user_id': user_id
         }
+        if send_at:
+            task_args['send_at'] = send_at
         
         # Schedule the task
-        result = send_whatsapp_message.delay(task_args)
+        result = await run_in("io_wait", send_whatsapp_message.delay, task_args)
         
         return {
             "status": "scheduled",
@@ -37,12 +45,51 @@ async def schedule_whatsapp_message(to_number: str, message: str, delay_minutes:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error scheduling message: {str(e)}")
 
+@router.post("/send-whatsapp/bulk")
+async def send_whatsapp_bulk(request: WhatsAppBulkRequest):
+    """
+    Send one message to many recipients. Recipients are recorded in whatsapp_tasks
+    under a shared bulk_id and sent in chunks by the background workers, within the
+    per-sender and per-recipient rate limits.
+    """
+    if not request.recipients:
+        raise HTTPException(status_code=400, detail="At least one recipient is required")
+    if len(request.recipients) > BULK_MAX_RECIPIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_RECIPIENTS} recipients per request")
+    invalid = [number for number in request.recipients if not number.startswith('+')]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Phone numbers must include country code: {invalid[:5]}")
+
+    countdown = 0
+    if request.send_at:
+        delay = delay_seconds(request.send_at)
+        if delay is None:
+            raise HTTPException(status_code=400, detail=f"Could not understand send_at: {request.send_at}")
+        countdown = max(0, int(delay))
+
+    try:
+        queued = await run_in("io_wait", queue_bulk, request.user_id, request.recipients, request.message, countdown)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scheduling bulk message: {str(e)}")
+    return {"status": "scheduled", **queued, "delay_seconds": countdown}
+
+@router.get("/whatsapp-tasks/bulk/{bulk_id}")
+async def get_whatsapp_bulk_status(bulk_id: str):
+    """Per-status counts for one bulk send"""
+    pipeline = [{"$match": {"bulk_id": bulk_id}}, {"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    counts = await run_in("io_wait", lambda: list(sync_whatsapp_tasks_collection.aggregate(pipeline)))
+    if not counts:
+        raise HTTPException(status_code=404, detail="Unknown bulk_id")
+    return {"bulk_id": bulk_id, "counts": {row["_id"]: row["count"] for row in counts}}
+
 @router.get("/whatsapp-tasks/")
 async def get_whatsapp_tasks():
     """
     Get all WhatsApp tasks
     """
-    tasks = list(sync_whatsapp_tasks_collection.find().sort('created_at', -1).limit(50))
+    tasks = await run_in(
+        "io_wait", lambda: list(sync_whatsapp_tasks_collection.find().sort('created_at', -1).limit(50))
+    )
     
     # Convert ObjectId to string
     for task in tasks:
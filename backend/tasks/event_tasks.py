@@ -2,6 +2,7 @@ from datetime import datetime
 import re
 from backend.core.celery_app import celery_app
 from backend.core.database import get_user_events_sync, save_user_event_sync
+from backend.tasks.time_parser import parse_time
 
 
 @celery_app.task
@@ -33,10 +34,11 @@ def execute_event_task(task_args):
         # Create New Event
         # ===========================
         else:
+            parsed = parse_time(query, tz=task_args.get('timezone'))
             event_name = extract_event_name(query)
-            event_time = extract_event_time(query)
+            event_time = parsed.when.strftime('%Y-%m-%d %H:%M') if parsed else "soon"
 
-            save_user_event_sync(user_id, event_name, event_time)
+            save_user_event_sync(user_id, event_name, event_time, scheduled_time=parsed.when if parsed else None)
             return f"✅ Event '{event_name}' scheduled for {event_time}"
 
     except Exception as e:
@@ -102,48 +104,3 @@ def clean_event_name(event_name, time_phrases):
     cleaned_name = ' '.join(cleaned_words).strip()
     cleaned_name = re.sub(r'^(a|an|the)\s+', '', cleaned_name, flags=re.IGNORECASE)
     return cleaned_name if cleaned_name else "Meeting"
-
-
-# ==========================================================
-# Event Time Extraction
-# ==========================================================
-def extract_event_time(query):
-    """Extract event time from the query."""
-    time_patterns = [
-        r'for\s+(.+)',
-        r'at\s+(.+)',
-        r'on\s+(.+)',
-        r'tomorrow\s*(.+)',
-        r'today\s*(.+)',
-        r'next\s+(.+)',
-        r'this\s+(.+)'
-    ]
-
-    days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-
-    for pattern in time_patterns:
-        match = re.search(pattern, query, re.IGNORECASE)
-        if match:
-            time_part = match.group(1).strip()
-            time_part = re.sub(
-                r'schedule|create|add|set|event|meeting|appointment',
-                '',
-                time_part,
-                flags=re.IGNORECASE
-            )
-            time_part = re.sub(r'\s+', ' ', time_part).strip()
-            if time_part:
-                return time_part
-
-    for day in days:
-        if day in query.lower():
-            return day
-
-    if 'tomorrow' in query.lower():
-        return "tomorrow"
-    if 'today' in query.lower():
-        return "today"
-    if 'next week' in query.lower():
-        return "next week"
-
-    return "soon"
@@ -0,0 +1,131 @@
+# backend/tasks/intent_classifier.py
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.core.logger import get_logger
+from backend.core.utils import build_centroids, rank_labels
+
+logger = get_logger(__name__)
+
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.55"))
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.06"))
+
+# Label for ordinary conversation: winning it means "let the LLM answer"
+CHAT_LABEL = "chat"
+
+# Example bank per TASK_REGISTRY type. WhatsApp is left out on purpose: it needs a phone
+# number and message extracted by the rules, so it can only be routed by intent_engine.
+INTENT_EXAMPLES = {
+    "calculator": [
+        "how much is twelve times eight", "add 45 and 37", "divide 100 by 4",
+        "what's fifteen percent of 200", "square root of 144", "multiply these numbers for me",
+    ],
+    "event": [
+        "put a meeting with john on my calendar friday", "book a dentist appointment next monday",
+        "set up a call with the team at 3pm tomorrow", "add my sister's birthday party to the calendar",
+        "block two hours for the project review on thursday",
+    ],
+    "expense": [
+        "i paid 300 rupees for lunch", "log 20 dollars on groceries", "bought a bus ticket for 50",
+        "record my taxi fare of 12 dollars", "i just spent 500 on clothes", "put 40 bucks for petrol in my expenses",
+    ],
+    "news": [
+        "what's happening in the world today", "any updates on the election", "latest cricket scores and stories",
+        "tell me today's top stories", "what's going on in tech lately",
+    ],
+    "notes": [
+        "jot this down: wifi password is sunshine", "keep a note of my locker code 4521",
+        "store this idea for later", "make a note about the grocery list", "don't let me forget my parking spot is b12",
+    ],
+    "reminder": [
+        "ping me about the dentist at 5", "nudge me to take my pills at 9", "wake me up at 6 tomorrow",
+        "give me a heads up before the meeting", "tell me to call mom in an hour", "don't let me forget to pay rent on friday",
+    ],
+    "search": [
+        "who invented the telephone", "find me articles about climate change", "google the best laptops under 50000",
+        "get me info on the eiffel tower", "who is the ceo of tesla",
+    ],
+    "translate": [
+        "how do you say thank you in japanese", "convert this sentence into hindi", "what does bonjour mean in english",
+        "say good morning in spanish", "translate i love you into french",
+    ],
+    "weather": [
+        "is it going to rain tomorrow", "do i need an umbrella today", "how hot is it outside",
+        "will it be sunny this weekend in goa", "what's the climate like in delhi right now",
+    ],
+    "music": [
+        "put on some jazz", "i want to hear arijit singh", "start my workout playlist",
+        "queue up some lofi beats", "play something relaxing",
+    ],
+    CHAT_LABEL: [
+        "hi how are you", "tell me a joke", "what do you think about love", "i'm feeling sad today",
+        "who are you", "thanks that was helpful", "can you help me with my homework",
+        "what should i cook for dinner", "let's talk about movies", "i had a great day at work",
+        "do you like cricket", "give me some advice about my career",
+    ],
+}
+
+
+class IntentClassifier:
+    """
+    Second-stage intent classifier for messages the rules did not match.
+
+    Scores the message embedding against one prototype centroid per task type (plus a
+    "chat" prototype for ordinary conversation) and only routes to a task when the best
+    score clears INTENT_MIN_CONFIDENCE and beats the runner-up by INTENT_MIN_MARGIN.
+    """
+
+    def __init__(self, model, examples: Optional[Dict[str, List[str]]] = None,
+                 min_confidence: float = INTENT_MIN_CONFIDENCE, min_margin: float = INTENT_MIN_MARGIN):
+        self.model = model
+        self.examples = examples or INTENT_EXAMPLES
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self._labels: Optional[List[str]] = None
+        self._centroids: Optional[np.ndarray] = None
+        self.stats = {"rule_matches": 0, "embedding_matches": 0, "llm_fallthrough": 0, "by_task": {}}
+
+    def _ensure_centroids(self):
+        if self._centroids is None:
+            self._labels, self._centroids = build_centroids(self.model, self.examples)
+
+    def classify(self, message: str) -> Tuple[Optional[str], float, float]:
+        """(task_type or None, score, margin) for a message."""
+        if not message or not message.strip():
+            return None, 0.0, 0.0
+        self._ensure_centroids()
+
+        vector = self.model.encode(message.lower().strip())
+        ranked = rank_labels(vector, self._labels, self._centroids)
+        best_label, best_score = ranked[0]
+        margin = best_score - ranked[1][1] if len(ranked) > 1 else best_score
+
+        if best_label == CHAT_LABEL or best_score < self.min_confidence or margin < self.min_margin:
+            return None, best_score, margin
+        return best_label, best_score, margin
+
+    # ==========================================================
+    # METRICS
+    # ==========================================================
+    def record_rule_match(self):
+        self.stats["rule_matches"] += 1
+
+    def record_outcome(self, task_type: Optional[str]):
+        if task_type:
+            self.stats["embedding_matches"] += 1
+            self.stats["by_task"][task_type] = self.stats["by_task"].get(task_type, 0) + 1
+        else:
+            self.stats["llm_fallthrough"] += 1
+
+    def get_stats(self) -> Dict:
+        second_stage = self.stats["embedding_matches"] + self.stats["llm_fallthrough"]
+        return {
+            **self.stats,
+            "by_task": dict(self.stats["by_task"]),
+            "llm_calls_avoided": self.stats["embedding_matches"],
+            "second_stage_hit_rate": round(self.stats["embedding_matches"] / second_stage, 3) if second_stage else 0.0,
+            "min_confidence": self.min_confidence,
+            "min_margin": self.min_margin,
+        }
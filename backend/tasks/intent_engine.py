@@ -0,0 +1,367 @@
+# backend/tasks/intent_engine.py
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# ==========================================================
+# --- Rule tables (order matters: first match wins) ---
+# ==========================================================
+# Retrieval (show/list) commands are checked before creation commands
+RETRIEVAL_PATTERNS = {
+    "notes": [r'show my notes', r'list my notes', r'what did i ask', r'what did you remember'],
+    "reminder": [r'show my reminders', r'list my reminders', r'what reminders'],
+    "expense": [r'show my expenses', r'list my spending', r'expense summary'],
+    "event": [r'show my events', r'list my events', r'upcoming events', r'scheduled events'],
+    "music": [r'recent music', r'played songs', r'music history'],
+}
+
+TASK_PATTERNS = {
+    "calculator": {
+        "patterns": [r'calculat(e|ion)', r'what is \d+', r'\d+\s*[\+\-\*\/]\s*\d+'],
+        "exclude": []
+    },
+    # "email": {
+    #     "patterns": [r'send email', r'compose email', r'check (inbox|email)'],
+    #     "exclude": []
+    # },
+    "event": {
+        "patterns": [r'schedule', r'create event', r'add event'],
+        "exclude": [r'show events', r'list events', r'\breminders?\b']
+    },
+    "expense": {
+        "patterns": [r'add expense', r'track \$', r'spent \$'],
+        "exclude": [r'show expenses', r'list expenses']
+    },
+    "news": {
+        "patterns": [r'news', r'headlines', r'current events'],
+        "exclude": [r'\breminders?\b']
+    },
+    "notes": {
+        "patterns": [r'remember to', r'note that', r'write down', r'save this'],
+        "exclude": [r'show notes', r'list notes', r'what did i ask']
+    },
+    "reminder": {
+        "patterns": [r'remind me to', r'remind me every', r'set reminder for', r'alert me to',
+                     r'(?:cancel|delete|remove|clear|reschedule|move|snooze|postpone)\b.*\breminders?\b', r'^snooze\b'],
+        "exclude": [r'show reminders', r'list reminders']
+    },
+    "search": {
+        "patterns": [r'search for', r'find information', r'look up'],
+        "exclude": []
+    },
+    "translate": {
+        "patterns": [r'translate to', r'how to say in', r'what is .+ in'],
+        "exclude": []
+    },
+    "weather": {
+        "patterns": [r'weather in', r'forecast for', r'temperature in'],
+        "exclude": []
+    },
+    "music": {
+        "patterns": [r'play music', r'play song', r'play .+ by .+', r'play .+ music'],
+        "exclude": []
+    },
+}
+
+_PHONE = r'(\+?[\d\s\-\(\)]{10,15})'
+WHATSAPP_PATTERNS = [
+    # Scheduled messages (before the immediate ones, which would swallow "in N minutes" as text)
+    (r'send\s+whatsapp\s+to\s+' + _PHONE + r'\s+in\s+(\d+)\s*(?:minutes?|mins?)\s*(.+)', 'extract_scheduled'),
+    (r'whatsapp\s+' + _PHONE + r'\s+in\s+(\d+)\s*(?:minutes?|mins?)\s*(.+)', 'extract_scheduled'),
+    (r'schedule\s+whatsapp\s+to\s+' + _PHONE + r'\s+in\s+(\d+)\s*(?:minutes?|mins?)\s*(.+)', 'extract_scheduled'),
+
+    # Immediate messages
+    (r'send\s+whatsapp\s+(?:(?:message|msg)\s+)?to\s+' + _PHONE + r'\s*(?:saying|with|:)?\s*(.+)', 'extract_phone_message'),
+    (r'whatsapp\s+' + _PHONE + r'\s*(.+)', 'extract_phone_message'),
+    (r'message\s+' + _PHONE + r'\s+(?:on|via)\s+whatsapp\s*(.+)', 'extract_phone_message'),
+    (r'send\s+(?:a\s+|an\s+)?(?:message|text)\s+to\s+' + _PHONE + r'\s+(?:on|via)\s+whatsapp\s*(.+)', 'extract_phone_message'),
+    (r'text\s+' + _PHONE + r'\s+on\s+whatsapp\s*(.+)', 'extract_phone_message'),
+]
+
+# ==========================================================
+# --- Compilation ---
+# ==========================================================
+# Each rule becomes an anchored lookahead "(?=[\s\S]*?rule)" - equivalent to re.search(rule) -
+# and the rules are joined in priority order. The regex engine tries the branches in order,
+# so the first branch that matches anywhere in the message is the one an ordered loop of
+# re.search calls would have returned, but it is a single call into the C matcher.
+_CAPTURE = re.compile(r'(?<!\\)\((?!\?)')
+
+
+def _anywhere(pattern: str) -> str:
+    return r'(?=[\s\S]*?(?:' + pattern + r'))'
+
+
+def _not_anywhere(pattern: str) -> str:
+    return r'(?![\s\S]*?(?:' + pattern + r'))'
+
+
+def _name_groups(pattern: str, prefix: str) -> Tuple[str, int]:
+    """Turn the positional groups of a rule into named ones (<prefix>_1, <prefix>_2, ...)."""
+    count = 0
+
+    def rename(_match):
+        nonlocal count
+        count += 1
+        return f'(?P<{prefix}_{count}>'
+
+    return _CAPTURE.sub(rename, pattern), count
+
+
+def _compile_retrieval() -> re.Pattern:
+    branches = [
+        _anywhere('|'.join(patterns)) + f'(?P<{task_type}>)'
+        for task_type, patterns in RETRIEVAL_PATTERNS.items()
+    ]
+    return re.compile('^(?:' + '|'.join(branches) + ')')
+
+
+def _compile_tasks() -> re.Pattern:
+    branches = []
+    for task_type, rules in TASK_PATTERNS.items():
+        branch = _anywhere('|'.join(rules["patterns"]))
+        if rules["exclude"]:
+            branch += _not_anywhere('|'.join(rules["exclude"]))
+        branches.append(branch + f'(?P<{task_type}>)')
+    return re.compile('^(?:' + '|'.join(branches) + ')')
+
+
+def _compile_whatsapp() -> Tuple[re.Pattern, List[Tuple[str, str, int]]]:
+    branches, handlers = [], []
+    for index, (pattern, handler) in enumerate(WHATSAPP_PATTERNS):
+        prefix = f'w{index}'
+        named, _ = _name_groups(pattern, prefix)
+        branches.append(_anywhere(named) + f'(?P<{prefix}>)')
+        handlers.append((prefix, handler))
+    return re.compile('^(?:' + '|'.join(branches) + ')'), handlers
+
+
+_RETRIEVAL_RE = _compile_retrieval()
+_TASK_RE = _compile_tasks()
+_WHATSAPP_RE, _WHATSAPP_HANDLERS = _compile_whatsapp()
+_WHATSAPP_HANDLER_BY_PREFIX = dict(_WHATSAPP_HANDLERS)
+
+
+# ==========================================================
+# --- Detection ---
+# ==========================================================
+def detect_whatsapp(message_lower: str) -> Optional[Dict[str, Any]]:
+    """WhatsApp send/schedule intent with the phone number and message extracted."""
+    # Every WhatsApp rule contains the literal word, so most messages never reach the regex
+    if "whatsapp" not in message_lower:
+        return None
+
+    match = _WHATSAPP_RE.match(message_lower)
+    if not match:
+        return None
+
+    prefix = match.lastgroup
+    handler = _WHATSAPP_HANDLER_BY_PREFIX[prefix]
+    phone = match.group(f'{prefix}_1').strip()
+
+    if handler == 'extract_phone_message':
+        msg_text = match.group(f'{prefix}_2').strip()
+        return {
+            "to_number": phone,
+            "message": msg_text,
+            "delay_minutes": 0,
+            "query": f"Send WhatsApp to {phone}: {msg_text}",
+            "action": "create"
+        }
+
+    delay = int(match.group(f'{prefix}_2'))
+    msg_text = match.group(f'{prefix}_3').strip()
+    return {
+        "to_number": phone,
+        "message": msg_text,
+        "delay_minutes": delay,
+        "query": f"Send WhatsApp to {phone} in {delay} minutes: {msg_text}",
+        "action": "create"
+    }
+
+
+def detect(message: str) -> Tuple[Optional[str], Dict]:
+    """Rule-based intent detection: (task_type, task_args) or (None, {})."""
+    message_lower = message.lower().strip()
+
+    whatsapp_result = detect_whatsapp(message_lower)
+    if whatsapp_result:
+        return "whatsapp", whatsapp_result
+
+    match = _RETRIEVAL_RE.match(message_lower)
+    if match:
+        return f"retrieve_{match.lastgroup}", {"query": message, "action": "retrieve"}
+
+    match = _TASK_RE.match(message_lower)
+    if match:
+        return match.lastgroup, {"query": message, "action": "create"}
+
+    return None, {}
+
+
+# Clause boundaries for compound requests ("remind me to ... and add expense ...")
+_SEPARATOR_RE = re.compile(
+    r'\s*(?:;|,?\s+and\s+then\s+|,?\s+and\s+also\s+|,?\s+and\s+|,?\s+also\s+|,?\s+then\s+)\s*',
+    re.IGNORECASE,
+)
+
+
+def detect_all(message: str) -> List[Tuple[str, Dict]]:
+    """
+    Every intent in a compound message, in order. A clause only becomes its own task
+    if the rules recognise it on its own; anything else is glued back onto the clause
+    before it ("remind me to buy bread and milk" stays one reminder).
+    Falls back to detect() when fewer than two clauses are recognised.
+    """
+    single = detect(message)
+    # WhatsApp captures the rest of the message as its body, so it is never split
+    if single[0] == "whatsapp" or not _SEPARATOR_RE.search(message):
+        return [single] if single[0] else []
+
+    pieces = _SEPARATOR_RE.split(message)
+    separators = _SEPARATOR_RE.findall(message)
+    clauses: List[str] = []
+    intents: List[Tuple[str, Dict]] = []
+    for index, piece in enumerate(pieces):
+        if not piece.strip():
+            continue
+        task_type, _ = detect(piece)
+        if (task_type and task_type != "whatsapp") or not clauses:
+            clauses.append(piece.strip())
+            intents.append((task_type, {}))
+        else:
+            clauses[-1] = clauses[-1] + separators[index - 1] + piece
+
+    recognised = [(clause, intent) for clause, intent in zip(clauses, intents) if intent[0]]
+    if len(recognised) < 2:
+        return [single] if single[0] else []
+    # Re-detect on the final clause text so task args carry the full clause
+    return [detect(clause) for clause, _ in recognised]
+
+
+# ==========================================================
+# --- Golden corpus: python -m backend.tasks.intent_engine ---
+# ==========================================================
+def _detect_by_loop(message: str) -> Tuple[Optional[str], Dict]:
+    """Reference: the ordered loop of re.search calls the compiled matcher replaced."""
+    message_lower = message.lower().strip()
+    if "whatsapp" in message_lower:
+        for pattern, handler in WHATSAPP_PATTERNS:
+            match = re.search(pattern, message_lower)
+            if not match:
+                continue
+            phone = match.group(1).strip()
+            if handler == 'extract_phone_message':
+                msg_text = match.group(2).strip()
+                return "whatsapp", {"to_number": phone, "message": msg_text, "delay_minutes": 0,
+                                    "query": f"Send WhatsApp to {phone}: {msg_text}", "action": "create"}
+            delay, msg_text = int(match.group(2)), match.group(3).strip()
+            return "whatsapp", {"to_number": phone, "message": msg_text, "delay_minutes": delay,
+                                "query": f"Send WhatsApp to {phone} in {delay} minutes: {msg_text}",
+                                "action": "create"}
+    for task_type, patterns in RETRIEVAL_PATTERNS.items():
+        if any(re.search(pattern, message_lower) for pattern in patterns):
+            return f"retrieve_{task_type}", {"query": message, "action": "retrieve"}
+    for task_type, rules in TASK_PATTERNS.items():
+        if (any(re.search(pattern, message_lower) for pattern in rules["patterns"])
+                and not any(re.search(exclude, message_lower) for exclude in rules["exclude"])):
+            return task_type, {"query": message, "action": "create"}
+    return None, {}
+
+
+# (message, expected intent); WhatsApp cases also pin (to_number, message, delay_minutes)
+_GOLDEN = [
+    ("hi there, how are you doing today?", None),
+    ("tell me something interesting about black holes and how they form", None),
+    ("", None),
+    ("remind me to call mom at 5pm", "reminder"),
+    ("Remind me every monday at 9am to water the plants", "reminder"),
+    ("set reminder for the dentist tomorrow", "reminder"),
+    ("cancel all my reminders", "reminder"),
+    ("snooze", "reminder"),
+    ("show my reminders", "retrieve_reminder"),
+    ("what reminders do i have", "retrieve_reminder"),
+    ("show my notes", "retrieve_notes"),
+    ("what did i ask you yesterday", "retrieve_notes"),
+    ("list my spending this month", "retrieve_expense"),
+    ("upcoming events this week", "retrieve_event"),
+    ("list my events for next week", "retrieve_event"),
+    ("music history", "retrieve_music"),
+    ("what is 25 * 4", "calculator"),
+    ("calculate the tip on 80 dollars", "calculator"),
+    ("12 / 4", "calculator"),
+    ("schedule a meeting with priya at 3pm", "event"),
+    ("schedule a reminder for the meeting", None),
+    ("add event team lunch on friday", "event"),
+    ("add expense 250 for groceries", "expense"),
+    ("spent $40 on fuel", "expense"),
+    ("latest news on the elections", "news"),
+    ("any news reminders for me", None),
+    ("remember to buy milk", "notes"),
+    ("note that the wifi password changed", "notes"),
+    ("search for cheap flights to goa", "search"),
+    ("look up the capital of peru", "search"),
+    ("translate to french good morning", "translate"),
+    ("what is hello in spanish", "translate"),
+    ("weather in hyderabad tomorrow", "weather"),
+    ("what's the weather in hyderabad tomorrow", "weather"),
+    ("forecast for london", "weather"),
+    ("play shape of you by ed sheeran", "music"),
+    ("play some lofi music", "music"),
+    ("recent music i played", "retrieve_music"),
+    # Order between tables: retrieval wins over creation, WhatsApp over both
+    ("show my reminders and remind me to call mom", "retrieve_reminder"),
+    ("what is 5 + 5 in binary", "calculator"),
+    ("send whatsapp to +91 9876543210 saying hello", ("whatsapp", "+91 9876543210", "hello", 0)),
+    ("send whatsapp message to 9876543210: on my way", ("whatsapp", "9876543210", "on my way", 0)),
+    ("whatsapp +919876543210 in 10 minutes meeting moved", ("whatsapp", "+919876543210", "meeting moved", 10)),
+    ("schedule whatsapp to 9876543210 in 15 mins call me", ("whatsapp", "9876543210", "call me", 15)),
+    ("send whatsapp to 9876543210 in 5 min leaving now", ("whatsapp", "9876543210", "leaving now", 5)),
+    ("send a message to +1 415 555 0100 on whatsapp running late",
+     ("whatsapp", "+1 415 555 0100", "running late", 0)),
+    ("text 9876543210 on whatsapp see you soon", ("whatsapp", "9876543210", "see you soon", 0)),
+    ("open whatsapp and remind me to reply", "reminder"),
+]
+
+
+def _expected(expected: Any) -> Tuple[Optional[str], Optional[Tuple]]:
+    if isinstance(expected, tuple):
+        return expected[0], expected[1:]
+    return expected, None
+
+
+def _check_golden() -> int:
+    failures = 0
+    for text, expected in _GOLDEN:
+        intent, whatsapp = _expected(expected)
+        got = detect(text)
+        fields = (got[1]["to_number"], got[1]["message"], got[1]["delay_minutes"]) if got[0] == "whatsapp" else None
+        problems = []
+        if got[0] != intent or (whatsapp is not None and fields != whatsapp):
+            problems.append(f"got {got[0]} {fields or ''}".rstrip())
+        if got != _detect_by_loop(text):
+            problems.append(f"rule loop says {_detect_by_loop(text)[0]}")
+        if problems:
+            failures += 1
+            print(f"❌ {text!r}: expected {expected}, {'; '.join(problems)}")
+    print(f"{'✅' if not failures else '❌'} {len(_GOLDEN) - failures}/{len(_GOLDEN)} golden cases")
+    return failures
+
+
+def _time_per_message(detector, messages: List[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in messages:
+            detector(text)
+    return (time.perf_counter() - start) / (rounds * len(messages))
+
+
+if __name__ == "__main__":
+    failures = _check_golden()
+    messages = [text for text, _ in _GOLDEN]
+    rounds = 5000
+    compiled = _time_per_message(detect, messages, rounds)
+    loop = _time_per_message(_detect_by_loop, messages, rounds)
+    print(f"⚡ {len(messages)} messages x {rounds}: compiled {compiled * 1e6:.2f} µs/message, "
+          f"rule loop {loop * 1e6:.2f} µs/message ({loop / compiled:.1f}x faster)")
+    raise SystemExit(1 if failures else 0)
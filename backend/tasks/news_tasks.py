@@ -1,6 +1,7 @@
 import requests
 import os
 from backend.core.celery_app import celery_app
+from backend.tasks.progress import report_progress
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,6 +21,7 @@ def execute_news_task(task_args):
         search_query = extract_search_query(query, user_input)
         
         # Try to get real news from APIs
+        report_progress("📰 Fetching the latest headlines...")
         news_result = get_real_news(category, search_query)
         
         if news_result:
@@ -0,0 +1,22 @@
+# backend/tasks/progress.py
+from typing import Optional
+
+from celery import current_task
+
+
+def report_progress(message: str, percent: Optional[int] = None):
+    """
+    Publish a PROGRESS state for the running task.
+    The API process forwards it to the user's WebSocket (see CeleryResultListener);
+    outside a worker, or for eager calls, this is a no-op.
+    """
+    task = current_task
+    if task is None or not getattr(task.request, "id", None) or task.request.is_eager:
+        return
+    meta = {"message": message}
+    if percent is not None:
+        meta["percent"] = percent
+    try:
+        task.update_state(state="PROGRESS", meta=meta)
+    except Exception as e:
+        print(f"⚠️ Failed to report progress: {e}")
@@ -0,0 +1,187 @@
+# backend/tasks/recurrence.py
+import re
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from backend.tasks.time_parser import parse_clock, strip_time
+
+# ==========================================================
+# --- Rule format (stored on the reminder document) ---
+# ==========================================================
+# {"freq": "minutely" | "hourly" | "daily" | "weekly",
+#  "interval": 1,             # every N units
+#  "byweekday": [0, 1, 2],    # Monday=0; None means every day (daily/weekly only)
+#  "hour": 9, "minute": 0}    # wall-clock time (daily/weekly only)
+# One rule document stands for every occurrence; only the next one is ever scheduled.
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DEFAULT_TIMES = {"morning": (9, 0), "afternoon": (14, 0), "evening": (18, 0), "night": (21, 0)}
+
+_DAY = r'(?:mon|tues|wednes|thurs|fri|satur|sun)days?'
+# Only explicit repetition counts: "every ..." anywhere, or a bare adverb in a time
+# position (right after "remind me", before "at ...", or closing the message).
+# "on friday" is a one-shot date for time_parser, and "the weekly report" is just text.
+_RECURRENCE_RE = re.compile(
+    r'\b(?:'
+    r'every\s+(?:(?P<count>\d+|other)\s+)?(?P<unit>minute|hour|day|week)s?'
+    r'|every\s+(?P<kind>weekday|weekend|morning|afternoon|evening|night)s?'
+    r'|every\s+(?P<days>' + _DAY + r'(?:\s*(?:,|and|&)\s*' + _DAY + r')*)'
+    r'|(?:(?<=remind me )|(?<=remind us ))(?P<adverb>daily|hourly|weekly|nightly)'
+    r'|(?P<adverb2>daily|hourly|weekly|nightly)(?=\s+(?:at|around)\b|\s*[.!]?\s*$)'
+    r')\b',
+    re.IGNORECASE,
+)
+_DAY_NAME_RE = re.compile(_DAY, re.IGNORECASE)
+
+
+def _weekday_index(name: str) -> int:
+    name = name.lower().rstrip("s")
+    return next(index for index, day in enumerate(WEEKDAYS) if day == name)
+
+
+def parse_recurrence(query: str, now: Optional[datetime] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    (rule, query with the recurrence and its time removed), or (None, query) for a
+    one-shot reminder. "remind me every weekday at 9:00 to stand up" ->
+    ({"freq": "weekly", "byweekday": [0..4], "hour": 9, ...}, "remind me to stand up").
+    """
+    match = _RECURRENCE_RE.search(query)
+    if not match:
+        return None, query
+
+    now = now or datetime.now()
+    remainder = query[:match.start()] + " " + query[match.end():]
+    kind, adverb = match.group("kind"), match.group("adverb") or match.group("adverb2")
+    # "every evening at 7" / "nightly at 10": the part of day decides am or pm
+    part = (kind or "").lower() or ("night" if (adverb or "").lower() == "nightly" else None)
+    clock = parse_clock(remainder, part)
+    rule: Dict[str, Any] = {"freq": "daily", "interval": 1, "byweekday": None}
+
+    unit, days = match.group("unit"), match.group("days")
+    if unit:
+        count = match.group("count")
+        rule["interval"] = 2 if count == "other" else int(count or 1)
+        rule["freq"] = {"minute": "minutely", "hour": "hourly", "day": "daily", "week": "weekly"}[unit.lower()]
+        if rule["freq"] == "weekly":
+            rule["byweekday"] = [now.weekday()]
+    elif kind:
+        kind = kind.lower()
+        if kind == "weekday":
+            rule["byweekday"] = [0, 1, 2, 3, 4]
+        elif kind == "weekend":
+            rule["byweekday"] = [5, 6]
+        else:
+            clock = clock or DEFAULT_TIMES[kind]
+    elif days:
+        rule["freq"] = "weekly"
+        rule["byweekday"] = sorted({_weekday_index(day) for day in _DAY_NAME_RE.findall(days)})
+    else:
+        adverb = adverb.lower()
+        if adverb == "hourly":
+            rule["freq"] = "hourly"
+        elif adverb == "weekly":
+            rule["freq"], rule["byweekday"] = "weekly", [now.weekday()]
+        elif adverb == "nightly":
+            clock = clock or DEFAULT_TIMES["night"]
+
+    if rule["freq"] in ("daily", "weekly"):
+        rule["hour"], rule["minute"] = clock or (9, 0)
+
+    return rule, strip_time(remainder)
+
+
+def next_occurrence(rule: Dict[str, Any], after: datetime, previous: Optional[datetime] = None) -> datetime:
+    """First occurrence strictly after `after`; `previous` keeps multi-unit intervals in step."""
+    freq, interval = rule["freq"], max(1, int(rule.get("interval", 1)))
+
+    if freq in ("minutely", "hourly"):
+        step = timedelta(minutes=interval) if freq == "minutely" else timedelta(hours=interval)
+        upcoming = (previous or after) + step
+        if upcoming <= after:
+            upcoming += step * ((after - upcoming) // step + 1)
+        return upcoming.replace(microsecond=0)
+
+    at = time(rule.get("hour", 9), rule.get("minute", 0))
+    if interval > 1 and previous:
+        step = timedelta(days=interval) if freq == "daily" else timedelta(weeks=interval)
+        upcoming = datetime.combine(previous.date(), at) + step
+        while upcoming <= after:
+            upcoming += step
+        return upcoming
+
+    days = rule.get("byweekday")
+    start = datetime.combine(after.date(), at)
+    for offset in range(8):
+        candidate = start + timedelta(days=offset)
+        if candidate > after and (days is None or candidate.weekday() in days):
+            return candidate
+    raise ValueError(f"Recurrence rule has no valid weekday: {rule}")
+
+
+def describe(rule: Dict[str, Any]) -> str:
+    """Human-readable form used in replies and as the reminder's `time` field."""
+    freq, interval = rule["freq"], rule.get("interval", 1)
+    if freq in ("minutely", "hourly"):
+        unit = "minute" if freq == "minutely" else "hour"
+        return f"every {unit}" if interval == 1 else f"every {interval} {unit}s"
+
+    at = f"at {rule.get('hour', 9):02d}:{rule.get('minute', 0):02d}"
+    days = rule.get("byweekday")
+    if days == [0, 1, 2, 3, 4]:
+        when = "every weekday"
+    elif days == [5, 6]:
+        when = "every weekend"
+    elif days:
+        names = ", ".join(WEEKDAYS[day].capitalize() for day in days)
+        when = f"every {names}" if interval == 1 else f"every {interval} weeks on {names}"
+    else:
+        when = "every day" if interval == 1 else f"every {interval} days"
+    return f"{when} {at}"
+
+
+# ==========================================================
+# --- Reference corpus (python -m backend.tasks.recurrence) ---
+# ==========================================================
+# Reference "now" is Sunday 2026-10-18 10:00. Expected (freq, interval, byweekday, hour)
+# or None for a one-shot reminder, plus the text left for the reminder body.
+_CORPUS_NOW = datetime(2026, 10, 18, 10, 0)
+_CORPUS = [
+    ("remind me every day at 8am to take vitamins", ("daily", 1, None, 8), "remind me to take vitamins"),
+    ("remind me every 2 hours to drink water", ("hourly", 2, None, None), "remind me to drink water"),
+    ("remind me every weekday at 9:00 to stand up", ("daily", 1, [0, 1, 2, 3, 4], 9), "remind me to stand up"),
+    ("remind me every monday and thursday at 6pm to go running", ("weekly", 1, [0, 3], 18),
+     "remind me to go running"),
+    ("remind me every evening to journal", ("daily", 1, None, 18), "remind me to journal"),
+    ("remind me daily to stretch", ("daily", 1, None, 9), "remind me to stretch"),
+    ("remind me to water the plants daily", ("daily", 1, None, 9), "remind me to water the plants"),
+    ("remind me to take meds nightly at 10pm", ("daily", 1, None, 22), "remind me to take meds"),
+    ("remind me every evening at 7 to walk the dog", ("daily", 1, None, 19), "remind me to walk the dog"),
+    ("remind me every night at 10 to lock the door", ("daily", 1, None, 22), "remind me to lock the door"),
+    ("remind me every night at 2 to feed the baby", ("daily", 1, None, 2), "remind me to feed the baby"),
+    ("remind me every afternoon at 3 to take a break", ("daily", 1, None, 15), "remind me to take a break"),
+    ("remind me every morning at 7 to run", ("daily", 1, None, 7), "remind me to run"),
+    ("remind me to take meds nightly at 10", ("daily", 1, None, 22), "remind me to take meds"),
+    ("remind me every evening at 7am to water the lawn", ("daily", 1, None, 7), "remind me to water the lawn"),
+    ("remind me to pay rent on friday at 9am", None, None),
+    ("remind me to check the weekly report tomorrow", None, None),
+    ("remind me to read the daily news at 8am", None, None),
+    ("remind me to cancel my hourly plan", None, None),
+    ("remind me on monday to call the bank", None, None),
+]
+
+
+def _check_corpus() -> int:
+    failures = 0
+    for text, expected, remainder in _CORPUS:
+        rule, rest = parse_recurrence(text, now=_CORPUS_NOW)
+        got = (rule["freq"], rule["interval"], rule["byweekday"], rule.get("hour")) if rule else None
+        rest = " ".join(rest.split())
+        if got != expected or (remainder is not None and rest != remainder) or (rule is None and rest != text):
+            failures += 1
+            print(f"  ❌ {text!r}: expected {expected} / {remainder!r}, got {got} / {rest!r}")
+    print(f"{'✅' if not failures else '❌'} {len(_CORPUS) - failures}/{len(_CORPUS)} recurrence cases")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if _check_corpus() else 0)
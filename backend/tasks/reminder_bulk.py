@@ -0,0 +1,278 @@
+# backend/tasks/reminder_bulk.py
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import DeleteOne, UpdateOne
+
+from backend.core.celery_app import celery_app
+from backend.core.database import sync_reminders_collection
+from backend.core.logger import get_logger
+from backend.tasks.reminder_scheduler import reminder_scheduler
+from backend.tasks.time_parser import parse_time, strip_time
+
+logger = get_logger(__name__)
+
+DEFAULT_SNOOZE_MINUTES = 10
+# A reminder that fired this recently can still be snoozed ("snooze that")
+SNOOZE_WINDOW_MINUTES = 15
+
+_PROJECTION = {"user_id": 1, "text": 1, "scheduled_time": 1, "celery_task_id": 1, "is_triggered": 1}
+_RELEASE_CLAIM = {"claim_token": "", "claimed_by": "", "claimed_at": ""}
+
+
+# ==========================================================
+# --- Selection ---
+# ==========================================================
+def _selector(user_id: str, match: Optional[str], include_recently_fired: bool = False,
+              window: Optional[Dict[str, datetime]] = None) -> Dict[str, Any]:
+    """`window` ({"start", "end"}) limits the selection to reminders due in that range."""
+    scheduled: Dict[str, Any] = {"$exists": True}
+    if window:
+        scheduled = {"$gte": window["start"], "$lt": window["end"]}
+    query: Dict[str, Any] = {"user_id": user_id, "scheduled_time": scheduled}
+    if include_recently_fired:
+        query["$or"] = [
+            {"is_triggered": False},
+            {"is_triggered": True, "recurrence": {"$exists": False},
+             "triggered_at": {"$gte": datetime.now() - timedelta(minutes=SNOOZE_WINDOW_MINUTES)}},
+        ]
+    else:
+        query["is_triggered"] = False
+    if match:
+        query["text"] = {"$regex": re.escape(match.strip()), "$options": "i"}
+    return query
+
+
+def _revoke_legacy(reminders: List[Dict[str, Any]]) -> int:
+    """Reminders created before the Redis scheduler still have a countdown task in the broker."""
+    task_ids = [r["celery_task_id"] for r in reminders if r.get("celery_task_id")]
+    if task_ids:
+        # One broadcast for the whole batch instead of one per reminder
+        celery_app.control.revoke(task_ids)
+    return len(task_ids)
+
+
+# ==========================================================
+# --- Operations ---
+# ==========================================================
+def cancel_reminders(user_id: str, match: Optional[str] = None,
+                     window: Optional[Dict[str, datetime]] = None) -> Dict[str, int]:
+    """Delete every pending reminder of a user (or those whose text contains `match` / due in `window`)."""
+    reminders = list(sync_reminders_collection.find(_selector(user_id, match, window=window), _PROJECTION))
+    if not reminders:
+        return {"matched": 0, "cancelled": 0, "revoked": 0}
+
+    # is_triggered stays in the filter so a reminder that fires meanwhile is not deleted
+    result = sync_reminders_collection.bulk_write(
+        [DeleteOne({"_id": r["_id"], "is_triggered": False}) for r in reminders], ordered=False
+    )
+    reminder_scheduler.unschedule_many([str(r["_id"]) for r in reminders])
+    return {"matched": len(reminders), "cancelled": result.deleted_count, "revoked": _revoke_legacy(reminders)}
+
+
+def _move(reminders: List[Dict[str, Any]], new_times: List[datetime]) -> Dict[str, int]:
+    operations, entries = [], []
+    for reminder, when in zip(reminders, new_times):
+        operations.append(UpdateOne(
+            {"_id": reminder["_id"], "is_triggered": reminder.get("is_triggered", False),
+             "scheduled_time": reminder["scheduled_time"]},
+            {"$set": {"scheduled_time": when, "is_triggered": False, "celery_task_id": None},
+             "$unset": _RELEASE_CLAIM},
+        ))
+        entries.append((str(reminder["_id"]), reminder["user_id"], reminder["text"], when))
+
+    result = sync_reminders_collection.bulk_write(operations, ordered=False)
+    reminder_scheduler.schedule_many(entries)
+    return {"matched": len(reminders), "updated": result.modified_count, "revoked": _revoke_legacy(reminders)}
+
+
+def snooze_reminders(user_id: str, minutes: int = DEFAULT_SNOOZE_MINUTES, match: Optional[str] = None,
+                     include_pending: bool = True, window: Optional[Dict[str, datetime]] = None) -> Dict[str, int]:
+    """
+    Push matching reminders back by `minutes`. Ones that fired in the last
+    SNOOZE_WINDOW_MINUTES are re-armed from now; with include_pending, reminders that
+    have not fired yet move relative to their due time as well.
+    """
+    selector = _selector(user_id, match, include_recently_fired=True, window=window)
+    if not include_pending:
+        selector["$or"] = selector["$or"][1:]
+    reminders = list(sync_reminders_collection.find(selector, _PROJECTION))
+    if not reminders:
+        return {"matched": 0, "updated": 0, "revoked": 0}
+
+    now, delta = datetime.now(), timedelta(minutes=minutes)
+    new_times = [max(r["scheduled_time"], now) + delta for r in reminders]
+    return _move(reminders, new_times)
+
+
+def reschedule_reminders(user_id: str, when: datetime, match: Optional[str] = None,
+                         window: Optional[Dict[str, datetime]] = None) -> Dict[str, int]:
+    """Move matching pending reminders to `when` (a recurring one resumes its rule afterwards)."""
+    reminders = list(sync_reminders_collection.find(_selector(user_id, match, window=window), _PROJECTION))
+    if not reminders:
+        return {"matched": 0, "updated": 0, "revoked": 0}
+    return _move(reminders, [when] * len(reminders))
+
+
+# ==========================================================
+# --- Chat commands ("cancel all my reminders", "snooze by 5 minutes") ---
+# ==========================================================
+# A message is a management command only when the verb acts on a reminder object:
+#   "<verb> [all|my|the ...] [up to four words] reminder(s) [about|for|to ... X]"
+# with the verb opening the message (after "please", "can you", ...), or
+#   "... <verb> [all|my|the ...] reminder(s)" anywhere.
+# A bare "snooze [it|that] [for N minutes]" opening the message snoozes what just fired.
+# Anything else ("can you remind me to cancel netflix") is not a command.
+_VERBS = r'cancel|delete|remove|clear|snooze|postpone|reschedule|move'
+_LEAD = r'^(?:(?:please|pls|hey|ok|okay|kindly|can you|could you|would you)\s+)*'
+_DETERMINERS = r'(?:(?:all|of|my|the|every|these|those|this|that)\s+)*'
+_OBJECT_RE = re.compile(
+    r'\b(?P<verb>' + _VERBS + r')\s+' + _DETERMINERS +
+    r'(?P<match>(?:[\w\'-]+\s+){0,4}?)reminders?\b(?P<rest>.*)$'
+)
+_LEADING_RE = re.compile(_LEAD + r'$')
+_BARE_SNOOZE_RE = re.compile(
+    _LEAD + r'(?:snooze)(?:\s+(?:it|that|this))?(?:\s+(?:by|for)\s+\d+\s*(?:min(?:ute)?s?|hours?|hrs?))?[\s.!]*$'
+)
+_CREATE_RE = re.compile(r'\b(?:remind me|set (?:a\s+)?reminder|alert me)\b')
+_REST_MATCH_RE = re.compile(
+    r'^\s*(?:about|for|to|called|named|saying|on|at)\s+(?!\d+\s*(?:min|hour|hr))(?P<match>.+?)'
+    r'(?:\s+(?:by|for)\s+\d+.*)?$'
+)
+_ALL_WORDS = {"", "all", "all my", "all the", "every", "my", "the", "all of my", "that", "this", "it"}
+_MINUTES_RE = re.compile(r'\b(?:by|for)\s+(?P<n>\d+)\s*(?P<unit>min(?:ute)?s?|hours?|hrs?)\b')
+
+
+def _time_filter(text: str) -> Optional[Dict[str, Any]]:
+    """"tomorrow" / "at 5pm" / "on friday at 9" -> a scheduled_time filter instead of a text match."""
+    parsed = parse_time(text)
+    if not parsed or re.sub(r'\b(?:the|my|on|at|for)\b', '', strip_time(text)).strip():
+        return None
+    if parsed.explicit_clock:
+        return {"start": parsed.when, "end": parsed.when + timedelta(minutes=1)}
+    day = datetime.combine(parsed.when.date(), datetime.min.time())
+    return {"start": day, "end": day + timedelta(days=1)}
+
+
+def parse_bulk_command(query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """("cancel" | "snooze" | "reschedule", params) for a management command, else None."""
+    query = re.sub(r'\s+', ' ', query.lower()).strip()
+
+    if _BARE_SNOOZE_RE.match(query):
+        found = _MINUTES_RE.search(query)
+        minutes = DEFAULT_SNOOZE_MINUTES
+        if found:
+            minutes = int(found.group("n")) * (60 if found.group("unit").startswith("h") else 1)
+        return "snooze", {"minutes": minutes, "match": None, "window": None, "include_pending": False}
+
+    verb_found = re.search(r'\b(?:' + _VERBS + r')\b', query)
+    body, target = query, None
+    if verb_found and verb_found.group(0) in ("reschedule", "move") and " to " in query[verb_found.end():]:
+        # The last " to " introduces the new time: "move my reminder to call mom to 6pm"
+        body, target = query.rsplit(" to ", 1)
+
+    command = _OBJECT_RE.search(body)
+    if not command:
+        return None
+    at_start = bool(_LEADING_RE.match(body[:command.start()]))
+    words = command.group("match").strip()
+    # Mid-sentence verbs only count as "<verb> [all|my|the] reminders"; words before
+    # "reminder" are only trusted when the verb opens the message
+    if not at_start and words:
+        return None
+    # "remind me to cancel my reminder" is a creation, whatever follows
+    if _CREATE_RE.search(body[:command.start()]):
+        return None
+
+    match = words or None
+    if not match:
+        rest = _REST_MATCH_RE.match(command.group("rest"))
+        if rest:
+            match = rest.group("match").strip()
+    window = None
+    if match:
+        window = _time_filter(match)
+        if window:
+            match = None
+        else:
+            match = re.sub(r'^(?:all\s+)?(?:my|the)\s+', '', match)
+            if match in _ALL_WORDS:
+                match = None
+
+    verb = command.group("verb")
+    if verb in ("snooze", "postpone"):
+        minutes = DEFAULT_SNOOZE_MINUTES
+        found = _MINUTES_RE.search(query)
+        if found:
+            minutes = int(found.group("n")) * (60 if found.group("unit").startswith("h") else 1)
+        # "snooze my reminder" means the one that just went off, not everything pending
+        include_pending = bool(match or window) or bool(re.search(r'\ball\b', query))
+        return "snooze", {"minutes": minutes, "match": match, "window": window, "include_pending": include_pending}
+
+    if verb in ("reschedule", "move"):
+        parsed = parse_time(target) if target else None
+        if not parsed:
+            return None
+        return "reschedule", {"when": parsed.when, "match": match, "window": window}
+
+    return "cancel", {"match": match, "window": window}
+
+
+def run_bulk_command(user_id: str, command: str, params: Dict[str, Any]) -> str:
+    target = f"reminders matching '{params['match']}'" if params.get("match") else "reminders"
+    if params.get("window"):
+        target += f" due {params['window']['start'].strftime('%Y-%m-%d')}"
+    if command == "cancel":
+        counts = cancel_reminders(user_id, params.get("match"), params.get("window"))
+        if not counts["matched"]:
+            return f"⏰ No pending {target} to cancel."
+        return f"🗑️ Cancelled {counts['cancelled']} {target}."
+    if command == "snooze":
+        counts = snooze_reminders(user_id, params["minutes"], params.get("match"), params.get("include_pending", True),
+                                  params.get("window"))
+        if not counts["matched"]:
+            return f"⏰ No {target} to snooze."
+        return f"😴 Snoozed {counts['updated']} {target} by {params['minutes']} minutes."
+    counts = reschedule_reminders(user_id, params["when"], params.get("match"), params.get("window"))
+    if not counts["matched"]:
+        return f"⏰ No pending {target} to reschedule."
+    return f"📅 Moved {counts['updated']} {target} to {params['when'].strftime('%Y-%m-%d %H:%M')}."
+
+
+
+# Reference checks for the command grammar; run with python -m backend.tasks.reminder_bulk
+_COMMAND_CASES = [
+    ("cancel all my reminders", ("cancel", None)),
+    ("delete my dentist reminder", ("cancel", "dentist")),
+    ("please remove the reminder about the gym", ("cancel", "gym")),
+    ("can you clear all reminders", ("cancel", None)),
+    ("cancel my reminder for tomorrow", ("cancel", None)),
+    ("snooze", ("snooze", None)),
+    ("snooze that for 5 minutes", ("snooze", None)),
+    ("snooze my dentist reminder for 1 hour", ("snooze", "dentist")),
+    ("move my reminder to call mom to 6pm", ("reschedule", "call mom")),
+    ("reschedule all reminders to tomorrow at 9am", ("reschedule", None)),
+    ("i need to cancel the meeting, remind me later", None),
+    ("can you remind me to cancel netflix", None),
+    ("remind me to cancel netflix", None),
+    ("remind me to delete the old reminder emails tomorrow", None),
+    ("i want to cancel my gym membership reminder me", None),
+    ("postpone the meeting to friday", None),
+    ("cancel the meeting", None),
+]
+
+
+def _check_commands() -> int:
+    failures = 0
+    for text, expected in _COMMAND_CASES:
+        parsed = parse_bulk_command(text)
+        got = (parsed[0], parsed[1].get("match")) if parsed else None
+        if got != expected:
+            failures += 1
+            print(f"  ❌ {text!r}: expected {expected}, got {got}")
+    print(f"{'✅' if not failures else '❌'} {len(_COMMAND_CASES) - failures}/{len(_COMMAND_CASES)} command cases")
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(1 if _check_commands() else 0)
@@ -0,0 +1,226 @@
+# backend/tasks/reminder_scheduler.py
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from backend.core.celery_app import celery_app
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ==========================================================
+# --- Keys and tuning ---
+# ==========================================================
+# due:      ZSET reminder_id -> due time (epoch seconds)
+# inflight: ZSET reminder_id -> claim time; entries leave once the trigger task is published
+# payload:  HASH reminder_id -> JSON {user_id, text}
+DUE_KEY = "reminders:due"
+INFLIGHT_KEY = "reminders:inflight"
+PAYLOAD_KEY = "reminders:payload"
+
+SCHEDULER_BATCH_SIZE = int(os.getenv("REMINDER_SCHEDULER_BATCH", "500"))
+SCHEDULER_MAX_SLEEP = float(os.getenv("REMINDER_SCHEDULER_MAX_SLEEP", "1.0"))
+# A claim that was never published (dispatcher died mid-batch) goes back to `due` after this
+INFLIGHT_RECOVER_SECONDS = int(os.getenv("REMINDER_SCHEDULER_RECOVER_SECONDS", "60"))
+
+TRIGGER_TASK = "backend.tasks.reminder_tasks.trigger_reminder"
+
+# Moves up to ARGV[2] due members into the inflight set and returns [id, payload, ...].
+# Runs atomically inside Redis, so a reminder is claimed by exactly one dispatcher.
+_CLAIM_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local claimed = {}
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[1], id)
+    table.insert(claimed, id)
+    table.insert(claimed, redis.call('HGET', KEYS[3], id) or false)
+end
+return claimed
+"""
+
+# Puts claims older than ARGV[1] back into `due` (scored now) so the next pass republishes them
+_RECOVER_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[1], ARGV[2], id)
+end
+return #ids
+"""
+
+
+class ReminderScheduler:
+    """
+    Time-wheel for one-shot reminders, kept in Redis instead of in Celery workers.
+
+    Reminders are a sorted set scored by due time. A single dispatcher process
+    (python -m backend.tasks.reminder_scheduler) claims due entries in batches with a
+    Lua script and publishes one trigger_reminder task per entry to the background
+    queue. Nothing waits in worker memory, so pending reminders cost one ZSET member
+    and one hash field each, and several dispatchers can run side by side without
+    claiming the same reminder twice.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or celery_app.conf.broker_url
+        self._redis = None
+        self._claim = None
+        self._recover = None
+        self.stats = {"scheduled": 0, "unscheduled": 0, "dispatched": 0, "recovered": 0, "errors": 0}
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.url, decode_responses=True)
+            self._claim = self._redis.register_script(_CLAIM_SCRIPT)
+            self._recover = self._redis.register_script(_RECOVER_SCRIPT)
+        return self._redis
+
+    # ==========================================================
+    # PRODUCER SIDE (called from reminder tasks)
+    # ==========================================================
+    def schedule(self, reminder_id: str, user_id: str, text: str, when: datetime) -> bool:
+        """Add (or move) a reminder; `when` is a naive local datetime like everywhere else."""
+        payload = json.dumps({"user_id": user_id, "text": text})
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(PAYLOAD_KEY, reminder_id, payload)
+        pipe.zadd(DUE_KEY, {reminder_id: when.timestamp()})
+        pipe.execute()
+        self.stats["scheduled"] += 1
+        return True
+
+    def schedule_many(self, entries: List[Tuple[str, str, str, datetime]]) -> int:
+        """Bulk schedule()/move in one round trip; entries are (reminder_id, user_id, text, when)."""
+        if not entries:
+            return 0
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(PAYLOAD_KEY, mapping={
+            reminder_id: json.dumps({"user_id": user_id, "text": text})
+            for reminder_id, user_id, text, _ in entries
+        })
+        pipe.zadd(DUE_KEY, {reminder_id: when.timestamp() for reminder_id, _, _, when in entries})
+        pipe.execute()
+        self.stats["scheduled"] += len(entries)
+        return len(entries)
+
+    def reschedule(self, reminder_id: str, when: datetime) -> bool:
+        """Move a pending reminder; False if it already fired or was never scheduled."""
+        changed = self.redis.zadd(DUE_KEY, {reminder_id: when.timestamp()}, xx=True, ch=True)
+        return bool(changed)
+
+    def unschedule(self, reminder_id: str) -> bool:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrem(DUE_KEY, reminder_id)
+        pipe.hdel(PAYLOAD_KEY, reminder_id)
+        removed, _ = pipe.execute()
+        if removed:
+            self.stats["unscheduled"] += 1
+        return bool(removed)
+
+    def unschedule_many(self, reminder_ids: List[str]) -> int:
+        if not reminder_ids:
+            return 0
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrem(DUE_KEY, *reminder_ids)
+        pipe.hdel(PAYLOAD_KEY, *reminder_ids)
+        removed, _ = pipe.execute()
+        self.stats["unscheduled"] += removed
+        return removed
+
+    def is_scheduled(self, reminder_id: str) -> bool:
+        return self.redis.zscore(DUE_KEY, reminder_id) is not None
+
+    # ==========================================================
+    # DISPATCHER SIDE
+    # ==========================================================
+    def dispatch_due(self, now: Optional[float] = None, batch_size: int = SCHEDULER_BATCH_SIZE) -> int:
+        """Claim one batch of due reminders and publish their trigger tasks."""
+        now = now if now is not None else time.time()
+        self.redis  # make sure the scripts are registered
+        claimed = self._claim(keys=[DUE_KEY, INFLIGHT_KEY, PAYLOAD_KEY], args=[now, batch_size])
+        if not claimed:
+            return 0
+
+        published: List[str] = []
+        for reminder_id, raw in zip(claimed[::2], claimed[1::2]):
+            if not raw:
+                # Unscheduled between ZADD and claim; nothing to deliver
+                published.append(reminder_id)
+                continue
+            payload = json.loads(raw)
+            try:
+                celery_app.send_task(TRIGGER_TASK, args=[payload["user_id"], payload["text"], reminder_id])
+                published.append(reminder_id)
+            except Exception as e:
+                # Left in `inflight`; recover_stale() hands it back to `due`
+                self.stats["errors"] += 1
+                logger.error(f"❌ Failed to publish reminder {reminder_id}: {e}")
+
+        if published:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zrem(INFLIGHT_KEY, *published)
+            pipe.hdel(PAYLOAD_KEY, *published)
+            pipe.execute()
+        self.stats["dispatched"] += len(published)
+        return len(claimed) // 2
+
+    def recover_stale(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        self.redis
+        recovered = self._recover(keys=[DUE_KEY, INFLIGHT_KEY], args=[now - INFLIGHT_RECOVER_SECONDS, now])
+        if recovered:
+            self.stats["recovered"] += recovered
+            logger.warning(f"⚠️ Recovered {recovered} reminder claims that were never published")
+        return recovered
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        now = now if now is not None else time.time()
+        head = self.redis.zrange(DUE_KEY, 0, 0, withscores=True)
+        if not head:
+            return SCHEDULER_MAX_SLEEP
+        return max(0.0, min(head[0][1] - now, SCHEDULER_MAX_SLEEP))
+
+    def run_forever(self):
+        logger.info(f"⏰ Reminder scheduler started (batch={SCHEDULER_BATCH_SIZE})")
+        last_recover = 0.0
+        while True:
+            try:
+                now = time.time()
+                if now - last_recover >= INFLIGHT_RECOVER_SECONDS:
+                    self.recover_stale(now)
+                    last_recover = now
+                # A full batch means more are due: loop again without sleeping
+                if self.dispatch_due(now) >= SCHEDULER_BATCH_SIZE:
+                    continue
+                time.sleep(self.seconds_until_next())
+            except redis.RedisError as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ Reminder scheduler Redis error: {e}")
+                time.sleep(SCHEDULER_MAX_SLEEP)
+
+    def get_stats(self) -> Dict[str, Any]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(DUE_KEY)
+        pipe.zcard(INFLIGHT_KEY)
+        pipe.zrange(DUE_KEY, 0, 0, withscores=True)
+        pending, inflight, head = pipe.execute()
+        return {
+            **self.stats,
+            "pending": pending,
+            "inflight": inflight,
+            "next_due_in_seconds": round(head[0][1] - time.time(), 1) if head else None,
+        }
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+reminder_scheduler = ReminderScheduler()
+
+if __name__ == "__main__":
+    reminder_scheduler.run_forever()
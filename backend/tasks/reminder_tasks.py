@@ -3,6 +3,7 @@ import re
 from backend.core.celery_app import celery_app
 import requests
 import os
+import socket
 from dotenv import load_dotenv
 
 from backend.core.database import (
@@ -10,10 +11,18 @@ from backend.core.database import (
     save_user_reminder_sync, 
     delete_user_reminder_sync, 
     mark_reminder_triggered_sync,
-    get_pending_reminders_sync,
-    update_reminder_celery_task_sync,
+    get_reminder_sync,
+    advance_recurring_reminder_sync,
+    claim_due_reminders_sync,
     save_user_notification_sync
 )
+from backend.tasks.reminder_scheduler import reminder_scheduler
+from backend.tasks.recurrence import describe, next_occurrence, parse_recurrence
+from backend.tasks.time_parser import parse_time, strip_time
+from backend.tasks.reminder_bulk import parse_bulk_command, run_bulk_command
+
+SWEEP_GRACE_SECONDS = int(os.getenv("REMINDER_SWEEP_GRACE_SECONDS", "120"))
+SWEEP_BATCH_SIZE = int(os.getenv("REMINDER_SWEEP_BATCH_SIZE", "200"))
 
 @celery_app.task
 def execute_reminder_task(task_args):
@@ -39,6 +48,11 @@ def execute_reminder_task(task_args):
             reminder_text = query.replace("reminder triggered:", "").strip()
             return f"🔔 REMINDER: {reminder_text}"
              
+        # Cancel / snooze / reschedule in bulk (one bulk_write + one scheduler update)
+        command = parse_bulk_command(query) if action != "retrieve" else None
+        if command:
+            return run_bulk_command(user_id, *command)
+             
         if action == "retrieve" or any(word in query for word in ['show', 'list', 'view']):
             # Get reminders from MongoDB
             reminders = get_user_reminders_sync(user_id)
@@ -53,23 +67,30 @@ def execute_reminder_task(task_args):
                 return "⏰ No active reminders."
             
             reminder_list = "\n".join([
+                f"- {r['text']} ({describe(r['recurrence'])}, next {r['scheduled_time'].strftime('%Y-%m-%d %H:%M')})"
+                if r.get('recurrence') else
                 f"- {r['text']} (scheduled for {r['scheduled_time'].strftime('%Y-%m-%d %H:%M')})"
                 for r in pending_reminders
             ])
             return f"⏰ Your active reminders:\n{reminder_list}"
             
         else:
-            # Create new reminder - PRIMARY SYSTEM: Celery ETA
-            reminder_text = extract_reminder_text(query)
-            reminder_time_str = extract_reminder_time(query)
-            
-            print(f"🔧 DEBUG: Extracted text: '{reminder_text}'")
-            print(f"🔧 DEBUG: Extracted time string: '{reminder_time_str}'")
-            
-            # Parse the time and calculate exact trigger datetime
-            reminder_datetime = parse_reminder_time(reminder_time_str)
+            # Recurring reminder: one rule document, only the next occurrence is scheduled
+            recurrence, remainder = parse_recurrence(query)
+            if recurrence:
+                return create_recurring_reminder(user_id, recurrence, remainder)
+
+            # Create new reminder - PRIMARY SYSTEM: Redis scheduler
+            timezone = task_args.get('timezone') if isinstance(task_args, dict) else None
+            parsed = parse_time(query, tz=timezone)
+            reminder_text = extract_reminder_text(strip_time(query))
+            if parsed:
+                reminder_datetime, reminder_time_str = parsed.when, parsed.expression
+            else:
+                # No time given: default to one hour from now
+                reminder_datetime, reminder_time_str = datetime.now() + timedelta(hours=1), "in 1 hour"
             
-            print(f"🔧 DEBUG: Final scheduled time: {reminder_datetime}")
+            print(f"🔧 DEBUG: Reminder '{reminder_text}' at {reminder_datetime} ('{reminder_time_str}')")
             
             # Save to database first (PERSISTENT STORAGE)
             reminder_id = save_user_reminder_sync(
@@ -79,24 +100,20 @@ def execute_reminder_task(task_args):
                 scheduled_time=reminder_datetime
             )
             
-            # PRIMARY SYSTEM: Schedule with Celery ETA for exact timing
-            scheduled_task = schedule_reminder_with_eta(
+            # PRIMARY SYSTEM: Redis time-wheel (see reminder_scheduler.py)
+            schedule_reminder(
                 user_id=user_id,
                 reminder_id=reminder_id,
                 reminder_text=reminder_text,
                 reminder_datetime=reminder_datetime
             )
             
-            # Store Celery task ID in database for tracking
-            if scheduled_task:
-                update_reminder_celery_task_sync(reminder_id, scheduled_task.id)
-            
             return f"⏰ Reminder set: '{reminder_text}' for {reminder_datetime.strftime('%Y-%m-%d %H:%M')}"
             
     except Exception as e:
         return f"❌ Reminder task error: {str(e)}"
 
-@celery_app.task
+@celery_app.task(ignore_result=True)
 def trigger_reminder(user_id, reminder_text, reminder_id):
     """
     Task that actually triggers the reminder notification
@@ -105,8 +122,11 @@ def trigger_reminder(user_id, reminder_text, reminder_id):
         current_time = datetime.now().strftime('%H:%M:%S')
         print(f"🔔 REMINDER TRIGGERED at {current_time} for user {user_id}: {reminder_text}")
         
-        # Mark as triggered in database to prevent duplicates
-        mark_reminder_triggered_sync(reminder_id)
+        # Atomic claim: the scheduler and the backup sweep may both publish the same
+        # reminder, but only the first trigger gets to deliver it
+        if not claim_occurrence(user_id, reminder_text, reminder_id):
+            print(f"⏭️ Reminder {reminder_id} already delivered, skipping")
+            return f"⏭️ Reminder already delivered: {reminder_text}"
         
         # Store reminder via HTTP endpoint (NOT DialogueManager)
         load_dotenv()
@@ -130,70 +150,105 @@ def trigger_reminder(user_id, reminder_text, reminder_id):
         return f"Error triggering reminder: {e}"
     
 
-def schedule_reminder_with_eta(user_id, reminder_id, reminder_text, reminder_datetime):
+def create_recurring_reminder(user_id, recurrence, remainder):
+    """Store the rule once and schedule its first occurrence"""
+    reminder_text = extract_reminder_text(remainder)
+    first_time = next_occurrence(recurrence, datetime.now())
+    when = describe(recurrence)
+    print(f"🔁 DEBUG: Recurring reminder '{reminder_text}' {when}, first at {first_time}")
+
+    reminder_id = save_user_reminder_sync(
+        user_id=user_id,
+        text=reminder_text,
+        time=when,
+        scheduled_time=first_time,
+        recurrence=recurrence
+    )
+    schedule_reminder(
+        user_id=user_id,
+        reminder_id=reminder_id,
+        reminder_text=reminder_text,
+        reminder_datetime=first_time
+    )
+    return f"🔁 Recurring reminder set: '{reminder_text}' {when} (next: {first_time.strftime('%Y-%m-%d %H:%M')})"
+
+def claim_occurrence(user_id, reminder_text, reminder_id):
     """
-    PRIMARY SYSTEM: Schedule reminder using Celery countdown for exact timing
+    True if this trigger owns the delivery. One-shot reminders are flipped to
+    is_triggered; recurring ones are advanced to their next occurrence, which is
+    handed back to the scheduler.
+    """
+    reminder = get_reminder_sync(reminder_id, {"recurrence": 1, "scheduled_time": 1})
+    if not reminder or not reminder.get("recurrence"):
+        return mark_reminder_triggered_sync(reminder_id)
+
+    fired_time = reminder["scheduled_time"]
+    now = datetime.now()
+    # Already advanced by another trigger for this occurrence
+    if fired_time > now + timedelta(seconds=5):
+        return False
+
+    # Occurrences missed while nothing was running are skipped, not replayed
+    next_time = next_occurrence(reminder["recurrence"], max(fired_time, now), previous=fired_time)
+    if not advance_recurring_reminder_sync(reminder_id, fired_time, next_time):
+        return False
+
+    schedule_reminder(user_id, reminder_id, reminder_text, next_time)
+    print(f"🔁 Next occurrence of {reminder_id}: {next_time}")
+    return True
+
+def schedule_reminder(user_id, reminder_id, reminder_text, reminder_datetime):
+    """
+    PRIMARY SYSTEM: Hand the reminder to the Redis scheduler, which publishes
+    trigger_reminder when it is due. No Celery task waits on a countdown.
     """
     try:
-        now = datetime.now()
-        
-        # Calculate seconds until reminder time
-        delay_seconds = (reminder_datetime - now).total_seconds()
-        
-        print(f"🕒 DEBUG: Current time: {now}")
-        print(f"🕒 DEBUG: Reminder time: {reminder_datetime}")
-        print(f"🕒 DEBUG: Delay seconds: {delay_seconds}")
-        
-        # Only schedule if the time is in the future
-        if delay_seconds > 0:
-            # Use countdown instead of ETA (better Windows compatibility)
-            scheduled_task = trigger_reminder.apply_async(
-                args=[user_id, reminder_text, reminder_id],
-                countdown=delay_seconds  # Seconds until execution
-            )
-            
-            print(f"📅 PRIMARY SYSTEM: Reminder scheduled with countdown for {delay_seconds:.0f} seconds")
-            print(f"   Will trigger at: {reminder_datetime}")
-            print(f"   Task ID: {scheduled_task.id}")
-            return scheduled_task
-        else:
-            # If time is in the past, trigger immediately
+        if reminder_datetime <= datetime.now():
             print("⚡ Reminder time is in past, triggering immediately")
             trigger_reminder.delay(user_id, reminder_text, reminder_id)
-            return None
+            return False
+
+        reminder_scheduler.schedule(reminder_id, user_id, reminder_text, reminder_datetime)
+        print(f"📅 PRIMARY SYSTEM: Reminder {reminder_id} queued for {reminder_datetime}")
+        return True
             
     except Exception as e:
         print(f"❌ Error scheduling reminder: {e}")
         # Even if scheduling fails, reminder is in database and backup system will catch it
-        return None
+        return False
 
-@celery_app.task
+@celery_app.task(ignore_result=True)
 def check_missed_reminders():
     """
     BACKUP SYSTEM: Periodic check for missed reminders
-    Runs every 10 minutes to catch reminders that Celery ETA might have missed
-    (e.g., due to system restart, Celery worker crash, etc.)
+    Runs every 10 minutes to catch reminders the Redis scheduler never delivered
+    (e.g., Redis flushed, scheduler down, trigger task lost).
+
+    Reminders are claimed in one indexed update_many with a claim token, then streamed
+    back with a batch-sized cursor, so the cost does not depend on collection size and
+    two overlapping sweeps never claim the same reminder.
     """
     try:
         print("🔍 BACKUP SYSTEM: Checking for missed reminders...")
-        
-        # Find reminders that should have triggered but haven't
-        pending_reminders = get_pending_reminders_sync()
-        
+
+        # Anything due within the grace window is still the scheduler's to deliver
+        due_before = datetime.now() - timedelta(seconds=SWEEP_GRACE_SECONDS)
+        claimer = f"sweep@{socket.gethostname()}:{os.getpid()}"
+        claimed = claim_due_reminders_sync(claimer, due_before, batch_size=SWEEP_BATCH_SIZE)
+
         triggered_count = 0
-        for reminder in pending_reminders:
-            # Check if reminder is past its scheduled time
-            if reminder['scheduled_time'] <= datetime.now():
-                print(f"🔔 BACKUP: Triggering missed reminder: {reminder['text']}")
-                
-                # Trigger the reminder
-                trigger_reminder.delay(
-                    reminder['user_id'],
-                    reminder['text'],
-                    str(reminder['_id'])
-                )
-                triggered_count += 1
-        
+        batch = []
+        for reminder in claimed:
+            reminder_id = str(reminder['_id'])
+            trigger_reminder.delay(reminder['user_id'], reminder['text'], reminder_id)
+            batch.append(reminder_id)
+            triggered_count += 1
+            if len(batch) >= SWEEP_BATCH_SIZE:
+                reminder_scheduler.unschedule_many(batch)
+                batch = []
+        # The sweep owns these now; drop them from the time-wheel so it does not republish
+        reminder_scheduler.unschedule_many(batch)
+
         result_msg = f"✅ Backup check complete. Triggered {triggered_count} missed reminders."
         print(result_msg)
         return result_msg
@@ -218,10 +273,8 @@ def extract_reminder_text(query):
     for pattern in patterns:
         match = re.search(pattern, query, re.IGNORECASE)
         if match:
-            text = match.group(1)
-            # Remove time-related phrases to get clean text
-            text = re.sub(r'\b(at|on|tomorrow|today|in|next|this)\b\s+.+', '', text, flags=re.IGNORECASE)
-            return text.strip()
+            # Callers pass the query through strip_time first, so no time words are left
+            return match.group(1).strip()
     
     # Fallback: extract words after "remind" or "reminder"
     words = query.split()
@@ -231,125 +284,3 @@ def extract_reminder_text(query):
             return ' '.join(words[remind_index + 1:])
     
     return "Something important"
-
-def extract_reminder_time(query):
-    """Extract reminder time string from user query"""
-    print(f"🕒 DEBUG: Extracting time from: '{query}'")
-    
-    # Handle "at 19:35" format more precisely
-    time_match = re.search(r'at\s+(\d{1,2}:\d{2})', query, re.IGNORECASE)
-    if time_match:
-        time_part = time_match.group(1).strip()
-        print(f"🕒 DEBUG: Found 'at' time: '{time_part}'")
-        return f"at {time_part}"
-    
-    # Handle "in X minutes/hours"
-    time_match = re.search(r'in\s+(\d+)\s*(minute|hour|day|week)s?', query, re.IGNORECASE)
-    if time_match:
-        amount = time_match.group(1)
-        unit = time_match.group(2)
-        print(f"🕒 DEBUG: Found 'in' time: {amount} {unit}s")
-        return f"in {amount} {unit}s"
-    
-    # Handle "tomorrow"
-    if 'tomorrow' in query.lower():
-        time_match = re.search(r'tomorrow\s*(at\s+\d{1,2}:\d{2})?', query, re.IGNORECASE)
-        if time_match and time_match.group(1):
-            time_part = time_match.group(1).replace('at', '').strip()
-            print(f"🕒 DEBUG: Found tomorrow at: '{time_part}'")
-            return f"at {time_part}"
-        else:
-            print("🕒 DEBUG: Found tomorrow without specific time")
-            return "tomorrow"
-    
-    # Handle "today at"
-    time_match = re.search(r'today\s+at\s+(\d{1,2}:\d{2})', query, re.IGNORECASE)
-    if time_match:
-        time_part = time_match.group(1).strip()
-        print(f"🕒 DEBUG: Found today at: '{time_part}'")
-        return f"at {time_part}"
-    
-    print(f"🕒 DEBUG: No time pattern matched, using default 'in 1 hour'")
-    return "in 1 hour"  # Default fallback
-
-def parse_reminder_time(time_str):
-    """Parse natural language time into exact datetime object"""
-    time_str = time_str.lower().strip()
-    now = datetime.now()
-    
-    print(f"🕒 DEBUG: Parsing time string: '{time_str}'")
-    print(f"🕒 DEBUG: Current time: {now}")
-    
-    # Handle "at" times FIRST (most common case)
-    if time_str.startswith('at '):
-        time_part = time_str[3:].strip()  # Remove "at " prefix
-        print(f"🕒 DEBUG: Processing 'at' time: '{time_part}'")
-        return combine_date_time(now.date(), time_part)
-    
-    # Handle "in X minutes/hours/days"
-    time_match = re.search(r'in\s+(\d+)\s*(minute|hour|day|week)s?', time_str)
-    if time_match:
-        amount = int(time_match.group(1))
-        unit = time_match.group(2)
-        print(f"🕒 DEBUG: Found 'in' format: {amount} {unit}s")
-        
-        if unit == 'minute':
-            return now + timedelta(minutes=amount)
-        elif unit == 'hour':
-            return now + timedelta(hours=amount)
-        elif unit == 'day':
-            return now + timedelta(days=amount)
-        elif unit == 'week':
-            return now + timedelta(weeks=amount)
-    
-    # Handle "tomorrow"
-    if time_str == 'tomorrow':
-        tomorrow = now + timedelta(days=1)
-        print("🕒 DEBUG: Found 'tomorrow', using default 9 AM")
-        return tomorrow.replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    print(f"🕒 DEBUG: No specific time pattern found, defaulting to 1 hour from now")
-    # Default: 1 hour from now
-    return now + timedelta(hours=1)
-
-def combine_date_time(date_obj, time_str):
-    """Combine date object with time string to create datetime"""
-    try:
-        time_str = time_str.strip()
-        print(f"🕒 DEBUG: Combining date {date_obj} with time '{time_str}'")
-        
-        # Handle 12-hour format with AM/PM
-        if 'pm' in time_str.lower():
-            time_obj = datetime.strptime(time_str, '%I:%M %p').time()
-        elif 'am' in time_str.lower():
-            time_obj = datetime.strptime(time_str, '%I:%M %p').time()
-        else:
-            # Handle 24-hour format
-            if ':' in time_str:
-                time_obj = datetime.strptime(time_str, '%H:%M').time()
-            else:
-                # Default time if not specified
-                time_obj = datetime.strptime('09:00', '%H:%M').time()
-        
-        result = datetime.combine(date_obj, time_obj)
-        print(f"🕒 DEBUG: Combined result: {result}")
-        return result
-        
-    except ValueError as e:
-        print(f"🕒 DEBUG: Error parsing time '{time_str}': {e}")
-        # Fallback to current time + 1 hour
-        fallback = datetime.now() + timedelta(hours=1)
-        print(f"🕒 DEBUG: Using fallback: {fallback}")
-        return fallback
-
-def get_days_until_next_weekday(target_day):
-    """Calculate days until next occurrence of a weekday"""
-    days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-    target_index = days.index(target_day.lower())
-    current_index = datetime.now().weekday()
-    
-    days_ahead = target_index - current_index
-    if days_ahead <= 0:
-        days_ahead += 7
-    
-    return days_ahead
\ No newline at end of file
@@ -1,6 +1,7 @@
 import requests
 import os
 from backend.core.celery_app import celery_app
+from backend.tasks.progress import report_progress
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,6 +23,7 @@ def execute_search_task(task_args):
             return "🔍 Please specify what you'd like me to search for. Example: 'search for AI trends' or 'find information about Python'"
         
         # Try to get real search results
+        report_progress(f"🔍 Searching for '{search_terms}'...")
         search_results = get_real_search_results(search_terms)
         
         if search_results:
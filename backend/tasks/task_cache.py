@@ -0,0 +1,194 @@
+# backend/tasks/task_cache.py
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from backend.core.celery_results import task_results
+from backend.core.database import redis_client
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_PREFIX = "taskcache:"
+INFLIGHT_PREFIX = "taskcache:inflight:"
+INFLIGHT_LOCK_SECONDS = 60  # Upper bound on one upstream refresh; the lock expires on its own after a crash
+
+# Results that describe a failure are never memoized
+_UNCACHEABLE_MARKERS = ("❌", "⚠️", "I understand you want help", "temporarily unavailable", "Unable to fetch")
+
+
+# ==========================================================
+# --- Cache key builders (referenced from TASK_REGISTRY) ---
+# ==========================================================
+def normalize_query(task_args: Dict[str, Any]) -> Optional[str]:
+    """
+    Lowercase and collapse whitespace, nothing else: dropping words ("the", "me",
+    "can you") merges requests whose results differ.
+    """
+    query = re.sub(r"\s+", " ", (task_args.get("query") or "").lower()).strip()
+    return query or None
+
+
+def translate_key(task_args: Dict[str, Any]) -> Optional[str]:
+    """The (text, target, source) the translate task itself will use, so equal keys mean equal work."""
+    from backend.tasks.translate_tasks import extract_translation_details
+    text, target, source = extract_translation_details(task_args.get("query") or "", task_args.get("user_input") or "")
+    if not text:
+        return None
+    return json.dumps({"text": text, "target": target, "source": source}, ensure_ascii=False, sort_keys=True)
+
+
+def weather_key(task_args: Dict[str, Any]) -> Optional[str]:
+    """'weather in Mumbai?' and 'what's the temperature in mumbai' share one entry."""
+    query = (task_args.get("query") or "").lower()
+    match = re.search(r"(?:weather|forecast|temperature)\s+(?:in|for|at|of)\s+([a-z][a-z\s]*)", query)
+    if match:
+        location = re.sub(r"\b(today|tomorrow|now|right now|please|currently)\b", " ", match.group(1))
+        return "loc:" + re.sub(r"\s+", " ", location).strip()
+    return normalize_query(task_args)
+
+
+def search_key(task_args: Dict[str, Any]) -> Optional[str]:
+    query = (task_args.get("query") or "").lower()
+    match = re.search(r"(?:search for|look up|find information (?:about|on)|find)\s+(.+)", query)
+    if match:
+        return "q:" + re.sub(r"[?.!]+$", "", re.sub(r"\s+", " ", match.group(1))).strip()
+    return normalize_query(task_args)
+
+
+def cacheable(result: Any) -> bool:
+    if result is None:
+        return False
+    text = result.get("reply", "") if isinstance(result, dict) else str(result)
+    return bool(text) and not any(marker in text for marker in _UNCACHEABLE_MARKERS)
+
+
+class TaskCache:
+    """
+    Memoizes idempotent task results in Redis at dispatch time.
+
+    - Fresh hits (age < ttl) are returned without touching Celery.
+    - Stale hits (ttl <= age < ttl + stale_ttl) are returned immediately while one
+      background refresh revalidates the entry.
+    - Misses are coalesced: the first caller dispatches and records the Celery task id
+      under an inflight key (SET NX); concurrent callers, in any API process, await that
+      same task id instead of dispatching their own.
+    """
+
+    def __init__(self, redis=None):
+        self.redis = redis or redis_client
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # Strong references to background stores; the loop only keeps weak ones
+        self._stores: Set[asyncio.Task] = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "stores": 0}
+
+    @staticmethod
+    def _cache_key(task_type: str, task_args: Dict[str, Any], spec: Dict[str, Any]) -> Optional[str]:
+        key = spec["key"](task_args)
+        if not key:
+            return None
+        scope = f"user:{task_args.get('user_id', 'guest')}" if spec.get("user_scoped") else "global"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{CACHE_PREFIX}{task_type}:{scope}:{digest}"
+
+    async def start(self, task_type: str, task_args: Dict[str, Any], spec: Optional[Dict[str, Any]],
+                    dispatch: Callable[[], Awaitable[str]]) -> Tuple[Any, Optional[str]]:
+        """
+        (cached_result, None) on a hit, otherwise (None, task_id) of the task to await.
+        Without a cache spec this is just dispatch().
+        """
+        if not spec:
+            return None, await dispatch()
+
+        try:
+            key = self._cache_key(task_type, task_args, spec)
+            if key is None:
+                return None, await dispatch()
+
+            raw = await self.redis.get(key)
+            if raw:
+                entry = json.loads(raw)
+                age = time.time() - entry["stored_at"]
+                if age < spec["ttl"]:
+                    self.stats["hits"] += 1
+                    return entry["value"], None
+                self.stats["stale_hits"] += 1
+                self._revalidate(key, spec, dispatch)
+                return entry["value"], None
+
+            self.stats["misses"] += 1
+            return None, await self._coalesced_dispatch(key, spec, dispatch)
+
+        except Exception as e:
+            # Redis trouble must never stop the task itself
+            logger.warning(f"⚠️ Task cache unavailable for {task_type}: {e}")
+            return None, await dispatch()
+
+    async def _coalesced_dispatch(self, key: str, spec: Dict[str, Any],
+                                  dispatch: Callable[[], Awaitable[str]]) -> str:
+        inflight_key = INFLIGHT_PREFIX + key
+        existing = await self.redis.get(inflight_key)
+        # "pending:<ts>" means another caller is still dispatching; its task id is not known yet
+        if existing and not existing.startswith("pending:"):
+            self.stats["coalesced"] += 1
+            return existing
+
+        # Claim the refresh before dispatching so concurrent callers see the lock
+        claim = f"pending:{time.time()}"
+        if existing or not await self.redis.set(inflight_key, claim, nx=True, ex=INFLIGHT_LOCK_SECONDS):
+            for _ in range(20):
+                existing = await self.redis.get(inflight_key)
+                if existing and not existing.startswith("pending:"):
+                    self.stats["coalesced"] += 1
+                    return existing
+                await asyncio.sleep(0.05)
+            return await dispatch()
+
+        task_id = await dispatch()
+        await self.redis.set(inflight_key, task_id, ex=INFLIGHT_LOCK_SECONDS)
+        store = asyncio.create_task(self._store_when_ready(key, inflight_key, task_id, spec))
+        self._stores.add(store)
+        store.add_done_callback(self._stores.discard)
+        return task_id
+
+    async def _store_when_ready(self, key: str, inflight_key: str, task_id: str, spec: Dict[str, Any]):
+        try:
+            result = await task_results.wait(task_id, timeout=INFLIGHT_LOCK_SECONDS)
+            if cacheable(result):
+                entry = json.dumps({"value": result, "stored_at": time.time()}, default=str)
+                await self.redis.set(key, entry, ex=int(spec["ttl"] + spec.get("stale_ttl", 0)))
+                self.stats["stores"] += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Task {task_id} not cached: {e}")
+        finally:
+            try:
+                await self.redis.delete(inflight_key)
+            except Exception:
+                pass
+
+    def _revalidate(self, key: str, spec: Dict[str, Any], dispatch: Callable[[], Awaitable[str]]):
+        """One background refresh per key per process; the inflight lock dedupes across processes."""
+        running = self._refreshing.get(key)
+        if running and not running.done():
+            return
+
+        async def refresh():
+            try:
+                await self._coalesced_dispatch(key, spec, dispatch)
+            except Exception as e:
+                logger.warning(f"⚠️ Background revalidation failed: {e}")
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+        self._refreshing[key].add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+task_cache = TaskCache()
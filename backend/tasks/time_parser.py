@@ -0,0 +1,360 @@
+# backend/tasks/time_parser.py
+import re
+import time as _time
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+# ==========================================================
+# --- Grammar ---
+# ==========================================================
+# A time expression is an optional relative offset ("in 20 minutes", "2 hours from now")
+# or a combination of an optional date ("2026-03-14", "14th march", "march 14"), an
+# optional day ("today", "tomorrow", "next friday") and an optional clock time
+# ("at 7", "7:30", "7pm", "noon", "in the evening"). Each part is one compiled regex,
+# matched against the lowercased, whitespace-collapsed input.
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30, "forty five": 45,
+}
+UNIT_SECONDS = {"sec": 1, "min": 60, "hour": 3600, "hr": 3600, "day": 86400, "week": 604800}
+PART_OF_DAY = {"morning": (9, 0), "afternoon": (14, 0), "evening": (18, 0), "night": (21, 0), "tonight": (21, 0)}
+DEFAULT_CLOCK = (9, 0)  # A day with no time ("tomorrow") means 9 AM
+
+_NUMBER = r'\d+|half an?|' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True))
+_UNIT = r'(?:sec(?:ond)?s?|min(?:ute)?s?|hours?|hrs?|days?|weeks?)'
+_RELATIVE_RE = re.compile(
+    r'\bin\s+(?P<n>' + _NUMBER + r')\s*(?P<unit>' + _UNIT + r')\b'
+    r'|\b(?P<n2>\d+|' + '|'.join(NUMBER_WORDS) + r')\s*(?P<unit2>' + _UNIT + r')\s+from\s+now\b'
+)
+# Whole month names or their abbreviations only, so "2 markers" or "3 decks" is not a date
+_MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july", "august",
+                "september", "october", "november", "december"]
+_MONTH = (r'(?:' + '|'.join(_MONTH_NAMES) + '|sept|' + '|'.join(MONTHS) + r')\.?(?![a-z])')
+_DATE_RE = re.compile(
+    r'\b(?P<iso>\d{4}-\d{2}-\d{2})\b'
+    r'|\b(?:on\s+)?(?:the\s+)?(?P<dom>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<mon>' + _MONTH + r')\b'
+    r'|\b(?:on\s+)?(?P<mon2>' + _MONTH + r')\s+(?P<dom2>\d{1,2})(?:st|nd|rd|th)?\b'
+)
+_DAY_RE = re.compile(
+    r'\b(?:on\s+)?(?P<day>day after tomorrow|today|tonight|tomorrow|next week'
+    r'|(?:(?P<qualifier>next|this|coming)\s+)?(?P<weekday>' + '|'.join(WEEKDAYS) + r'))\b'
+)
+_CLOCK_RE = re.compile(
+    r'(?:\b(?:at|by|around)\s+|@\s*)?\b(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>a\.?m\.?|p\.?m\.?)(?!\w)'
+    r'|(?:\b(?:at|by|around)\s+|@\s*)(?P<hour2>\d{1,2})(?::(?P<minute2>\d{2}))?\b(?!\s*(?:' + _UNIT + r'|%))'
+    r'|\b(?P<hour3>\d{1,2}):(?P<minute3>\d{2})\b'
+    r'|\b(?:at\s+)?(?P<named>noon|midday|midnight)\b'
+    r'|\b(?:in\s+the\s+|this\s+)?(?P<part>morning|afternoon|evening|night)\b'
+)
+
+
+class ParsedTime(NamedTuple):
+    when: datetime         # naive, in the server's local time like the rest of the scheduler
+    expression: str        # the matched time expression, e.g. "tomorrow at 7pm"
+    explicit_clock: bool   # False when the time of day was defaulted
+
+
+class _Parts(NamedTuple):
+    relative_seconds: Optional[int]
+    date: Optional[Tuple[int, int, int]]    # (year or 0, month, day)
+    day: Optional[str]
+    qualifier: Optional[str]
+    clock: Optional[Tuple[int, int, Optional[str]]]  # (hour, minute, "am"/"pm"/None)
+    part: Optional[str]
+    spans: Tuple[Tuple[int, int], ...]
+
+
+def normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', (text or '').lower()).strip()
+
+
+def _amount(raw: str) -> float:
+    if raw.startswith("half"):
+        return 0.5
+    return float(raw) if raw.isdigit() else float(NUMBER_WORDS[raw])
+
+
+def _unit_seconds(raw: str) -> int:
+    return next(seconds for prefix, seconds in UNIT_SECONDS.items() if raw.startswith(prefix))
+
+
+@lru_cache(maxsize=4096)
+def _parse_parts(normalized: str) -> Optional[_Parts]:
+    """Grammar pass over normalized text; independent of the current time, so it memoizes."""
+    spans = []
+    match = _RELATIVE_RE.search(normalized)
+    if match:
+        amount = _amount(match.group("n") or match.group("n2"))
+        unit = _unit_seconds(match.group("unit") or match.group("unit2"))
+        # "in half an hour" -> 1800s; "in half a day" works the same way
+        return _Parts(int(amount * unit), None, None, None, None, None, (match.span(),))
+
+    parsed_date = None
+    match = _DATE_RE.search(normalized)
+    if match:
+        spans.append(match.span())
+        if match.group("iso"):
+            year, month, day = (int(part) for part in match.group("iso").split("-"))
+        else:
+            month = MONTHS.index((match.group("mon") or match.group("mon2"))[:3]) + 1
+            year, day = 0, int(match.group("dom") or match.group("dom2"))
+        parsed_date = (year, month, day)
+
+    day = qualifier = None
+    match = _DAY_RE.search(normalized)
+    if match and not parsed_date:
+        spans.append(match.span())
+        day = match.group("weekday") or match.group("day")
+        qualifier = match.group("qualifier")
+
+    clock = part = None
+    for match in _CLOCK_RE.finditer(normalized):
+        if match.group("part"):
+            # "tomorrow morning" sets a default; a real clock time elsewhere still wins
+            part = part or match.group("part")
+            spans.append(match.span())
+            continue
+        if clock:
+            continue
+        if match.group("named"):
+            clock = (12, 0, "am") if match.group("named") == "midnight" else (12, 0, "pm")
+        else:
+            hour = int(match.group("hour") or match.group("hour2") or match.group("hour3"))
+            minute = int(match.group("minute") or match.group("minute2") or match.group("minute3") or 0)
+            ampm = (match.group("ampm") or "").replace(".", "") or None
+            if hour > 23 or minute > 59 or (ampm and not 1 <= hour <= 12):
+                continue
+            clock = (hour, minute, ampm)
+        spans.append(match.span())
+
+    if not (parsed_date or day or clock or part):
+        return None
+    return _Parts(None, parsed_date, day, qualifier, clock, part, tuple(sorted(spans)))
+
+
+def _clock_time(clock: Tuple[int, int, Optional[str]]) -> time:
+    hour, minute, ampm = clock
+    if ampm == "pm" and hour < 12:
+        hour += 12
+    elif ampm == "am" and hour == 12:
+        hour = 0
+    return time(hour, minute)
+
+
+def _with_part_of_day(clock: Optional[Tuple[int, int, Optional[str]]],
+                      part: Optional[str]) -> Optional[Tuple[int, int, Optional[str]]]:
+    """A bare "at 8" next to "tonight" or "in the evening" is 8 PM ("at 2 at night" stays 2 AM)."""
+    if not clock or clock[2] or not 1 <= clock[0] < 12:
+        return clock
+    if part in ("afternoon", "evening") or (part in ("night", "tonight") and clock[0] >= 5):
+        return clock[0], clock[1], "pm"
+    return clock
+
+
+def _resolve_date(parts: _Parts, today: date) -> Optional[date]:
+    if parts.date:
+        year, month, day = parts.date
+        resolved = date(year or today.year, month, day)
+        # "14th march" in April means next year
+        if not year and resolved < today:
+            resolved = date(today.year + 1, month, day)
+        return resolved
+    if parts.day in ("today", "tonight"):
+        return today
+    if parts.day == "tomorrow":
+        return today + timedelta(days=1)
+    if parts.day == "day after tomorrow":
+        return today + timedelta(days=2)
+    if parts.day == "next week":
+        return today + timedelta(days=7)
+    if parts.day in WEEKDAYS:
+        days_ahead = (WEEKDAYS.index(parts.day) - today.weekday()) % 7
+        # "friday" on a Friday means next week's; "this friday" means today
+        if days_ahead == 0 and parts.qualifier != "this":
+            days_ahead = 7
+        return today + timedelta(days=days_ahead)
+    return None
+
+
+def _resolve(parts: _Parts, now: datetime) -> Tuple[datetime, bool]:
+    if parts.relative_seconds is not None:
+        return (now + timedelta(seconds=parts.relative_seconds)).replace(microsecond=0), True
+
+    on_date = _resolve_date(parts, now.date())
+    clock = _with_part_of_day(parts.clock, parts.part or parts.day)
+    if clock:
+        at, explicit = _clock_time(clock), True
+    else:
+        at, explicit = time(*PART_OF_DAY.get(parts.part or parts.day, DEFAULT_CLOCK)), False
+
+    if on_date is not None and on_date != now.date():
+        return datetime.combine(on_date, at), explicit
+
+    # Today or time of day only: the next time the clock shows it
+    candidate = datetime.combine(now.date(), at)
+    if candidate <= now:
+        hour, minute, ampm = clock or (at.hour, at.minute, "am")
+        # A part of day ("tonight at 2") already fixed am/pm, so only a bare clock flips to pm
+        flip = not ampm and hour < 12 and not (parts.part or parts.day == "tonight")
+        evening = datetime.combine(now.date(), time(hour + 12, minute)) if flip else None
+        # "at 5" said at 10:00 means 17:00, not 05:00 tomorrow
+        candidate = evening if evening and evening > now else candidate + timedelta(days=1)
+    return candidate, explicit
+
+
+def parse_time(text: str, now: Optional[datetime] = None, tz: Optional[str] = None) -> Optional[ParsedTime]:
+    """
+    Resolve the first time expression in `text`, or None if there is none.
+    `tz` is the user's IANA zone: wall-clock times are read in that zone and the result is
+    converted to server-local time. `now` is taken as wall-clock time in that zone.
+    """
+    normalized = normalize(text)
+    parts = _parse_parts(normalized)
+    if parts is None:
+        return None
+
+    zone = ZoneInfo(tz) if tz and ZoneInfo else None
+    if now is None:
+        now = datetime.now(zone).replace(tzinfo=None) if zone else datetime.now()
+
+    try:
+        when, explicit = _resolve(parts, now)
+    except ValueError:
+        # A date that does not exist ("31 february") is no time at all
+        return None
+    if zone:
+        when = when.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+
+    start, end = parts.spans[0][0], parts.spans[-1][1]
+    return ParsedTime(when, normalized[start:end].strip(), explicit)
+
+
+def parse_clock(text: str, part: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    Explicit time of day in `text` as (hour, minute), ignoring dates ("every day at 7pm" -> (19, 0)).
+    `part` is a part of day said elsewhere ("every evening"), so a bare "at 7" means 19:00.
+    """
+    parts = _parse_parts(normalize(text))
+    if parts is None or parts.clock is None:
+        return None
+    at = _clock_time(_with_part_of_day(parts.clock, part or parts.part))
+    return at.hour, at.minute
+
+
+def strip_time(text: str) -> str:
+    """Text with its time expression removed ("call mom tomorrow at 7pm" -> "call mom")."""
+    normalized = normalize(text)
+    parts = _parse_parts(normalized)
+    if parts is None:
+        return normalized
+    pieces, cursor = [], 0
+    for start, end in parts.spans:
+        pieces.append(normalized[cursor:start])
+        cursor = max(cursor, end)
+    pieces.append(normalized[cursor:])
+    return normalize(" ".join(pieces))
+
+
+def delay_seconds(text: str, now: Optional[datetime] = None, tz: Optional[str] = None) -> Optional[int]:
+    """Seconds from now until the expression in `text` (never negative), or None."""
+    now = now or datetime.now()
+    parsed = parse_time(text, now=now, tz=tz)
+    if parsed is None:
+        return None
+    return max(0, int((parsed.when - now).total_seconds()))
+
+
+# ==========================================================
+# --- Golden corpus + microbenchmark: python -m backend.tasks.time_parser ---
+# ==========================================================
+# Reference "now" is Sunday 2026-10-18 10:00
+_GOLDEN_NOW = datetime(2026, 10, 18, 10, 0)
+_GOLDEN = [
+    ("remind me to call mom at 19:35", "2026-10-18 19:35"),
+    ("remind me in 20 minutes to stretch", "2026-10-18 10:20"),
+    ("remind me in half an hour", "2026-10-18 10:30"),
+    ("in an hour check the oven", "2026-10-18 11:00"),
+    ("2 hours from now", "2026-10-18 12:00"),
+    ("in 3 days pay rent", "2026-10-21 10:00"),
+    ("tomorrow", "2026-10-19 09:00"),
+    ("tomorrow at 7pm", "2026-10-19 19:00"),
+    ("tomorrow at 7:30 am", "2026-10-19 07:30"),
+    ("tomorrow evening", "2026-10-19 18:00"),
+    ("tonight", "2026-10-18 21:00"),
+    ("day after tomorrow at noon", "2026-10-20 12:00"),
+    ("at 5", "2026-10-18 17:00"),
+    ("at 9:00", "2026-10-18 21:00"),
+    ("at 9:00 am", "2026-10-19 09:00"),
+    ("at 11", "2026-10-18 11:00"),
+    ("5pm", "2026-10-18 17:00"),
+    ("12 am", "2026-10-19 00:00"),
+    ("at midnight", "2026-10-19 00:00"),
+    ("on friday", "2026-10-23 09:00"),
+    ("next monday at 10am", "2026-10-19 10:00"),
+    ("this sunday at 6 pm", "2026-10-18 18:00"),
+    ("sunday at 6 pm", "2026-10-25 18:00"),
+    ("on 2026-12-25 at 08:00", "2026-12-25 08:00"),
+    ("14th march", "2027-03-14 09:00"),
+    ("march 14 at 3pm", "2027-03-14 15:00"),
+    ("on the 20th of october at 6:15 pm", "2026-10-20 18:15"),
+    ("next week", "2026-10-25 09:00"),
+    ("in the morning", "2026-10-19 09:00"),
+    ("remind me to buy 2 markers at 5pm", "2026-10-18 17:00"),
+    ("remind me to order 3 decks of cards tomorrow", "2026-10-19 09:00"),
+    ("remind me to get 4 mangoes", None),
+    ("remind me to read 12 juniper reports on friday", "2026-10-23 09:00"),
+    ("on 5 sept at 10am", "2027-09-05 10:00"),
+    ("dec 3", "2026-12-03 09:00"),
+    ("feed the cat at 8 tonight", "2026-10-18 20:00"),
+    ("tonight at 9", "2026-10-18 21:00"),
+    ("tonight at 2", "2026-10-19 02:00"),
+    ("tomorrow at 7 in the evening", "2026-10-19 19:00"),
+    ("tomorrow afternoon at 3", "2026-10-19 15:00"),
+    ("tomorrow morning at 7", "2026-10-19 07:00"),
+    ("tomorrow at 7", "2026-10-19 07:00"),
+    ("today at 8", "2026-10-18 20:00"),
+    ("31 february", None),
+    ("on 30 feb at 5pm", None),
+    ("what is 25 * 4", None),
+    ("set a 20% tip", None),
+]
+
+
+def _check_golden() -> int:
+    failures = 0
+    for text, expected in _GOLDEN:
+        parsed = parse_time(text, now=_GOLDEN_NOW)
+        got = parsed.when.strftime("%Y-%m-%d %H:%M") if parsed else None
+        if got != expected:
+            failures += 1
+            print(f"  ❌ {text!r}: expected {expected}, got {got}")
+    print(f"{'✅' if not failures else '❌'} {len(_GOLDEN) - failures}/{len(_GOLDEN)} golden cases")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = _check_golden()
+    texts = [text for text, _ in _GOLDEN]
+    rounds = 5000
+
+    _parse_parts.cache_clear()
+    start = _time.perf_counter()
+    for text in texts:
+        _parse_parts.__wrapped__(normalize(text))
+    cold = (_time.perf_counter() - start) / len(texts)
+
+    start = _time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            parse_time(text, now=_GOLDEN_NOW)
+    warm = (_time.perf_counter() - start) / (rounds * len(texts))
+    print(f"⚡ grammar pass {cold * 1e6:.1f} µs/expression, memoized parse {warm * 1e6:.2f} µs/expression")
+    raise SystemExit(1 if failures else 0)
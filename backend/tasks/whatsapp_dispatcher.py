@@ -0,0 +1,312 @@
+# backend/tasks/whatsapp_dispatcher.py
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import redis
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from backend.core.celery_app import celery_app
+from backend.core.logger import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# ==========================================================
+# --- Limits and tuning ---
+# ==========================================================
+# Buckets live in the broker Redis, so every worker thread and process shares them.
+# sender:    messages per second from one WhatsApp number (Twilio's account limit)
+# recipient: messages per minute to one number (keeps bulk sends from flooding a chat)
+WHATSAPP_FROM = os.getenv("TWILIO_WHATSAPP_FROM", "+14155238886")  # Twilio sandbox number
+SENDER_RATE_PER_SECOND = float(os.getenv("WHATSAPP_SENDER_RATE", "10"))
+SENDER_BURST = float(os.getenv("WHATSAPP_SENDER_BURST", "20"))
+RECIPIENT_RATE_PER_MINUTE = float(os.getenv("WHATSAPP_RECIPIENT_RATE_PER_MINUTE", "6"))
+RECIPIENT_BURST = float(os.getenv("WHATSAPP_RECIPIENT_BURST", "3"))
+
+MAX_ATTEMPTS = int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "4"))
+BACKOFF_BASE_SECONDS = float(os.getenv("WHATSAPP_BACKOFF_BASE", "1.0"))
+BACKOFF_CAP_SECONDS = float(os.getenv("WHATSAPP_BACKOFF_CAP", "30"))
+# Longest a send waits for rate-limit tokens before giving up as rate_limited
+MAX_RATE_WAIT_SECONDS = float(os.getenv("WHATSAPP_MAX_RATE_WAIT", "60"))
+HTTP_POOL_SIZE = int(os.getenv("WHATSAPP_HTTP_POOL_SIZE", "16"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_HTTP_TIMEOUT", "15"))
+
+BULK_CHUNK_SIZE = int(os.getenv("WHATSAPP_BULK_CHUNK_SIZE", "25"))
+BULK_MAX_RECIPIENTS = int(os.getenv("WHATSAPP_BULK_MAX_RECIPIENTS", "1000"))
+CHUNK_TASK = "backend.tasks.whatsapp_tasks.process_whatsapp_chunk"
+# Chunk retries for transient failures; the n-th retry waits n * CHUNK_RETRY_SECONDS
+CHUNK_MAX_RETRIES = int(os.getenv("WHATSAPP_CHUNK_MAX_RETRIES", "3"))
+CHUNK_RETRY_SECONDS = int(os.getenv("WHATSAPP_CHUNK_RETRY_SECONDS", "60"))
+# A row "processing" longer than this belongs to a dead worker (one send takes at most
+# MAX_ATTEMPTS rate waits, backoffs and HTTP timeouts, well under this)
+STALE_PROCESSING_SECONDS = int(os.getenv("WHATSAPP_STALE_PROCESSING_SECONDS", "900"))
+STALE_SWEEP_LIMIT = int(os.getenv("WHATSAPP_STALE_SWEEP_LIMIT", "5000"))
+
+BUCKET_PREFIX = "whatsapp:bucket:"
+
+# Takes one token from every bucket in KEYS, or none of them. ARGV: now, then
+# (rate per second, capacity) per key. Returns 0 on success, else milliseconds
+# until the emptiest bucket has a token.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, math.ceil((1 - tokens) / rate * 1000))
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+end
+return 0
+"""
+
+
+class SendFailed(Exception):
+    """
+    A message that could not be delivered; `retryable` is False for permanent errors.
+    `code` is Twilio's error code (e.g. 20429), `status` the HTTP status (e.g. 429).
+    """
+
+    def __init__(self, message: str, code: Optional[int] = None, retryable: bool = False,
+                 status: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.retryable = retryable
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (RequestsConnectionError, Timeout))
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def normalize_number(number: str) -> str:
+    return "+" + "".join(ch for ch in number if ch.isdigit())
+
+
+class WhatsAppDispatcher:
+    """
+    Outbound WhatsApp sends for the Celery workers.
+
+    One Twilio client per process, on a pooled keep-alive HTTP session, instead of a
+    new client (and .env reload) per message. Every send takes a token from the
+    sender bucket and the recipient bucket atomically; transient failures (429, 5xx,
+    network) are retried with jittered backoff, permanent ones fail straight away.
+    """
+
+    def __init__(self, url: Optional[str] = None, from_number: str = WHATSAPP_FROM):
+        self.url = url or celery_app.conf.broker_url
+        self.from_number = normalize_number(from_number)
+        self._redis = None
+        self._acquire = None
+        self._client = None
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "rate_limited_waits": 0, "rate_wait_seconds": 0.0}
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.url, decode_responses=True)
+        return self._redis
+
+    @property
+    def acquire_script(self):
+        if self._acquire is None:
+            self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+        return self._acquire
+
+    @property
+    def client(self) -> Client:
+        with self._lock:
+            if self._client is None:
+                http_client = TwilioHttpClient(pool_connections=True, timeout=HTTP_TIMEOUT_SECONDS)
+                # Size the keep-alive pool for the worker's thread count
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                http_client.session.mount("https://", adapter)
+                self._client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"),
+                                      http_client=http_client)
+            return self._client
+
+    # ==========================================================
+    # RATE LIMITING
+    # ==========================================================
+    def wait_for_token(self, to_number: str, max_wait: float = MAX_RATE_WAIT_SECONDS) -> bool:
+        """Block until both buckets allow one message; False if that would take longer than max_wait."""
+        keys = [f"{BUCKET_PREFIX}sender:{self.from_number}", f"{BUCKET_PREFIX}recipient:{to_number}"]
+        args = [SENDER_RATE_PER_SECOND, SENDER_BURST, RECIPIENT_RATE_PER_MINUTE / 60.0, RECIPIENT_BURST]
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait_ms = self.acquire_script(keys=keys, args=[time.time()] + args)
+            if not wait_ms:
+                return True
+            wait = wait_ms / 1000.0
+            if time.monotonic() + wait > deadline:
+                return False
+            self.stats["rate_limited_waits"] += 1
+            self.stats["rate_wait_seconds"] += wait
+            time.sleep(wait)
+
+    # ==========================================================
+    # SENDING
+    # ==========================================================
+    def send(self, to_number: str, message: str) -> Dict[str, Any]:
+        """Send one message; returns {"sid", "attempts"} or raises SendFailed."""
+        to_number = normalize_number(to_number)
+        last_error: Optional[Exception] = None
+        for attempt in range(MAX_ATTEMPTS):
+            if not self.wait_for_token(to_number):
+                raise SendFailed(f"Rate limit wait for {to_number} exceeded {MAX_RATE_WAIT_SECONDS:.0f}s",
+                                 code=429, retryable=True, status=429)
+            try:
+                sent = self.client.messages.create(
+                    body=message,
+                    from_=f"whatsapp:{self.from_number}",
+                    to=f"whatsapp:{to_number}",
+                )
+                self.stats["sent"] += 1
+                return {"sid": sent.sid, "attempts": attempt + 1}
+            except Exception as e:
+                last_error = e
+                if not _is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                    break
+                self.stats["retries"] += 1
+                delay = backoff_seconds(attempt)
+                logger.warning(f"⚠️ WhatsApp to {to_number} failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+        self.stats["failed"] += 1
+        code = getattr(last_error, "code", None) or getattr(last_error, "status", None)
+        raise SendFailed(str(last_error), code=code, retryable=_is_retryable(last_error),
+                         status=getattr(last_error, "status", None))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "from_number": self.from_number,
+                "sender_rate_per_second": SENDER_RATE_PER_SECOND,
+                "recipient_rate_per_minute": RECIPIENT_RATE_PER_MINUTE}
+
+
+# ==========================================================
+# --- Bulk sends ---
+# ==========================================================
+def queue_bulk(user_id: str, recipients: List[str], message: str, countdown: int = 0) -> Dict[str, Any]:
+    """
+    Record one whatsapp_tasks document per recipient (status "queued") with a single
+    insert_many, then publish one chunk task per BULK_CHUNK_SIZE recipients so the
+    chunks spread across worker threads. Called from the API via run_in.
+    """
+    from backend.core.database import ensure_whatsapp_indexes_sync, sync_whatsapp_tasks_collection
+
+    ensure_whatsapp_indexes_sync()
+    unique = list(dict.fromkeys(normalize_number(number) for number in recipients))
+    bulk_id = uuid.uuid4().hex
+    now = datetime.now()
+    scheduled_time = now + timedelta(seconds=countdown)
+    documents = [{
+        "user_id": user_id,
+        "bulk_id": bulk_id,
+        "to_number": number,
+        "message": message,
+        "delay_minutes": round(countdown / 60),
+        "scheduled_time": scheduled_time,
+        "status": "queued",
+        "created_at": now,
+    } for number in unique]
+    task_ids = [str(inserted) for inserted in sync_whatsapp_tasks_collection.insert_many(documents).inserted_ids]
+
+    chunks = [task_ids[i:i + BULK_CHUNK_SIZE] for i in range(0, len(task_ids), BULK_CHUNK_SIZE)]
+    for chunk in chunks:
+        celery_app.send_task(CHUNK_TASK, args=[chunk, user_id], countdown=countdown or None)
+    logger.info(f"📨 Bulk WhatsApp {bulk_id}: {len(task_ids)} recipients in {len(chunks)} chunks")
+    return {"bulk_id": bulk_id, "recipients": len(task_ids), "chunks": len(chunks),
+            "duplicates_dropped": len(recipients) - len(unique)}
+
+
+def claim_bulk_send_sync(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Take one bulk row for sending: queued, or processing but abandoned by a dead worker.
+    None when it is already done or another run holds it.
+    """
+    from bson import ObjectId
+    from backend.core.database import sync_whatsapp_tasks_collection
+
+    now = datetime.now()
+    return sync_whatsapp_tasks_collection.find_one_and_update(
+        {"_id": ObjectId(task_id), "$or": [
+            {"status": "queued"},
+            {"status": "processing", "started_at": {"$lt": now - timedelta(seconds=STALE_PROCESSING_SECONDS)}},
+        ]},
+        {"$set": {"status": "processing", "started_at": now}},
+        projection={"to_number": 1, "message": 1},
+    )
+
+
+def requeue_stale_bulk() -> Dict[str, Any]:
+    """
+    Put bulk rows stuck in "processing" back to "queued", then publish chunk tasks for
+    queued rows that are overdue by STALE_PROCESSING_SECONDS (their chunk was lost or
+    gave up). Rows are claimed one by one, so overlapping chunks do not double-send a
+    row that is still in flight; a worker that dies after Twilio accepted a message but
+    before the row was marked sent can get it sent again (at-least-once delivery).
+    """
+    from backend.core.database import ensure_whatsapp_indexes_sync, sync_whatsapp_tasks_collection
+
+    ensure_whatsapp_indexes_sync()
+    cutoff = datetime.now() - timedelta(seconds=STALE_PROCESSING_SECONDS)
+    requeued = sync_whatsapp_tasks_collection.update_many(
+        {"bulk_id": {"$exists": True}, "status": "processing", "started_at": {"$lt": cutoff}},
+        {"$set": {"status": "queued"}}
+    ).modified_count
+
+    by_user: Dict[str, List[str]] = {}
+    overdue = sync_whatsapp_tasks_collection.find(
+        {"bulk_id": {"$exists": True}, "status": "queued", "scheduled_time": {"$lt": cutoff}},
+        {"user_id": 1}
+    ).limit(STALE_SWEEP_LIMIT)
+    for row in overdue:
+        by_user.setdefault(row["user_id"], []).append(str(row["_id"]))
+
+    chunks = 0
+    for user_id, task_ids in by_user.items():
+        for i in range(0, len(task_ids), BULK_CHUNK_SIZE):
+            celery_app.send_task(CHUNK_TASK, args=[task_ids[i:i + BULK_CHUNK_SIZE], user_id])
+            chunks += 1
+    if requeued or chunks:
+        logger.warning(f"♻️ Bulk WhatsApp sweep: {requeued} stale rows re-queued, {chunks} chunks republished")
+    return {"requeued": requeued, "republished_rows": sum(len(ids) for ids in by_user.values()), "chunks": chunks}
+
+
+# ==========================================================
+# GLOBAL INSTANCE
+# ==========================================================
+whatsapp_dispatcher = WhatsAppDispatcher()
@@ -1,22 +1,14 @@
-import os
-import time
-from celery import Celery
 from datetime import datetime, timedelta
 from backend.core.database import sync_whatsapp_tasks_collection
 from backend.core.celery_app import celery_app
+from backend.tasks.progress import report_progress
+from backend.core.event_bus import publish_event_sync
+from backend.tasks.time_parser import delay_seconds
+from backend.tasks.whatsapp_dispatcher import (
+    whatsapp_dispatcher, SendFailed, claim_bulk_send_sync, requeue_stale_bulk,
+    CHUNK_MAX_RETRIES, CHUNK_RETRY_SECONDS,
+)
 from bson import ObjectId
-import requests
-from dotenv import load_dotenv
-
-# Twilio for WhatsApp API
-from twilio.rest import Client
-
-def get_twilio_client():
-    """Initialize Twilio client"""
-    load_dotenv()
-    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-    return Client(account_sid, auth_token)
 
 @celery_app.task
 def send_whatsapp_message(task_args):
@@ -32,12 +24,18 @@ def send_whatsapp_message(task_args):
             message = task_args['message']
             delay_minutes = task_args.get('delay_minutes', 0)
             user_id = task_args['user_id']
+            # Natural-language send time ("tomorrow at 9am", "in 2 hours") overrides delay_minutes
+            if task_args.get('send_at'):
+                delay = delay_seconds(task_args['send_at'], tz=task_args.get('timezone'))
+                if delay is not None:
+                    delay_minutes = round(delay / 60)
         else:
             return "❌ Invalid task arguments"
         
         print(f"📱 WHATSAPP TASK: Sending to {to_number}: {message}")
         
         # Save task to database
+        report_progress(f"📱 Queuing WhatsApp message to {to_number}...")
         scheduled_time = datetime.now() + timedelta(minutes=delay_minutes)
         task_data = {
             'user_id': user_id,
@@ -72,7 +70,7 @@ def send_whatsapp_message(task_args):
             send_status_update(user_id, error_msg, "error")
         return error_msg
 
-@celery_app.task
+@celery_app.task(ignore_result=True)
 def process_whatsapp_message(task_id: str, to_number: str, message: str, user_id: str):
     """
     Process WhatsApp message using Twilio API
@@ -86,18 +84,8 @@ def process_whatsapp_message(task_id: str, to_number: str, message: str, user_id
             {'$set': {'status': 'processing', 'started_at': datetime.now()}}
         )
         
-        # Send via Twilio WhatsApp API
-        client = get_twilio_client()
-        
-        # Format number for Twilio (ensure it includes country code without +)
-        formatted_number = to_number.replace('+', '')  # Twilio prefers no +
-        
-        # Send message via Twilio
-        twilio_message = client.messages.create(
-            body=message,
-            from_='whatsapp:+14155238886',  # Twilio sandbox number
-            to=f'whatsapp:{formatted_number}'
-        )
+        # Pooled Twilio client, rate limited per sender and recipient, retried on 429/5xx
+        sent = whatsapp_dispatcher.send(to_number, message)
         
         # Update task status to sent
         sync_whatsapp_tasks_collection.update_one(
@@ -105,21 +93,23 @@ def process_whatsapp_message(task_id: str, to_number: str, message: str, user_id
             {'$set': {
                 'status': 'sent', 
                 'sent_at': datetime.now(),
-                'message_sid': twilio_message.sid
+                'message_sid': sent['sid'],
+                'attempts': sent['attempts']
             }}
         )
         
         # Send success notification
         send_status_update(user_id, f"✅ WhatsApp sent successfully to {to_number}", "success")
         
-        print(f"✅ WhatsApp sent to {to_number}, SID: {twilio_message.sid}")
+        print(f"✅ WhatsApp sent to {to_number}, SID: {sent['sid']}")
         return f"Message sent to {to_number}"
         
     except Exception as e:
         # Update task status to failed
         sync_whatsapp_tasks_collection.update_one(
             {'_id': ObjectId(task_id)},
-            {'$set': {'status': 'failed', 'error': str(e), 'failed_at': datetime.now()}}
+            {'$set': {'status': 'failed', 'error': str(e), 'error_code': getattr(e, 'code', None),
+                      'failed_at': datetime.now()}}
         )
         
         error_msg = f"❌ Failed to send WhatsApp: {str(e)}"
@@ -128,20 +118,91 @@ def process_whatsapp_message(task_id: str, to_number: str, message: str, user_id
         print(f"📱 {error_msg}")
         return error_msg
 
+@celery_app.task(bind=True, ignore_result=True, max_retries=CHUNK_MAX_RETRIES)
+def process_whatsapp_chunk(self, task_ids: list, user_id: str):
+    """
+    Send one chunk of a bulk WhatsApp send (see whatsapp_dispatcher.queue_bulk).
+    Each message is claimed (queued -> processing) right before it is sent and its
+    result written straight after, so a worker that dies loses at most one in-flight
+    row, which requeue_stale_whatsapp_sends puts back; that row may already have
+    reached Twilio, so delivery is at-least-once. Transient failures (rate-limit
+    wait exceeded, 429/5xx after the dispatcher's own retries) go back to "queued"
+    and the chunk retries them later.
+    """
+    deferred, sent_count, failed = [], 0, 0
+    deferred_for_rate = False
+    for task_id in task_ids:
+        if deferred_for_rate:
+            # The sender bucket is saturated; the rest of the chunk waits for the retry too
+            deferred.append(task_id)
+            continue
+        task = claim_bulk_send_sync(task_id)
+        if task is None:
+            continue  # Already sent, failed, or claimed by another run of this chunk
+        try:
+            sent = whatsapp_dispatcher.send(task['to_number'], task['message'])
+            sent_count += 1
+            _finish_bulk_send(task['_id'], {
+                'status': 'sent', 'sent_at': datetime.now(),
+                'message_sid': sent['sid'], 'attempts': sent['attempts']
+            })
+        except SendFailed as e:
+            if e.retryable and self.request.retries < self.max_retries:
+                deferred.append(task_id)
+                # Twilio's own rate-limit codes (20429, ...) are not 429; the HTTP status is
+                deferred_for_rate = e.status == 429
+                _finish_bulk_send(task['_id'], {'status': 'queued', 'error': str(e), 'error_code': e.code})
+                continue
+            failed += 1
+            _finish_bulk_send(task['_id'], {
+                'status': 'failed', 'error': str(e), 'error_code': e.code, 'failed_at': datetime.now()
+            })
+        except Exception as e:
+            failed += 1
+            _finish_bulk_send(task['_id'], {'status': 'failed', 'error': str(e), 'failed_at': datetime.now()})
+
+    print(f"📱 WHATSAPP CHUNK: {sent_count} sent, {failed} failed, {len(deferred)} deferred for {user_id}")
+    if failed:
+        send_status_update(user_id, f"⚠️ Bulk WhatsApp: {sent_count} sent, {failed} failed", "error")
+    elif sent_count:
+        send_status_update(user_id, f"✅ Bulk WhatsApp: {sent_count} sent", "success")
+    if deferred:
+        countdown = CHUNK_RETRY_SECONDS * (self.request.retries + 1)
+        raise self.retry(args=[deferred, user_id], countdown=countdown)
+    return {"sent": sent_count, "failed": failed}
+
+def _finish_bulk_send(object_id, fields: dict):
+    # Conditional on still being ours, so a row the stale sweep re-queued is not overwritten
+    sync_whatsapp_tasks_collection.update_one({'_id': object_id, 'status': 'processing'}, {'$set': fields})
+
+@celery_app.task(ignore_result=True)
+def requeue_stale_whatsapp_sends():
+    """
+    BACKUP SYSTEM: bulk rows left in "processing" by a worker that died mid-send go
+    back to "queued", and chunks for queued rows that are long overdue are published
+    again. Rows are claimed one at a time, so a duplicate chunk skips rows another run
+    holds; a requeued row whose send reached Twilio before the worker died is sent
+    again, so delivery is at-least-once.
+    """
+    try:
+        result = requeue_stale_bulk()
+        print(f"🔍 BACKUP SYSTEM: WhatsApp bulk sweep {result}")
+        return result
+    except Exception as e:
+        error_msg = f"❌ Error in WhatsApp bulk sweep: {e}"
+        print(error_msg)
+        return error_msg
+
 def send_status_update(user_id: str, message: str, status_type: str):
     """
-    Helper function to send status updates to frontend
+    Push a whatsapp_status event to the user's open sockets (any API process)
     """
     try:
-        load_dotenv()
-        requests.post(
-            f"{os.getenv('BACKEND_URL', 'http://localhost:8000')}/api/send-whatsapp-status",
-            json={
-                "user_id": user_id,
-                "message": message,
-                "status_type": status_type
-            },
-            timeout=2
-        )
+        publish_event_sync(user_id, {
+            "type": "whatsapp_status",
+            "message": message,
+            "status": status_type,
+            "timestamp": datetime.now().isoformat()
+        })
     except Exception as e:
-        print(f"⚠️ Could not send status update: {str(e)}")
\ No newline at end of file
+        print(f"⚠️ Could not send status update: {str(e)}")
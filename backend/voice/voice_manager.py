@@ -1,5 +1,6 @@
 import logging
 from backend.voice.voice_engine import SimpleVoiceEngine
+from backend.core.executors import run_in
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +14,16 @@ class VoiceManager:
         """Start a one-time voice conversation - NOW ASYNC"""
         try:
             # Greet user
-            self.voice_engine.speak("Hello! I'm Nova. What would you like to know?")
+            await run_in("speech", self.voice_engine.speak, "Hello! I'm Nova. What would you like to know?")
             
             # Listen for command
-            command = self.voice_engine.listen()
+            command = await run_in("speech", self.voice_engine.listen)
             
             if command == "timeout":
-                self.voice_engine.speak("I didn't hear anything. Please try again.")
+                await run_in("speech", self.voice_engine.speak, "I didn't hear anything. Please try again.")
                 return "No command received"
             elif command == "error":
-                self.voice_engine.speak("Sorry, I had trouble understanding. Please try again.")
+                await run_in("speech", self.voice_engine.speak, "Sorry, I had trouble understanding. Please try again.")
                 return "Speech recognition error"
             else:
                 # Process the command - NOW AWAIT PROPERLY
@@ -42,13 +43,13 @@ class VoiceManager:
             tone = self._detect_tone(command)
             
             # Speak the response
-            self.voice_engine.speak(response["reply"], tone)
+            await run_in("speech", self.voice_engine.speak, response["reply"], tone)
             
             return response["reply"]
             
         except Exception as e:
             error_msg = "Sorry, I encountered an error processing your request."
-            self.voice_engine.speak(error_msg)
+            await run_in("speech", self.voice_engine.speak, error_msg)
             return f"{error_msg} {str(e)}"
     
     def _detect_tone(self, command):
@@ -24,6 +24,9 @@ const ChatWindow = ({ user, onLogout, onChatUpdate }) => {
   const messagesEndRef = useRef(null);
   const chatContainerRef = useRef(null);
   const ws = useRef(null);
+  // Envelope protocol (backend/core/ws_protocol.py): every frame carries an id, replies carry "re"
+  const frameSeq = useRef(0);
+  const makeFrame = (type, data = {}) => ({ v: 1, id: `c${++frameSeq.current}`, type, data });
   const messageQueue = useRef([]);
   const isProcessing = useRef(false);
 
@@ -140,7 +143,8 @@ const ChatWindow = ({ user, onLogout, onChatUpdate }) => {
         
         // Mark reminder as read in backend
       console.log("📝 Marking reminder as read...");
-      await fetch(`${import.meta.env.VITE_API_BASE_URL}/mark-reminder-read/${userId}`, {
+      const readQuery = data.notification_id ? `?notification_id=${encodeURIComponent(data.notification_id)}` : "";
+      await fetch(`${import.meta.env.VITE_API_BASE_URL}/mark-reminder-read/${userId}${readQuery}`, {
       method: 'POST'
       });
         
@@ -260,6 +264,9 @@ const ChatWindow = ({ user, onLogout, onChatUpdate }) => {
     ws.current.onopen = () => {
       console.log("✅ Connected to backend WebSocket");
       setIsConnected(true);
+
+      // Identify the socket so pushed notifications reach it before the first chat message
+      ws.current.send(JSON.stringify(makeFrame("hello", { user_id: user?.id || "user123", protocol: 1, encoding: "json" })));
       
       // Process any queued messages
       if (messageQueue.current.length > 0) {
@@ -278,20 +285,80 @@ const ChatWindow = ({ user, onLogout, onChatUpdate }) => {
       
       try {
         let aiResponse;
+        let response = null;
         // Try to parse as JSON first
         try {
-          const response = JSON.parse(event.data);
+          response = JSON.parse(event.data);
+          if (response && response.v) {
+            // Flatten the envelope so the handlers below see {type, re, ...data}
+            response = { type: response.type, frameId: response.id, re: response.re, ...response.data };
+          }
           aiResponse = response.response || response.message || response.text || event.data;
         } catch {
           // If parsing fails, use the raw data
           aiResponse = event.data;
         }
 
+        // Protocol housekeeping: no chat bubble
+        if (response && (response.type === "hello" || response.type === "ack" || response.type === "inbox")) {
+          return;
+        }
+
+        // Server keepalive: answer so the socket is not evicted as half-open
+        if (response && response.type === "ping") {
+          ws.current.send(JSON.stringify(makeFrame("pong")));
+          return;
+        }
+
+        // Pushed events: reminders from the inbox and WhatsApp send status
+        if (response && (response.type === "notification" || response.type === "whatsapp_status")) {
+          const pushedMessage = {
+            role: "assistant",
+            content: response.message,
+            timestamp: new Date().toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" }),
+          };
+          setPrevChats((prev) => {
+            const newChats = [...prev, pushedMessage];
+            saveChatSession(currentSessionId, newChats, false);
+            return newChats;
+          });
+          if (response.type === "notification" && response.id) {
+            // Acknowledging over the socket marks it read; no REST round trip
+            ws.current.send(JSON.stringify({ ...makeFrame("ack", { notification_id: response.id }), re: response.frameId }));
+          }
+          return;
+        }
+
+        // Task progress / results arrive later and update the task's placeholder message
+        if (response && (response.type === "task_progress" || response.type === "task_result")) {
+          const content = response.type === "task_progress" ? `⏳ ${aiResponse}` : aiResponse;
+          setPrevChats((prev) => {
+            const index = prev.findIndex((chat) => chat.taskId === response.task_id);
+            const updated = {
+              role: "assistant",
+              content,
+              taskId: response.task_id,
+              pending: response.type === "task_progress",
+              timestamp: new Date().toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" }),
+            };
+            const newChats = index === -1
+              ? [...prev, updated]
+              : prev.map((chat, i) => (i === index ? updated : chat));
+            saveChatSession(currentSessionId, newChats, false);
+            return newChats;
+          });
+          return;
+        }
+
         const assistantMessage = {
           role: "assistant",
           content: aiResponse,
           timestamp: new Date().toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" }),
         };
+        if (response && response.type === "task_ack") {
+          assistantMessage.taskId = response.task_id;
+          assistantMessage.pending = true;
+        }
         
         setPrevChats((prev) => {
           const newChats = [...prev, assistantMessage];
@@ -360,9 +427,12 @@ const ChatWindow = ({ user, onLogout, onChatUpdate }) => {
     console.log("🔄 Initial reminder check");
     checkForReminders();
     
-    // Check every 5 seconds (more frequent for testing)
+    // Reminders are pushed over the WebSocket; poll only while it is down
     const interval = setInterval(() => {
-      console.log("⏰ Polling interval triggered");
+      if (ws.current && ws.current.readyState === WebSocket.OPEN) {
+        return;
+      }
+      console.log("⏰ WebSocket down, polling for reminders");
       checkForReminders();
     }, 10000);
     
@@ -519,12 +589,11 @@ const ChatWindow = ({ user, onLogout, onChatUpdate }) => {
 
     saveChatSession(currentSessionId, newChats, false);
 
-    const messageData = {
+    const messageData = makeFrame("message", {
       text: prompt,
-      user_id: user?.id || "user123",
       session_id: currentSessionId,
       timestamp: new Date().toISOString()
-    };
+    });
 
     console.log("📤 Sending message to backend:", messageData);
 